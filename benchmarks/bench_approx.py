@@ -0,0 +1,79 @@
+"""Memory and accuracy of approximate stats mode against exact mode.
+
+Each mode runs in its own process so the reported max RSS only covers that mode.
+
+Usage: python benchmarks/bench_approx.py [messages] [users] [word capacity]
+"""
+
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+from chatgen import generate_chat  # noqa: E402
+from stats_store import create_stats_store  # noqa: E402
+
+TOP = 50
+
+
+def run_mode(mode: str, messages: int, users: int, capacity: int) -> None:
+    store = create_stats_store(mode == "approx", capacity)
+    start = time.perf_counter()
+    for username, text in generate_chat(messages, users, 50_000, typo_rate=0.05):
+        store.add_message(username, text.lower().split())
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "max_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "seconds": elapsed,
+        "top_words": [w for w, _ in store.top_words(TOP)],
+        "vocab_sizes": dict(zip(store.usernames, store.vocab_sizes)),
+    }
+    print(json.dumps(result))
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    if args and args[0] in ("exact", "approx"):
+        run_mode(args[0], *map(int, args[1:]))
+        return
+
+    args = args or ["2000000", "20000", "20000"]
+    results = {}
+    for mode in ("exact", "approx"):
+        out = subprocess.run(
+            [sys.executable, __file__, mode, *args],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        results[mode] = json.loads(out.stdout)
+        print(
+            f"{mode:<7} {results[mode]['max_rss_mib']:>8,.0f} MiB max RSS "
+            f"{results[mode]['seconds']:>8.1f} s"
+        )
+
+    exact, approx = results["exact"], results["approx"]
+    recall = len(set(exact["top_words"]) & set(approx["top_words"])) / TOP
+    print(f"top {TOP} word recall: {recall:.0%}")
+
+    errors = [
+        abs(approx["vocab_sizes"][u] - size) / size
+        for u, size in exact["vocab_sizes"].items()
+        if size > 32
+    ]
+    if errors:
+        errors.sort()
+        print(
+            f"vocab size relative error over {len(errors)} users with >32 words: "
+            f"mean {sum(errors) / len(errors):.2%}, "
+            f"p95 {errors[int(len(errors) * 0.95)]:.2%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
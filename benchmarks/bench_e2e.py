@@ -0,0 +1,134 @@
+"""End to end throughput, from the chat websocket to the counted stats.
+
+Serves a synthetic stream from `src/fake_twitch.py` in its own process at each
+offered rate, connects the bot to it the way `main.py --chat-server` does, and
+reports the rate messages were actually counted at, how far behind the bot
+fell and whether any went missing. The highest rate the bot keeps up with is
+its real throughput ceiling, twitchAPI's parsing included.
+
+Usage: python benchmarks/bench_e2e.py [rates...] [--messages N]
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SRC = Path(__file__).parents[1] / "src"
+sys.path.insert(0, str(SRC))
+
+import main  # noqa: E402
+from bench_suite import CHANNEL, open_channel  # noqa: E402
+from chatgen import generate_stream  # noqa: E402
+from ingest import MessageIngest  # noqa: E402
+from usersettings import UserSettings  # noqa: E402
+
+DEFAULT_RATES = [2_000, 5_000, 10_000, 20_000, 0]
+# Gives up once nothing new was counted for this long
+STALL_TIMEOUT = 5.0
+
+
+def write_log(path: str, messages: int) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for username, text in generate_stream(messages):
+            f.write(f"{username}\t{text}\n")
+
+
+def handled() -> int:
+    """Messages the ingest worker finished with, counted or filtered out."""
+    return sum(
+        counter.value
+        for counter in (
+            main.MESSAGES_PROCESSED,
+            main.MESSAGES_EMPTY,
+            main.MESSAGES_EXCLUDED,
+        )
+    )
+
+
+async def run_rate(
+    log: str, rate: int, messages: int, port: int, phrase_capacity: int
+) -> dict:
+    server = subprocess.Popen(
+        [sys.executable, str(SRC / "fake_twitch.py"), log]
+        + ["--rate", str(rate), "--port", str(port)],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        # Ready once it prints where it serves
+        server.stdout.readline()
+        with tempfile.TemporaryDirectory() as tmp:
+            channel = open_channel(os.path.join(tmp, "journal"), phrase_capacity)
+            main.CHAT_SERVER = f"http://localhost:{port}"
+            main.INGEST = MessageIngest(main.handle_batch)
+            main.INGEST.start()
+            twitch = await main.connect_twitch(UserSettings.settings)
+            chat = await main.create_chat(twitch)
+            await asyncio.to_thread(chat.start)
+
+            start = last_change = time.perf_counter()
+            before, counted = handled(), 0
+            while counted < messages:
+                await asyncio.sleep(0.01)
+                now = time.perf_counter()
+                if handled() - before != counted:
+                    counted, last_change = handled() - before, now
+                elif now - last_change > STALL_TIMEOUT:
+                    break
+            elapsed = last_change - start
+            await asyncio.to_thread(chat.stop)
+            main.INGEST.stop()
+            channel.journal.close()
+    finally:
+        server.terminate()
+        server.wait()
+
+    offered = rate or float("inf")
+    return {
+        "rate": rate,
+        "counted": counted,
+        "counted_per_s": counted / elapsed,
+        # How much longer than the stream itself counting it took
+        "lag_s": elapsed - messages / offered,
+    }
+
+
+def main_e2e() -> None:
+    settings = UserSettings().settings
+    parser = argparse.ArgumentParser()
+    parser.add_argument("rates", nargs="*", type=int, default=DEFAULT_RATES)
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--port", type=int, default=17566)
+    parser.add_argument(
+        "--phrase-capacity",
+        type=int,
+        default=settings.phrase_capacity,
+        help="0 to leave phrases out",
+    )
+    args = parser.parse_args()
+
+    settings.logging = settings.keep_history = False
+    UserSettings.version += 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log = os.path.join(tmp, "chat.log")
+        write_log(log, args.messages)
+        print(f"{args.messages:,} messages to {CHANNEL}\n")
+        print(f"{'offered/s':>10} {'counted/s':>10} {'lag':>7} {'missing':>8}")
+        for rate in args.rates:
+            result = asyncio.run(
+                run_rate(log, rate, args.messages, args.port, args.phrase_capacity)
+            )
+            print(
+                f"{rate or 'max':>10} {result['counted_per_s']:>10,.0f} "
+                f"{result['lag_s']:>6.1f}s {args.messages - result['counted']:>8,}"
+            )
+
+
+if __name__ == "__main__":
+    main_e2e()
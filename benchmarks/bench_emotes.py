@@ -0,0 +1,101 @@
+"""Cost of counting Twitch emotes apart from words.
+
+Counts the same chat twice: with emotes tokenized as words, as before emote
+tags were read, and with each message's emotes cut out by `split_emotes` from
+the tag Twitch sends (built here like `src/fake_twitch.py` sends it, and
+parsed like twitchAPI parses it, both outside the timing). `--emote-spam` is
+the share of messages that are emote walls.
+
+Usage: python benchmarks/bench_emotes.py [--messages N] [--emote-spam F]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+from chatgen import generate_stream  # noqa: E402
+from fake_twitch import emote_tag  # noqa: E402
+from stats_store import StatsStore  # noqa: E402
+from tokenizer import EmoteTag, split_emotes, tokenize_messages  # noqa: E402
+
+BATCH = 512
+
+
+def parse_tag(tag: str) -> EmoteTag | None:
+    """`ChatMessage.emotes` for an emotes tag."""
+    if not tag:
+        return None
+    emotes = {}
+    for emote in tag.split("/"):
+        emote_id, _, positions = emote.partition(":")
+        emotes[emote_id] = [
+            dict(zip(("start_position", "end_position"), p.split("-")))
+            for p in positions.split(",")
+        ]
+    return emotes
+
+
+def count_as_words(chat: list) -> StatsStore:
+    store = StatsStore()
+    for i in range(0, len(chat), BATCH):
+        batch = chat[i : i + BATCH]
+        tokens = tokenize_messages(text for _, text, _ in batch)
+        for (username, _, _), msg_tokens in zip(batch, tokens):
+            if msg_tokens[0]:
+                store.add_tokens(username, msg_tokens)
+    return store
+
+
+def count_apart(chat: list) -> StatsStore:
+    store = StatsStore()
+    for i in range(0, len(chat), BATCH):
+        batch = chat[i : i + BATCH]
+        texts, emotes = [], []
+        for _, text, tag in batch:
+            if tag is not None:
+                text, msg_emotes = split_emotes(text, tag)
+            else:
+                msg_emotes = None
+            texts.append(text)
+            emotes.append(msg_emotes)
+        tokens = tokenize_messages(texts)
+        for (username, _, _), msg_tokens, msg_emotes in zip(batch, tokens, emotes):
+            if msg_tokens[0] or msg_emotes is not None:
+                store.add_tokens(username, msg_tokens, msg_emotes)
+    return store
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--emote-spam", type=float, default=0.3)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    chat = [
+        (username, text, parse_tag(emote_tag(text)))
+        for username, text in generate_stream(args.messages, emote_spam=args.emote_spam)
+    ]
+    tagged = sum(tag is not None for _, _, tag in chat)
+    print(
+        f"{args.messages:,} messages, {tagged / len(chat):.0%} with Twitch emotes, "
+        f"best of {args.repeat}\n"
+    )
+    print(f"{'path':<10} {'msgs/s':>10} {'words':>10} {'vocab':>8} {'emotes':>8}")
+    for name, count in (("as words", count_as_words), ("apart", count_apart)):
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            store = count(chat)
+            best = min(best, time.perf_counter() - start)
+        print(
+            f"{name:<10} {len(chat) / best:>10,.0f} {sum(store.word_totals):>10,} "
+            f"{len(store.vocab):>8,} {sum(store.emote_counts):>8,}"
+        )
+
+
+if __name__ == "__main__":
+    main()
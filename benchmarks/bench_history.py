@@ -0,0 +1,66 @@
+"""Time to add sessions to the history, and to query leaderboards across them.
+
+Stores a few months of daily synthetic sessions in a temporary database, then
+times the cross-session queries the history CLI runs.
+
+Usage: python benchmarks/bench_history.py [sessions] [messages per session]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+from chatgen import generate_chat  # noqa: E402
+from history import TIME_FORMAT, History  # noqa: E402
+from stats_store import StatsStore  # noqa: E402
+
+
+def timed(name: str, fn) -> None:
+    start = time.perf_counter()
+    fn()
+    print(f"{name:<32} {(time.perf_counter() - start) * 1000:>8.1f} ms")
+
+
+def main() -> None:
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 90
+    messages = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        history = History(Path(tmp) / "history.sqlite3")
+        first = datetime(2024, 1, 1, 20)
+        adding = 0.0
+        for day in range(sessions):
+            store = StatsStore()
+            for username, text in generate_chat(
+                messages, 5000, 20_000, seed=day, typo_rate=0.05
+            ):
+                store.add_message(username, text.lower().split())
+            started = first + timedelta(days=day)
+            start = time.perf_counter()
+            history.add_session(
+                "bench",
+                started.strftime("%y-%m-%d-%H-%M"),
+                store,
+                started.strftime(TIME_FORMAT),
+            )
+            adding += time.perf_counter() - start
+
+        size = os.path.getsize(history.path) / 2**20
+        print(f"{sessions} sessions, {size:,.1f} MiB")
+        print(f"{'add a session (mean)':<32} {adding / sessions * 1000:>8.1f} ms")
+        month = ("2024-02-01 00:00", "2024-03-01 00:00")
+        timed("top users, every session", lambda: history.top_users())
+        timed("top users, one month", lambda: history.top_users(None, *month))
+        timed("top words, every session", lambda: history.top_words())
+        timed("top words, one month", lambda: history.top_words(None, *month))
+        timed("one user's sessions", lambda: history.user_sessions("chatter7"))
+        timed("one word's sessions", lambda: history.word_sessions("kekw"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Ingest overhead of the journal, and how long recovering a session takes.
+
+Usage: python benchmarks/bench_journal.py [messages] [tail messages]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+from chatgen import generate_chat  # noqa: E402
+from journal import Journal  # noqa: E402
+from stats_store import StatsStore  # noqa: E402
+from tokenizer import tokenize  # noqa: E402
+
+BATCH = 512
+
+
+def ingest(store: StatsStore, chat: list, journal: Journal | None) -> float:
+    start = time.perf_counter()
+    for i in range(0, len(chat), BATCH):
+        batch = chat[i : i + BATCH]
+        token_lists = [tokenize(text) for _, text in batch]
+        with store.lock:
+            for (username, _), words in zip(batch, token_lists):
+                if not words:
+                    continue
+                store.add_message(username, words)
+                if journal is not None:
+                    journal.append(username, words)
+            if journal is not None:
+                journal.commit()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    messages, tail = map(int, sys.argv[1:] or ["1000000", "100000"])
+    chat = list(generate_chat(messages + tail))
+    head_chat, tail_chat = chat[:messages], chat[messages:]
+
+    plain = ingest(StatsStore(), chat, None)
+    print(f"no journal   {len(chat) / plain:>10,.0f} msg/s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "journal")
+        store = StatsStore()
+        journal = Journal(path)
+        journal.open(store, "bench")
+        elapsed = ingest(store, head_chat, journal)
+
+        start = time.perf_counter()
+        journal.checkpoint(store)
+        checkpoint = time.perf_counter() - start
+
+        elapsed += ingest(store, tail_chat, journal)
+        print(f"journal      {len(chat) / elapsed:>10,.0f} msg/s")
+        print(f"checkpoint   {checkpoint * 1000:>10,.0f} ms ({len(store):,} chatters)")
+        size = sum(os.path.getsize(os.path.join(path, n)) for n in os.listdir(path))
+        print(f"on disk      {size / 2**20:>10,.1f} MiB")
+
+        start = time.perf_counter()
+        recovered, _ = Journal(path).recover()
+        recovery = time.perf_counter() - start
+        print(f"recovery     {recovery * 1000:>10,.0f} ms ({tail:,} message tail)")
+        assert recovered.version == store.version
+
+
+if __name__ == "__main__":
+    main()
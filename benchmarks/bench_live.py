@@ -0,0 +1,71 @@
+"""Cost of serving the live stats API to polling overlay clients.
+
+Publishes boards rendered from a real store, then times requests against the
+app served over HTTP: full responses, and revalidations answered with 304.
+
+Usage: python benchmarks/bench_live.py [requests]
+"""
+
+import http.client
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+import live  # noqa: E402
+from chatgen import generate_stream  # noqa: E402
+from save_stats import (  # noqa: E402
+    display_text,
+    get_words_leaderboard,
+    get_yap_leaderboard,
+)
+from server import serve_in_background  # noqa: E402
+from stats_store import StatsStore  # noqa: E402
+from usersettings import UserSettings  # noqa: E402
+
+PORT = 17598
+
+
+def main() -> None:
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    UserSettings()
+    store = StatsStore()
+    for username, text in generate_stream(200_000):
+        words = text.lower().split()
+        if words:
+            store.add_message(username, words)
+    for name, rows in (
+        ("yap", get_yap_leaderboard(store, 25)),
+        ("words", get_words_leaderboard(store, 25)),
+    ):
+        live.BOARDS.publish("bench", name, rows, display_text(rows))
+
+    server = serve_in_background(PORT)
+    conn = http.client.HTTPConnection("127.0.0.1", PORT)
+    try:
+        for path in ("/stats/bench/yap.json", "/stats/bench/words.txt"):
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            etag = response.getheader("ETag")
+
+            for label, headers in (("200", {}), ("304", {"If-None-Match": etag})):
+                start = time.perf_counter()
+                for _ in range(requests):
+                    conn.request("GET", path, headers=headers)
+                    response = conn.getresponse()
+                    response.read()
+                    assert str(response.status) == label
+                elapsed = time.perf_counter() - start
+                print(
+                    f"{path:<24} {label}: {elapsed / requests * 1e6:>7,.0f} us/request "
+                    f"({requests / elapsed:,.0f} requests/s)"
+                )
+    finally:
+        conn.close()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Peak memory of the interned `StatsStore` against the previous string-keyed stats.
+
+Each mode runs in its own process so the reported max RSS only covers that mode.
+
+Usage: python benchmarks/bench_memory.py [messages] [users] [vocab]
+"""
+
+import resource
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+from chatgen import generate_chat  # noqa: E402
+from stats_store import StatsStore  # noqa: E402
+
+
+class LegacyUserStats:
+    """`UserStats` as it was before word interning."""
+
+    def __init__(self, username: str) -> None:
+        self.username = username
+        self.letter_count = 0
+        self.word_count = 0
+        self.messages = 0
+        self.unique_words: set[str] = set()
+
+    def update_stats(self, words: list[str]) -> None:
+        self.letter_count += len("".join(words))
+        self.word_count += len(words)
+        self.messages += 1
+        self.unique_words.update(set(words))
+
+
+def run_legacy(chat) -> object:
+    yap_stats: dict[str, LegacyUserStats] = {}
+    word_appearances: dict[str, int] = defaultdict(int)
+    for username, text in chat:
+        words = text.lower().split()
+        if username not in yap_stats:
+            yap_stats[username] = LegacyUserStats(username)
+        yap_stats[username].update_stats(words)
+        for w in words:
+            word_appearances[w] += 1
+    return yap_stats, word_appearances
+
+
+def run_store(chat) -> object:
+    store = StatsStore()
+    for username, text in chat:
+        store.add_message(username, text.lower().split())
+    return store
+
+
+def run_mode(mode: str, messages: int, users: int, vocab: int) -> None:
+    chat = generate_chat(messages, users, vocab)
+    start = time.perf_counter()
+    result = {"legacy": run_legacy, "store": run_store}[mode](chat)
+    elapsed = time.perf_counter() - start
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode:<8} {max_rss:>10,.0f} MiB max RSS {elapsed:>10.1f} s")
+    del result
+
+
+def main() -> None:
+    args = sys.argv[1:] or ["1000000", "50000", "200000"]
+    if args[0] in ("legacy", "store"):
+        run_mode(args[0], *map(int, args[1:]))
+        return
+
+    baseline = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import resource; print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)",
+        ],
+        capture_output=True,
+        text=True,
+    )
+    print(f"interpreter baseline {int(baseline.stdout) / 1024:,.0f} MiB")
+    for mode in ("legacy", "store"):
+        subprocess.run([sys.executable, __file__, mode, *args], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Tokenizing and counting messages with and without the message cache.
+
+Compares, on a typical stream and on a spam heavy one (emote walls, copypastas
+and raids), in batches as large as under a backlog and as small as at normal
+chat rates:
+
+- words: `tokenize` and `StatsStore.add_message`, without `Tokens`
+- uncached: `Tokens` built for every message by `make_tokens`, added with `add_tokens`
+- cached: `tokenize_messages`, which reuses the `Tokens` of repeated texts
+
+Usage: python benchmarks/bench_message_cache.py [messages]
+"""
+
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+import tokenizer  # noqa: E402
+from chatgen import generate_stream  # noqa: E402
+from stats_store import StatsStore  # noqa: E402
+
+ROUNDS = 7
+# Messages per batch when the ingest is behind, and when it keeps up
+BATCHES = {"backlog": 256, "live": 2}
+STREAMS = {
+    "typical": {},
+    "spam heavy": {"emote_spam": 0.3, "copypasta": 0.2, "raid_rate": 0.002},
+}
+
+
+def run_words(chat: list[tuple[str, str]], batch_size: int) -> None:
+    store = StatsStore()
+    for i in range(0, len(chat), batch_size):
+        batch = chat[i : i + batch_size]
+        token_lists = [tokenizer.tokenize(text) for _, text in batch]
+        for (username, _), words in zip(batch, token_lists):
+            if words:
+                store.add_message(username, words)
+
+
+def run_uncached(chat: list[tuple[str, str]], batch_size: int) -> None:
+    store = StatsStore()
+    for i in range(0, len(chat), batch_size):
+        batch = chat[i : i + batch_size]
+        tokenized = [tokenizer.make_tokens(text) for _, text in batch]
+        for (username, _), tokens in zip(batch, tokenized):
+            if tokens[0]:
+                store.add_tokens(username, tokens)
+
+
+def run_cached(chat: list[tuple[str, str]], batch_size: int) -> None:
+    store = StatsStore()
+    for i in range(0, len(chat), batch_size):
+        batch = chat[i : i + batch_size]
+        tokenized = tokenizer.tokenize_messages([text for _, text in batch])
+        for (username, _), tokens in zip(batch, tokenized):
+            if tokens[0]:
+                store.add_tokens(username, tokens)
+
+
+def main() -> None:
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    cache = tokenizer.MESSAGE_CACHE
+    runs = {"words": run_words, "uncached": run_uncached, "cached": run_cached}
+
+    for stream, options in STREAMS.items():
+        chat = list(generate_stream(messages, **options))
+        for batches, batch_size in BATCHES.items():
+            rates: dict[str, list[float]] = {mode: [] for mode in runs}
+            cache.hits = cache.misses = 0
+            # The first round warms up (e.g. URL validation's cache), not counted
+            for round in range(ROUNDS + 1):
+                for mode, run in runs.items():
+                    cache.clear()
+                    start = time.perf_counter()
+                    run(chat, batch_size)
+                    if round > 0:
+                        rates[mode].append(messages / (time.perf_counter() - start))
+
+            hits = cache.hits / (cache.hits + cache.misses)
+            print(f"{stream}, {batches} batches ({hits:.0%} cache hits):")
+            words = statistics.median(rates["words"])
+            for mode, mode_rates in rates.items():
+                rate = statistics.median(mode_rates)
+                print(f"  {mode:<9} {rate:>9,.0f} msg/s ({rate / words - 1:+.0%})")
+
+
+if __name__ == "__main__":
+    main()
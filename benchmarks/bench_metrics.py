@@ -0,0 +1,73 @@
+"""Overhead of the ingest metrics on `main.handle_batch`.
+
+Runs the same chat with the metrics recording and with their update methods
+replaced by no-ops, both in full batches and one message at a time (the worst
+case, when chat is slow enough that every batch holds a single message).
+
+Usage: python benchmarks/bench_metrics.py [messages]
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+import main  # noqa: E402
+from channels import ChannelStats  # noqa: E402
+from chatgen import generate_stream  # noqa: E402
+from journal import Journal  # noqa: E402
+from metrics import Counter, Histogram  # noqa: E402
+from stats_store import StatsStore  # noqa: E402
+from usersettings import UserSettings  # noqa: E402
+
+ROUNDS = 15
+
+
+def run(chat: list, batch_size: int, tmp: str) -> float:
+    store = StatsStore()
+    journal = Journal(os.path.join(tmp, f"journal{time.perf_counter_ns()}"))
+    journal.open(store, "bench")
+    main.CHANNELS = {"bench": ChannelStats("bench", store, journal, "bench")}
+    start = time.perf_counter()
+    for i in range(0, len(chat), batch_size):
+        main.handle_batch(chat[i : i + batch_size])
+    elapsed = time.perf_counter() - start
+    journal.close(remove=True)
+    return len(chat) / elapsed
+
+
+def main_bench() -> None:
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 30_000
+    UserSettings().settings.logging = False
+    UserSettings.version += 1
+    chat = [("bench", u, text, None) for u, text in generate_stream(messages)]
+    instrumented = (Counter.inc, Histogram.observe)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for batch_size in (512, 1):
+            # Warm up, the first run is always slower
+            run(chat, batch_size, tmp)
+            rates: dict[str, list[float]] = {"off": [], "on": []}
+            for mode in ("off", "on") * ROUNDS:
+                if mode == "off":
+                    Counter.inc = lambda self, amount=1: None
+                    Histogram.observe = lambda self, value: None
+                else:
+                    Counter.inc, Histogram.observe = instrumented
+                rates[mode].append(run(chat, batch_size, tmp))
+            Counter.inc, Histogram.observe = instrumented
+
+            # Medians of interleaved runs, as single runs vary by several percent
+            off, on = statistics.median(rates["off"]), statistics.median(rates["on"])
+            print(
+                f"batch {batch_size:>3}: {off:>9,.0f} msg/s without metrics, "
+                f"{on:>9,.0f} msg/s with, {1 - on / off:.1%} overhead"
+            )
+
+
+if __name__ == "__main__":
+    main_bench()
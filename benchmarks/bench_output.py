@@ -0,0 +1,69 @@
+"""Size and write/read time of the full tables in every Output Format.
+
+Collects a long synthetic stream (with typos, for a long tail of words like
+real chat), then saves the yap and word tables as CSV, Parquet and Arrow the
+way `save_df` does, and reads each back with pandas. Needs pyarrow.
+
+Usage: python benchmarks/bench_output.py [messages]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+from chatgen import generate_chat  # noqa: E402
+from save_stats import (  # noqa: E402
+    OUTPUT_FORMATS,
+    get_df_word_stats,
+    get_df_yap_stats,
+    write_table,
+)
+from stats_store import StatsStore  # noqa: E402
+
+READERS = {
+    "csv": lambda path, encoding: pd.read_csv(path, encoding=encoding),
+    "parquet": lambda path, encoding: pd.read_parquet(path),
+    "arrow": lambda path, encoding: pd.read_feather(path),
+}
+
+
+def main() -> None:
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    store = StatsStore()
+    for username, text in generate_chat(messages, 50_000, 50_000, typo_rate=0.05):
+        store.add_message(username, text.lower().split())
+    tables = {
+        "yap": (get_df_yap_stats(store), "UTF-8"),
+        "words": (get_df_word_stats(store), "UTF-16"),
+    }
+    print(f"{len(store):,} users, {len(store.vocab):,} words\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (df, encoding) in tables.items():
+            for output_format, extension in OUTPUT_FORMATS.items():
+                path = os.path.join(tmp, f"{name}.{extension}")
+                start = time.perf_counter()
+                write_table(df, path, output_format, encoding)
+                write_time = time.perf_counter() - start
+
+                start = time.perf_counter()
+                read = READERS[output_format](path, encoding)
+                read_time = time.perf_counter() - start
+                assert len(read) == len(df)
+
+                print(
+                    f"{name:<6} {output_format:<8} "
+                    f"{os.path.getsize(path) / 2**20:>7.1f} MiB  "
+                    f"write {write_time * 1000:>7.0f} ms  "
+                    f"read {read_time * 1000:>7.0f} ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""How each Overload Policy copes with a burst of chat faster than the bot.
+
+A producer thread puts a synthetic stream at a fixed rate, like a raid, while
+the ingest worker tokenizes and counts it, stalling `--stall` ms per batch as a
+slow disk would. Reports how long the producer was held up, the deepest the
+queue got, how many messages were shed, and how far the top words' counts
+are from the exact ones.
+
+Usage: python benchmarks/bench_overload.py [--rate N] [--seconds S] [--capacity N]
+"""
+
+import argparse
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+from chatgen import generate_stream  # noqa: E402
+from ingest import OVERLOAD_POLICIES, MessageIngest  # noqa: E402
+from stats_store import StatsStore  # noqa: E402
+from tokenizer import tokenize_messages, weigh_tokens  # noqa: E402
+
+TOP_WORDS = 20
+# Messages put between checks of the producer's schedule
+CHUNK = 100
+
+
+def exact_store(chat: list[tuple[str, str, str]]) -> StatsStore:
+    store = StatsStore()
+    tokens = tokenize_messages(text for _, _, text in chat)
+    for (_, username, _), msg_tokens in zip(chat, tokens):
+        if msg_tokens[0]:
+            store.add_tokens(username, msg_tokens)
+    return store
+
+
+def run_policy(
+    policy: str, chat: list, rate: int, capacity: int, stall: float
+) -> tuple[StatsStore, MessageIngest, float, int]:
+    store = StatsStore()
+
+    def handle_batch(batch, weight, overloaded):
+        tokens = tokenize_messages(text for _, _, text, _ in batch)
+        for (_, username, _, _), msg_tokens in zip(batch, tokens):
+            if msg_tokens[0]:
+                if weight > 1:
+                    msg_tokens = weigh_tokens(msg_tokens, weight)
+                store.add_tokens(username, msg_tokens)
+        time.sleep(stall)
+
+    ingest = MessageIngest(handle_batch, capacity=capacity, policy=policy)
+    ingest.start()
+    peak = 0
+
+    def watch_depth():
+        nonlocal peak
+        while ingest._running:
+            peak = max(peak, len(ingest))
+            time.sleep(0.005)
+
+    watcher = threading.Thread(target=watch_depth, daemon=True)
+    watcher.start()
+
+    start = time.perf_counter()
+    for i in range(0, len(chat), CHUNK):
+        for message in chat[i : i + CHUNK]:
+            ingest.put(*message)
+        delay = start + (i + CHUNK) / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    held_up = time.perf_counter() - start - len(chat) / rate
+    ingest.stop()
+    watcher.join()
+    return store, ingest, max(held_up, 0.0), peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", type=int, default=40_000, help="messages/s")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--capacity", type=int, default=20_000)
+    parser.add_argument("--stall", type=float, default=25.0, help="ms per batch")
+    args = parser.parse_args()
+
+    messages = int(args.rate * args.seconds)
+    chat = [("bench", u, text) for u, text in generate_stream(messages)]
+    exact = exact_store(chat)
+    top = exact.top_words(TOP_WORDS)
+    print(
+        f"{messages:,} messages at {args.rate:,}/s, capacity {args.capacity:,}, "
+        f"{args.stall:g} ms stall per batch\n"
+    )
+    print(
+        f"{'policy':<12} {'held up':>8} {'peak queue':>11} {'dropped':>9} "
+        f"{'sampled out':>12} {'max rate':>9} {'chatters':>9} {'top words err':>14}"
+    )
+    for policy in OVERLOAD_POLICIES:
+        store, ingest, held_up, peak = run_policy(
+            policy, chat, args.rate, args.capacity, args.stall / 1000
+        )
+        counts = dict(store.word_appearances())
+        error = sum(abs(counts.get(w, 0) - c) / c for w, c in top) / len(top)
+        episodes = ingest.episodes
+        print(
+            f"{policy:<12} {held_up:>7.2f}s {peak:>11,} "
+            f"{sum(e.dropped for e in episodes):>9,} "
+            f"{sum(e.sampled_out for e in episodes):>12,} "
+            f"{max((e.sample_rate for e in episodes), default=1):>9} "
+            f"{len(store) / len(exact):>9.0%} {error:>14.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Cost of counting phrases, and how close the phrase table stays to exact.
+
+Counts a `generate_stream` chat (copypastas and emote walls included) into a
+`StatsStore` without phrases and with a `PhraseCounter` of each capacity and
+sample, and reports the throughput, how many entries the counters hold compared
+to every distinct phrase, and the largest error among the exact top phrases.
+
+Usage: python benchmarks/bench_phrases.py [capacities...] [--samples N...]
+       [--messages N]
+"""
+
+import argparse
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+from chatgen import generate_stream  # noqa: E402
+from phrases import MESSAGE_WORDS  # noqa: E402
+from stats_store import StatsStore  # noqa: E402
+from tokenizer import tokenize_messages  # noqa: E402
+
+BATCH = 512
+TOP_PHRASES = 50
+
+
+def count(
+    chat: list[tuple[str, str]], phrase_capacity: int, phrase_sample: int = 1
+) -> tuple[StatsStore, float]:
+    store = StatsStore(phrase_capacity, phrase_sample)
+    start = time.perf_counter()
+    for i in range(0, len(chat), BATCH):
+        batch = chat[i : i + BATCH]
+        tokens = tokenize_messages(text for _, text in batch)
+        for (username, _), msg_tokens in zip(batch, tokens):
+            if msg_tokens[0]:
+                store.add_tokens(username, msg_tokens)
+        store.add_phrases([words for words, _, _ in tokens])
+    return store, time.perf_counter() - start
+
+
+def exact_phrases(chat: list[tuple[str, str]]) -> Counter:
+    phrases = Counter()
+    for _, text in chat:
+        words = text.lower().split()
+        grams = {(" ".join(g), "bigram") for g in zip(words, words[1:])}
+        grams |= {(" ".join(g), "trigram") for g in zip(words, words[1:], words[2:])}
+        if len(words) >= MESSAGE_WORDS:
+            grams.add((" ".join(words), "message"))
+        phrases.update(grams)
+    return phrases
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("capacities", nargs="*", type=int, default=[1_000, 10_000])
+    parser.add_argument("--samples", nargs="*", type=int, default=[1, 4])
+    parser.add_argument("--messages", type=int, default=300_000)
+    parser.add_argument("--copypasta", type=float, default=0.05)
+    args = parser.parse_args()
+
+    chat = list(generate_stream(args.messages, copypasta=args.copypasta))
+    exact = exact_phrases(chat)
+    top = exact.most_common(TOP_PHRASES)
+    print(f"{args.messages:,} messages, {len(exact):,} distinct phrases\n")
+    print(f"{'capacity':>9} {'sample':>7} {'msgs/s':>10} {'entries':>9} {'top err':>8}")
+    runs = [(0, 1)] + [(c, n) for c in args.capacities for n in args.samples]
+    for capacity, sample in runs:
+        store, elapsed = count(chat, capacity, sample)
+        line = f"{capacity or 'off':>9} {sample if capacity else '':>7} "
+        line += f"{len(chat) / elapsed:>10,.0f}"
+        if store.phrases is not None:
+            entries = len(store.phrases.counter)
+            counts = {(p, kind): c for p, kind, c in store.phrase_rows}
+            error = max(abs(c - counts.get(phrase, 0)) for phrase, c in top)
+            error /= top[-1][1]
+            line += f" {entries:>9,} {error:>8.1%}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Cost of profiling the bot while a capture runs.
+
+Counts the same chat through a `MessageIngest` worker, like the bot's ingest
+path, with no capture and during `profiling.Profile` captures at each sample
+interval, with and without tracing allocations, and reports the throughput and
+how many samples were taken. With no capture running nothing is hooked, so the
+first row is the bot as usual.
+
+Usage: python benchmarks/bench_profiling.py [intervals_ms...] [--messages N]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+from chatgen import generate_stream  # noqa: E402
+from ingest import MessageIngest  # noqa: E402
+from profiling import Profile  # noqa: E402
+from stats_store import StatsStore  # noqa: E402
+from tokenizer import tokenize_messages  # noqa: E402
+
+
+def count(chat: list[tuple[str, str, str, None]]) -> float:
+    store = StatsStore()
+
+    def handle_batch(batch, weight, overloaded):
+        tokens = tokenize_messages(text for _, _, text, _ in batch)
+        for (_, username, _, _), msg_tokens in zip(batch, tokens):
+            if msg_tokens[0]:
+                store.add_tokens(username, msg_tokens)
+
+    # Room for every message, nothing is shed
+    ingest = MessageIngest(handle_batch, capacity=0)
+    ingest.start()
+    start = time.perf_counter()
+    for message in chat:
+        ingest.put(*message)
+    ingest.stop()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("intervals", nargs="*", type=float, default=[5.0, 1.0])
+    parser.add_argument("--messages", type=int, default=300_000)
+    args = parser.parse_args()
+
+    chat = [("bench", u, text, None) for u, text in generate_stream(args.messages)]
+    print(f"{args.messages:,} messages\n")
+    print(f"{'interval':>9} {'allocations':>12} {'msgs/s':>10} {'samples':>8}")
+    print(f"{'off':>9} {'':>12} {len(chat) / count(chat):>10,.0f}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for interval in args.intervals:
+            for allocations in (False, True):
+                profile = Profile(3600, tmp, interval / 1000, allocations)
+                profile.start()
+                elapsed = count(chat)
+                profile.stop()
+                profile.done.wait()
+                print(
+                    f"{interval:>7g}ms {'traced' if allocations else '':>12} "
+                    f"{len(chat) / elapsed:>10,.0f} {profile.ticks:>8,}"
+                )
+
+
+if __name__ == "__main__":
+    main()
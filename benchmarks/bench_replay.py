@@ -0,0 +1,53 @@
+"""Offline replay throughput against just reading the log.
+
+Writes a synthetic 'username<TAB>message' log, then times reading it, and
+replaying it with 1 process and with one process per core.
+
+Usage: python benchmarks/bench_replay.py [lines]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+from chatgen import generate_chat  # noqa: E402
+from replay import read_lines, replay  # noqa: E402
+from usersettings import SettingsSnapshot  # noqa: E402
+
+SETTINGS = SettingsSnapshot(0, "", frozenset(), False, 0, 25, False, False, 0, 0)
+
+
+def main() -> None:
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    fd, path = tempfile.mkstemp(suffix=".log")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.writelines(f"{u}\t{text}\n" for u, text in generate_chat(lines))
+        size = os.path.getsize(path) / 2**20
+
+        start = time.perf_counter()
+        read = sum(len(block) for block in read_lines(path, 0, os.path.getsize(path)))
+        elapsed = time.perf_counter() - start
+        assert read == lines
+        print(
+            f"read only     {lines / elapsed:>12,.0f} lines/s {size / elapsed:>8,.0f} MiB/s"
+        )
+
+        for processes in sorted({1, os.cpu_count()}):
+            start = time.perf_counter()
+            store = replay(path, SETTINGS, processes=processes)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{processes:>2} processes  {lines / elapsed:>12,.0f} lines/s "
+                f"{size / elapsed:>8,.0f} MiB/s ({store.version:,} messages counted)"
+            )
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
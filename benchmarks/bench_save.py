@@ -0,0 +1,87 @@
+"""Time to build the yap/word DataFrames at the end of a stream.
+
+Usage: python benchmarks/bench_save.py [users] [vocab]
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+from save_stats import (  # noqa: E402
+    avg_message_length,
+    calc_yap_factor,
+    get_df_word_stats,
+    get_df_yap_stats,
+    get_words_leaderboard,
+    get_yap_leaderboard,
+    zscore,
+)
+from stats_store import StatsStore  # noqa: E402
+
+
+def legacy_get_df_yap_stats(all_user_stats) -> pd.DataFrame:
+    """`get_df_yap_stats` before the columnar store, over a list of `UserStats`."""
+    yap_factors = [calc_yap_factor(u) for u in all_user_stats]
+    yap_scaled = zscore(yap_factors)
+    yap_costs = list(map(lambda x: 2**x, yap_scaled))
+
+    yap_data = {
+        "username": [u.username for u in all_user_stats],
+        "yap cost": yap_costs,
+        "letters": [u.letter_count for u in all_user_stats],
+        "messages": [u.messages for u in all_user_stats],
+        "avg. message len": [avg_message_length(u) for u in all_user_stats],
+        "vocab": [len(u.unique_words) for u in all_user_stats],
+    }
+    yap_df = pd.DataFrame(yap_data)
+    yap_df.sort_values(by=["yap cost"], inplace=True, ascending=False)
+    return yap_df
+
+
+def build_store(users: int, vocab: int) -> StatsStore:
+    rnd = random.Random(0)
+    store = StatsStore()
+    words = [f"word{i}" for i in range(vocab)]
+    for i in range(users):
+        for _ in range(rnd.randint(1, 5)):
+            store.add_message(f"chatter{i}", rnd.choices(words, k=rnd.randint(1, 12)))
+    return store
+
+
+def timed(name: str, fn) -> None:
+    start = time.perf_counter()
+    fn()
+    print(f"{name:<24} {(time.perf_counter() - start) * 1000:>10.1f} ms")
+
+
+def main() -> None:
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    vocab = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    store = build_store(users, vocab)
+    all_user_stats = [store.user_stats(u) for u in store.usernames]
+
+    timed("legacy yap stats", lambda: legacy_get_df_yap_stats(all_user_stats))
+    timed("columnar yap stats", lambda: get_df_yap_stats(store))
+    timed("word stats", lambda: get_df_word_stats(store))
+
+    # Overlay refreshes only need the top rows
+    timed("first top 25 (refresh)", lambda: get_yap_leaderboard(store, 25))
+    timed("yap top 25", lambda: get_yap_leaderboard(store, 25))
+    timed("words top 25", lambda: get_words_leaderboard(store, 25))
+    timed("top 25 after 1k msgs", lambda: update_and_query(store))
+
+
+def update_and_query(store: StatsStore) -> None:
+    for i in range(1000):
+        store.add_message(f"chatter{i}", ["word1", "word2", f"word{i}"])
+    get_yap_leaderboard(store, 25)
+    get_words_leaderboard(store, 25)
+
+
+if __name__ == "__main__":
+    main()
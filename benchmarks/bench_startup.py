@@ -0,0 +1,72 @@
+"""Time from starting `main.py` to its prompt loop, i.e. importing `main`.
+
+Imports `main` in fresh interpreters with `-X importtime`, reporting the
+median wall time and the slowest modules `main` imports in the last run. With
+`--max-ms`, exits with an error when the median is above it, to catch regressions.
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--top N] [--max-ms MS]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SRC = Path(__file__).parents[1] / "src"
+
+
+def import_main() -> tuple[float, list[tuple[int, str]]]:
+    """Returns the wall time of one import and (cumulative us, module) of each import."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=SRC,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    elapsed = time.perf_counter() - start
+
+    imports = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.removeprefix("import time:").split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            imports.append((int(parts[1]), parts[2][1:].rstrip()))
+    return elapsed, imports
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--max-ms", type=float)
+    args = parser.parse_args()
+
+    # The first run also writes the bytecode caches
+    import_main()
+    times = []
+    for _ in range(args.runs):
+        elapsed, imports = import_main()
+        times.append(elapsed * 1000)
+    median = statistics.median(times)
+
+    print(f"import main: {median:,.0f} ms median of {args.runs} runs")
+    print("slowest imports of main (cumulative):")
+    # Only the imports made by main itself, nested ones are counted in them
+    direct = [
+        (us, name.strip())
+        for us, name in imports
+        if len(name) - len(name.lstrip()) == 2
+    ]
+    for us, name in sorted(direct, reverse=True)[: args.top]:
+        print(f"{us / 1000:>10,.1f} ms  {name}")
+
+    if args.max_ms is not None and median > args.max_ms:
+        sys.exit(f"Startup took {median:,.0f} ms, over the {args.max_ms:,.0f} ms limit")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""End to end benchmark of the ingest path at several session sizes.
+
+Every size runs in its own process on a `generate_stream` chat, and measures:
+- throughput of the ingest worker (`main.handle_batch` in batches of 512)
+- per message latency percentiles, handling messages one at a time
+- peak memory (max RSS) and the RSS before any messages were counted
+- time to write the overlay files and the end of stream CSVs
+
+Results are printed as JSON, and optionally written to a file that a later
+run can be compared against.
+
+Usage: python benchmarks/bench_suite.py [sizes...] [--output FILE] [--compare FILE]
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+import main  # noqa: E402
+from channels import ChannelStats  # noqa: E402
+from chatgen import generate_stream  # noqa: E402
+from ingest import BATCH_SIZE  # noqa: E402
+from journal import Journal  # noqa: E402
+from save_stats import (  # noqa: E402
+    get_output_path,
+    save_leaderboards,
+    save_yap_word_stats,
+)
+from stats_store import StatsStore  # noqa: E402
+from usersettings import UserSettings  # noqa: E402
+
+CHANNEL = "_bench"
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+LATENCY_SAMPLE = 100_000
+# Lower is better for everything but throughput
+COMPARED = {
+    "messages_per_s": True,
+    "latency_p99_us": False,
+    "max_rss_mib": False,
+    "save_s": False,
+}
+
+
+def max_rss_mib() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def open_channel(path: str, phrase_capacity: int = 0) -> ChannelStats:
+    store = StatsStore(phrase_capacity)
+    journal = Journal(path)
+    journal.open(store, "bench")
+    main.CHANNELS = {CHANNEL: ChannelStats(CHANNEL, store, journal, "bench")}
+    return main.CHANNELS[CHANNEL]
+
+
+def percentile(values: list[float], p: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def run_size(messages: int) -> dict:
+    UserSettings().settings.logging = False
+    # Benchmark sessions aren't kept, and saves stay comparable with older runs
+    UserSettings.settings.keep_history = False
+    UserSettings.version += 1
+    chat = [(CHANNEL, u, text, None) for u, text in generate_stream(messages)]
+    result = {"messages": messages, "baseline_rss_mib": max_rss_mib()}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        channel = open_channel(os.path.join(tmp, "journal"))
+        start = time.perf_counter()
+        for i in range(0, len(chat), BATCH_SIZE):
+            main.handle_batch(chat[i : i + BATCH_SIZE])
+        elapsed = time.perf_counter() - start
+        result["messages_per_s"] = messages / elapsed
+        result["max_rss_mib"] = max_rss_mib()
+        result["chatters"] = len(channel.store)
+        result["words"] = len(channel.store.vocab_words)
+
+        try:
+            start = time.perf_counter()
+            save_leaderboards(channel.store, CHANNEL)
+            result["overlay_s"] = time.perf_counter() - start
+            start = time.perf_counter()
+            save_yap_word_stats(channel.store, "bench", CHANNEL)
+            result["save_s"] = time.perf_counter() - start
+        finally:
+            shutil.rmtree(get_output_path(CHANNEL))
+        channel.journal.close()
+
+        # Latencies come from a separate pass so they don't affect max RSS
+        channel = open_channel(os.path.join(tmp, "latency"))
+        latencies = []
+        for message in chat[:LATENCY_SAMPLE]:
+            start = time.perf_counter_ns()
+            main.handle_batch([message])
+            latencies.append((time.perf_counter_ns() - start) / 1000)
+        channel.journal.close()
+
+    latencies.sort()
+    for name, p in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("p999", 0.999)):
+        result[f"latency_{name}_us"] = percentile(latencies, p)
+    result["latency_max_us"] = latencies[-1]
+    return result
+
+
+def metadata() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def compare(results: list[dict], baseline: dict) -> None:
+    old = {r["messages"]: r for r in baseline["results"]}
+    for result in results:
+        before = old.get(result["messages"])
+        if before is None:
+            continue
+        changes = []
+        for key, higher_is_better in COMPARED.items():
+            ratio = result[key] / before[key]
+            # Differences of a few percent are usually noise
+            worse = ratio < 0.95 if higher_is_better else ratio > 1.05
+            changes.append(f"{key} x{ratio:.2f}{' (worse)' if worse else ''}")
+        print(f"{result['messages']:>10,}: {', '.join(changes)}", file=sys.stderr)
+
+
+def main_suite() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sizes", nargs="*", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--output", help="also write the results to this file")
+    parser.add_argument("--compare", help="results file of an earlier run")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_size(args.sizes[0])))
+        return
+
+    results = []
+    for size in args.sizes:
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", str(size)],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        results.append(json.loads(out.stdout.splitlines()[-1]))
+        print(
+            f"{size:>10,} messages: {results[-1]['messages_per_s']:>9,.0f} msg/s, "
+            f"p99 {results[-1]['latency_p99_us']:,.0f} us, "
+            f"{results[-1]['max_rss_mib']:,.0f} MiB, "
+            f"save {results[-1]['save_s']:.2f} s",
+            file=sys.stderr,
+        )
+
+    report = {"meta": metadata(), "results": results}
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main_suite()
@@ -0,0 +1,44 @@
+"""Tokenizer throughput against the previous `validators.url` per-word filter.
+
+Usage: python benchmarks/bench_tokenizer.py [messages]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import validators
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+from chatgen import generate_chat  # noqa: E402
+from tokenizer import tokenize  # noqa: E402
+
+
+def filter_word_list_validators(word_list: list[str]) -> list[str]:
+    return list(filter(lambda w: not validators.url(w), word_list))
+
+
+def bench(name: str, fn, msgs: list[str]) -> list[list[str]]:
+    start = time.perf_counter()
+    out = fn(msgs)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<12} {len(msgs) / elapsed:>14,.0f} msg/s")
+    return out
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    msgs = [text for _, text in generate_chat(n)]
+
+    expected = bench(
+        "validators",
+        lambda ms: [filter_word_list_validators(m.strip().lower().split()) for m in ms],
+        msgs,
+    )
+    single = bench("tokenize", lambda ms: [tokenize(m) for m in ms], msgs)
+    assert single == expected, "tokenizer output differs"
+
+
+if __name__ == "__main__":
+    main()
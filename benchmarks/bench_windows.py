@@ -0,0 +1,59 @@
+"""Cost of counting messages into the time windows, over a long session.
+
+Replays synthetic chat at a fixed rate of messages per second of stream time,
+timing `WindowStats.add` (expiry included) for each hour of the stream, and
+reporting how many buckets and tracked users/words the windows hold. Those
+should level off after the longest window, however long the stream.
+
+Usage: python benchmarks/bench_windows.py [hours] [messages per second]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+from chatgen import generate_stream  # noqa: E402
+from tokenizer import tokenize_messages  # noqa: E402
+from windows import WindowStats  # noqa: E402
+
+WINDOWS = [5, 15, 60]
+
+
+def main() -> None:
+    hours = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 20.0
+    per_hour = int(3600 * rate)
+
+    windows = WindowStats(WINDOWS)
+    stream = generate_stream(hours * per_hour)
+    for hour in range(hours):
+        chat = [next(stream) for _ in range(per_hour)]
+        tokenized = tokenize_messages([text for _, text in chat])
+        now = hour * 3600.0
+
+        start = time.perf_counter()
+        for (username, _), tokens in zip(chat, tokenized):
+            now += 1 / rate
+            if tokens[0]:
+                windows.add(username, tokens, now)
+        elapsed = time.perf_counter() - start
+
+        totals = windows._totals[WINDOWS[-1]]
+        print(
+            f"hour {hour + 1}: {elapsed / per_hour * 1e6:>5.2f} us/message, "
+            f"{len(windows)} buckets, {WINDOWS[-1]}m window: "
+            f"{len(totals.messages):,} users {len(totals.words):,} words"
+        )
+
+    start = time.perf_counter()
+    for window in WINDOWS:
+        windows.top_yappers(window, 25, now)
+        windows.top_words(window, 25, now)
+    elapsed = time.perf_counter() - start
+    print(f"top 25 of every window: {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Seeded synthetic Twitch chat generator used by the benchmarks."""
+
+import itertools
+import random
+from typing import Iterator
+
+EMOTES = ["KEKW", "LUL", "PogChamp", "OMEGALUL", "Kappa", "monkaS", "Sadge", "5Head"]
+LINKS = [
+    "https://clips.twitch.tv/SomeClipName-abc123",
+    "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+    "http://example.com",
+]
+COMMANDS = ["!uptime", "!discord", "!followage", "!song", "!so", "!points", "!lurk"]
+COPYPASTAS = [
+    "I can't believe chat is actually this bad at the game KEKW just press the button",
+    "modCheck is anyone here actually watching the stream or just spamming emotes",
+    "TRUE TRUE TRUE TRUE TRUE TRUE TRUE TRUE",
+]
+RAID_MESSAGES = [
+    "raidRaid PogChamp WELCOME RAIDERS",
+    "raidRaid raidRaid raidRaid",
+    "RAID HYPE KEKW",
+]
+
+
+def make_vocab(size: int, rnd: random.Random) -> list[str]:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rnd.choices(letters, k=rnd.randint(2, 10))) for _ in range(size)]
+
+
+def generate_chat(
+    messages: int,
+    users: int = 2000,
+    vocab: int = 5000,
+    seed: int = 0,
+    typo_rate: float = 0.0,
+) -> Iterator[tuple[str, str]]:
+    """Yields `messages` (username, text) pairs with Zipf distributed words.
+
+    A `typo_rate` fraction of words get a random letter appended, producing the
+    long tail of one-off words real chat has.
+    """
+    rnd = random.Random(seed)
+    words = make_vocab(vocab, rnd) + EMOTES
+    word_weights = list(itertools.accumulate(1 / (i + 1) for i in range(len(words))))
+    usernames = [f"chatter{i}" for i in range(users)]
+    user_weights = list(itertools.accumulate(1 / (i + 1) for i in range(users)))
+
+    for _ in range(messages):
+        username = rnd.choices(usernames, cum_weights=user_weights)[0]
+        text = rnd.choices(words, cum_weights=word_weights, k=rnd.randint(1, 12))
+        if typo_rate:
+            text = [
+                (
+                    w + rnd.choice("abcdefghijklmnopqrstuvwxyz")
+                    if rnd.random() < typo_rate
+                    else w
+                )
+                for w in text
+            ]
+        if rnd.random() < 0.02:
+            text.insert(rnd.randrange(len(text) + 1), rnd.choice(LINKS))
+        yield username, " ".join(text)
+
+
+def generate_stream(
+    messages: int,
+    users: int = 2000,
+    vocab: int = 20000,
+    seed: int = 0,
+    emote_spam: float = 0.05,
+    commands: float = 0.03,
+    one_off: float = 0.05,
+    raid_rate: float = 0.0005,
+    copypasta: float = 0.0,
+) -> Iterator[tuple[str, str]]:
+    """`generate_chat` mixed with the other things a busy chat is made of.
+
+    - `emote_spam` of messages repeat one emote 3 to 20 times
+    - `commands` of messages are bot commands like `!uptime`
+    - `copypasta` of messages are one of a few copypastas
+    - `one_off` of messages come from chatters who never chat again
+    - each message has a `raid_rate` chance of starting a raid, a burst of 50
+      to 500 messages from new chatters spamming the raid message
+    """
+    rnd = random.Random(seed)
+    chat = generate_chat(messages, users, vocab, seed, typo_rate=0.02)
+    produced = 0
+    one_offs = raiders = 0
+    while produced < messages:
+        if rnd.random() < raid_rate:
+            raid = RAID_MESSAGES[rnd.randrange(len(RAID_MESSAGES))]
+            for _ in range(min(rnd.randint(50, 500), messages - produced)):
+                raiders += 1
+                produced += 1
+                yield f"raider{raiders}", raid
+            continue
+
+        username, text = next(chat)
+        roll = rnd.random()
+        if roll < emote_spam:
+            text = " ".join([rnd.choice(EMOTES)] * rnd.randint(3, 20))
+        elif roll < emote_spam + commands:
+            text = rnd.choice(COMMANDS) + (" " + username if rnd.random() < 0.3 else "")
+        elif roll < emote_spam + commands + copypasta:
+            text = rnd.choice(COPYPASTAS)
+        if rnd.random() < one_off:
+            one_offs += 1
+            username = f"oneoff{one_offs}"
+        produced += 1
+        yield username, text
@@ -0,0 +1,104 @@
+import os
+import time
+from datetime import datetime
+
+import pytz
+
+from ingest import OverloadEpisode
+from journal import Journal
+from save_stats import get_output_path, save_yap_word_stats
+from stats_store import StatsStore, create_stats_store
+from tokenizer import Emotes, Tokens, weigh_emotes, weigh_tokens
+from usersettings import SettingsData
+from windows import WindowStats
+
+
+class ChannelStats:
+    """The stats of one watched channel, with its journal and output schedule.
+
+    Every channel is collected into its own store and saved to its own folder,
+    `output/<name>`. Recent activity is also counted into `windows`, if given,
+    for the leaderboards of the last few minutes.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        store: StatsStore,
+        journal: Journal,
+        start_time: str,
+        windows: WindowStats | None = None,
+    ) -> None:
+        self.name = name
+        self.store = store
+        self.journal = journal
+        self.start_time = start_time
+        self.windows = windows
+        # Kept up to date by the `SnapshotWriter`
+        self.written_version = -1
+        self.last_checkpoint = time.monotonic()
+
+    @classmethod
+    def open(cls, name: str, settings: SettingsData) -> "ChannelStats":
+        """Starts collecting `name`, resuming its session if it wasn't saved."""
+        journal = Journal(os.path.join(get_output_path(name), "journal"))
+        recovered = journal.recover()
+        if recovered is not None:
+            store, start_time = recovered
+            print(
+                f"Recovered stats of {len(store)} chatters in {name} "
+                f"from session {start_time}"
+            )
+        else:
+            store = create_stats_store(
+                settings.approximate_stats,
+                settings.approx_word_capacity,
+                settings.phrase_capacity,
+                settings.phrase_sample,
+            )
+            start_time = datetime.now(pytz.timezone("UTC")).strftime("%y-%m-%d-%H-%M")
+        journal.open(store, start_time)
+        # Only the session's totals are journaled, recent activity starts over
+        windows = WindowStats(settings.time_windows) if settings.time_windows else None
+        return cls(name, store, journal, start_time, windows)
+
+    def add_messages(
+        self,
+        messages: list[tuple[str, Tokens, Emotes | None]],
+        logging: bool,
+        weight: int = 1,
+    ) -> None:
+        """Adds `messages`, their words counted `weight` times (see `MessageIngest`)."""
+        store, journal, windows = self.store, self.journal, self.windows
+        now = time.time()
+        with store.lock:
+            for username, tokens, emotes in messages:
+                journal.append(username, tokens[0], weight, emotes)
+                if weight > 1:
+                    tokens = weigh_tokens(tokens, weight)
+                    if emotes is not None:
+                        emotes = weigh_emotes(emotes, weight)
+                user_id = store.add_tokens(username, tokens, emotes)
+                if windows is not None:
+                    windows.add(username, tokens, now)
+
+                if logging:
+                    print(
+                        f"[{self.name}] {username} has now sent "
+                        f"{store.messages[user_id]} messages"
+                    )
+            store.add_phrases([tokens[0] for _, tokens, _ in messages], weight)
+            journal.commit()
+
+    def save(self, episodes: list[OverloadEpisode] | None = None) -> None:
+        """Writes the final stats, once nothing is being added to them anymore.
+
+        Overload `episodes` during the session are saved alongside them.
+        """
+        if len(self.store) == 0:
+            print(f"No messages in {self.name}, nothing to save")
+            self.journal.close(remove=True)
+            return
+        save_yap_word_stats(self.store, self.start_time, self.name, episodes=episodes)
+        # The journal is only needed if saving failed
+        self.journal.close(remove=True)
@@ -0,0 +1,263 @@
+# Local stand-in for Twitch chat, to run the whole bot against without Twitch.
+# Speaks just enough of Twitch's IRC over websocket for twitchAPI's `Chat` to
+# log in, join channels and receive messages, plus the two API endpoints it
+# calls on the way (token validation and the bot's own user).
+
+import argparse
+import asyncio
+import itertools
+import os
+import socket
+import time
+import zlib
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+from aiohttp import WSMsgType, web
+
+from replay import parse_lines, read_lines
+
+if TYPE_CHECKING:
+    from twitchAPI.twitch import Twitch
+
+BOT_LOGIN = "yapbot"
+FAKE_TOKEN = "fake-token"
+CAPABILITIES = "twitch.tv/membership twitch.tv/tags twitch.tv/commands"
+# How often chat is sent when paced, messages due in between are sent together
+TICK = 0.01
+# Most messages sent in one websocket frame
+FRAME_MESSAGES = 1000
+# Global Twitch emotes tagged in the messages sent, by name
+TWITCH_EMOTES = {"Kappa": "25", "LUL": "425618", "PogChamp": "305954156"}
+
+
+def chat_url(server: str) -> str:
+    """Websocket URL of the chat of the stand-in at `server` (http://host:port)."""
+    return server.replace("http", "ws", 1).rstrip("/") + "/ws"
+
+
+async def connect(server: str) -> "Twitch":
+    """A `Twitch` logged in to the stand-in at `server`, without any real auth."""
+    from twitchAPI.twitch import Twitch
+    from twitchAPI.type import AuthScope
+
+    server = server.rstrip("/")
+    twitch = await Twitch(
+        "fake-app",
+        authenticate_app=False,
+        base_url=f"{server}/helix/",
+        auth_base_url=f"{server}/oauth2/",
+    )
+    twitch.auto_refresh_auth = False
+    await twitch.set_user_authentication(
+        FAKE_TOKEN, [AuthScope.CHAT_READ], validate=False
+    )
+    return twitch
+
+
+def emote_tag(text: str) -> str:
+    """Twitch's emotes tag of `text`, e.g. `25:0-4,6-10/425618:12-14` for
+    `Kappa Kappa LUL`, with the inclusive positions of each use."""
+    positions: dict[str, list[str]] = {}
+    start = 0
+    for word in text.split(" "):
+        emote_id = TWITCH_EMOTES.get(word)
+        if emote_id is not None:
+            positions.setdefault(emote_id, []).append(
+                f"{start}-{start + len(word) - 1}"
+            )
+        start += len(word) + 1
+    return "/".join(f"{emote_id}:{','.join(p)}" for emote_id, p in positions.items())
+
+
+def privmsg(channel: str, username: str, text: str, msg_id: int) -> str:
+    user_id = zlib.crc32(username.encode())
+    sent = int(time.time() * 1000)
+    return (
+        f"@badge-info=;badges=;color=;display-name={username};"
+        f"emotes={emote_tag(text)};"
+        f"first-msg=0;flags=;id={msg_id};mod=0;room-id=1;subscriber=0;"
+        f"tmi-sent-ts={sent};turbo=0;user-id={user_id};user-type= "
+        f":{username}!{username}@{username}.tmi.twitch.tv PRIVMSG #{channel} :{text}"
+    )
+
+
+class FakeTwitch:
+    """Serves `messages` (username, text) to every connected bot, at `rate`
+    messages per second (0 for as fast as it can), spread over the channels
+    the bot joined in turn.
+
+    `messages` is shared between connections, so a bot that reconnects picks
+    up where it left off.
+    """
+
+    def __init__(self, messages: Iterable[tuple[str, str]], rate: float = 0) -> None:
+        self.messages: Iterator[tuple[str, str]] = iter(messages)
+        self.rate = rate
+        self.sent = 0
+        # Set once every message was sent
+        self.finished = asyncio.Event()
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/ws", self.chat)
+        app.router.add_get("/oauth2/validate", self.validate)
+        app.router.add_get("/helix/users", self.users)
+        return app
+
+    async def start(self, host: str = "localhost", port: int = 0) -> web.AppRunner:
+        """Starts serving, `self.url` is where (useful with port 0, any free port)."""
+        sock = socket.socket()
+        sock.bind((host, port))
+        self.url = f"http://{host}:{sock.getsockname()[1]}"
+        runner = web.AppRunner(self.app(), access_log=None)
+        await runner.setup()
+        await web.SockSite(runner, sock).start()
+        return runner
+
+    async def validate(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "client_id": "fake-app",
+                "login": BOT_LOGIN,
+                "scopes": ["chat:read"],
+                "user_id": "1",
+                "expires_in": 3600,
+            }
+        )
+
+    async def users(self, request: web.Request) -> web.Response:
+        user = {
+            "id": "1",
+            "login": BOT_LOGIN,
+            "display_name": BOT_LOGIN,
+            "type": "",
+            "broadcaster_type": "",
+            "description": "",
+            "profile_image_url": "",
+            "offline_image_url": "",
+            "view_count": 0,
+            "created_at": "2024-01-01T00:00:00Z",
+        }
+        return web.json_response({"data": [user]})
+
+    async def chat(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        nick = BOT_LOGIN
+        channels: list[str] = []
+        sender: asyncio.Task | None = None
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                for line in msg.data.split("\r\n"):
+                    command, _, params = line.partition(" ")
+                    if command == "CAP":
+                        await ws.send_str(f":tmi.twitch.tv CAP * ACK :{CAPABILITIES}")
+                    elif command == "NICK":
+                        nick = params
+                        await ws.send_str(
+                            f":tmi.twitch.tv 001 {nick} :Welcome, GLHF!\r\n"
+                            f":tmi.twitch.tv 376 {nick} :>"
+                        )
+                    elif command == "PING":
+                        await ws.send_str(f"PONG {params}")
+                    elif command == "JOIN":
+                        for channel in params.split(","):
+                            channel = channel.removeprefix("#")
+                            channels.append(channel)
+                            await ws.send_str(
+                                f":{nick}!{nick}@{nick}.tmi.twitch.tv JOIN #{channel}"
+                                "\r\n@emote-only=0;followers-only=-1;r9k=0;"
+                                f"room-id=1;slow=0;subs-only=0 "
+                                f":tmi.twitch.tv ROOMSTATE #{channel}"
+                            )
+                        if sender is None:
+                            sender = asyncio.create_task(self.send_chat(ws, channels))
+                    elif command == "PART":
+                        for channel in params.split(","):
+                            if channel.removeprefix("#") in channels:
+                                channels.remove(channel.removeprefix("#"))
+        finally:
+            if sender is not None:
+                sender.cancel()
+        return ws
+
+    async def send_chat(self, ws: web.WebSocketResponse, channels: list[str]) -> None:
+        loop = asyncio.get_running_loop()
+        start, sent = loop.time(), 0
+        while not ws.closed:
+            count = FRAME_MESSAGES if channels else 0
+            if self.rate:
+                count = min(count, int((loop.time() - start) * self.rate) - sent)
+            first = self.sent
+            lines = [
+                privmsg(channels[i % len(channels)], username, text, i)
+                for i, (username, text) in enumerate(
+                    itertools.islice(self.messages, count), first
+                )
+            ]
+            if lines:
+                await ws.send_str("\r\n".join(lines))
+                sent += len(lines)
+                self.sent += len(lines)
+            elif count > 0:
+                # Out of messages, the connection is left open like a quiet chat
+                self.finished.set()
+                return
+            await asyncio.sleep(TICK if self.rate else 0)
+
+
+def read_log(path: str, timestamps: bool, repeat: bool) -> Iterator[tuple[str, str]]:
+    while True:
+        for lines in read_lines(path, 0, os.path.getsize(path)):
+            yield from parse_lines(lines, timestamps)
+        if not repeat:
+            return
+
+
+async def serve(server: FakeTwitch, host: str, port: int) -> None:
+    runner = await server.start(host, port)
+    print(f"Serving chat at {server.url}, run the bot with --chat-server {server.url}")
+    start = time.perf_counter()
+    try:
+        await server.finished.wait()
+        elapsed = time.perf_counter() - start
+        print(f"Sent {server.sent:,} messages in {elapsed:.1f}s")
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Serves an archived chat log to the bot like Twitch chat would."
+    )
+    parser.add_argument("log", help="chat log with a 'username<TAB>message' per line")
+    parser.add_argument(
+        "--timestamps",
+        action="store_true",
+        help="lines start with an extra column, e.g. a timestamp",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=0,
+        help="messages per second, 0 (default) for as fast as possible",
+    )
+    parser.add_argument(
+        "--repeat", action="store_true", help="start the log over once it's sent"
+    )
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=17565)
+    args = parser.parse_args()
+
+    server = FakeTwitch(read_log(args.log, args.timestamps, args.repeat), args.rate)
+    try:
+        asyncio.run(serve(server, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
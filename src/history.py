@@ -0,0 +1,370 @@
+import argparse
+import os
+import re
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Sequence
+
+from stats_store import StatsSnapshot, StatsStore
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+OUTPUT_DIR = Path(__file__).parents[1] / "output"
+HISTORY_FILE = OUTPUT_DIR / "history.sqlite3"
+# Sessions are named after when they started, e.g. `24-01-31-20-05-yap.csv`
+START_TIME_FORMAT = "%y-%m-%d-%H-%M"
+# Times are stored in UTC in this format, which sorts the same as the times
+TIME_FORMAT = "%Y-%m-%d %H:%M"
+TABLE_FILE = re.compile(
+    r"(?P<name>.+)-(?P<table>yap|words)\.(?P<ext>csv|parquet|arrow)"
+)
+TABLE_ENCODINGS = {"yap": "UTF-8", "words": "UTF-16"}
+RANKINGS = ("messages", "letters")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    channel TEXT NOT NULL,
+    name TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    UNIQUE (channel, name)
+);
+CREATE INDEX IF NOT EXISTS sessions_started_at ON sessions (started_at);
+
+CREATE TABLE IF NOT EXISTS users (
+    session_id INTEGER NOT NULL,
+    username TEXT NOT NULL,
+    letters INTEGER NOT NULL,
+    messages INTEGER NOT NULL,
+    vocab INTEGER NOT NULL,
+    PRIMARY KEY (session_id, username)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS users_username ON users (username, messages, letters);
+
+CREATE TABLE IF NOT EXISTS words (
+    session_id INTEGER NOT NULL,
+    word TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (session_id, word)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS words_word ON words (word, count);
+
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+"""
+
+
+def session_time(name: str, fallback: float) -> str:
+    """When a session named `name` started, `fallback` (a timestamp) if it
+    isn't named after its start time, e.g. a replay."""
+    try:
+        started = datetime.strptime(name, START_TIME_FORMAT)
+    except ValueError:
+        return datetime.fromtimestamp(fallback, timezone.utc).strftime(TIME_FORMAT)
+    return started.strftime(TIME_FORMAT)
+
+
+def parse_time(value: str) -> str:
+    """Normalizes a date or ISO time given on the command line, read as UTC."""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc)
+    return parsed.strftime(TIME_FORMAT)
+
+
+class History:
+    """Stats of every saved session of every channel, in one SQLite database.
+
+    Sessions are added by `save_yap_word_stats` when they're saved, and the
+    tables saved by earlier versions (or while history was turned off) can be
+    added with `ingest`. Adding a session again, e.g. after it was resumed
+    from its journal, replaces it.
+
+    `files` records the size and modification time of every table file
+    already stored, so `ingest` only reads files that are new or changed.
+    """
+
+    def __init__(self, path: Path = HISTORY_FILE) -> None:
+        self.path = path
+
+    def connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Another process may be saving at the same time, wait for it
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _replace_session(
+        self, conn: sqlite3.Connection, channel: str, name: str, started_at: str
+    ) -> int:
+        (session_id,) = conn.execute(
+            "INSERT INTO sessions (channel, name, started_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (channel, name) DO UPDATE SET started_at = excluded.started_at "
+            "RETURNING id",
+            (channel, name, started_at),
+        ).fetchone()
+        conn.execute("DELETE FROM users WHERE session_id = ?", (session_id,))
+        conn.execute("DELETE FROM words WHERE session_id = ?", (session_id,))
+        return session_id
+
+    def _record_files(self, conn: sqlite3.Connection, paths: Sequence[str]) -> None:
+        conn.executemany(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns) VALUES (?, ?, ?)",
+            [(os.path.abspath(p), *file_stamp(p)) for p in paths],
+        )
+
+    def add_session(
+        self,
+        channel: str,
+        name: str,
+        store: StatsStore | StatsSnapshot,
+        started_at: str,
+        paths: Sequence[str] = (),
+    ) -> None:
+        """Stores a session's stats, along with the table files saved from them."""
+        with self.connect() as conn:
+            session_id = self._replace_session(conn, channel, name, started_at)
+            conn.executemany(
+                "INSERT INTO users VALUES (?, ?, ?, ?, ?)",
+                zip(
+                    [session_id] * len(store.usernames),
+                    store.usernames,
+                    store.letters,
+                    store.messages,
+                    store.vocab_sizes,
+                ),
+            )
+            words = store.vocab_words
+            conn.executemany(
+                "INSERT INTO words VALUES (?, ?, ?)",
+                zip([session_id] * len(words), words, store.word_counts),
+            )
+            self._record_files(conn, paths)
+        conn.close()
+
+    def ingest(self, output_dir: Path = OUTPUT_DIR) -> int:
+        """Stores the sessions saved in `output_dir/<channel>` that are new or
+        changed since the last ingest, returning how many there were."""
+        conn = self.connect()
+        known = {
+            path: (size, mtime_ns)
+            for path, size, mtime_ns in conn.execute("SELECT * FROM files")
+        }
+
+        sessions: dict[tuple[str, str], dict[str, str]] = {}
+        for channel in sorted(os.listdir(output_dir)):
+            channel_dir = os.path.join(output_dir, channel)
+            if not os.path.isdir(channel_dir):
+                continue
+            for file in sorted(os.listdir(channel_dir)):
+                match = TABLE_FILE.fullmatch(file)
+                if match is not None:
+                    tables = sessions.setdefault((channel, match["name"]), {})
+                    tables[match["table"]] = os.path.abspath(
+                        os.path.join(channel_dir, file)
+                    )
+
+        ingested = 0
+        for (channel, name), tables in sessions.items():
+            if all(known.get(p) == file_stamp(p) for p in tables.values()):
+                continue
+            frames = {table: read_table(path) for table, path in tables.items()}
+            started_at = session_time(
+                name, min(os.path.getmtime(p) for p in tables.values())
+            )
+            with conn:
+                session_id = self._replace_session(conn, channel, name, started_at)
+                if "yap" in frames:
+                    users = frames["yap"][["username", "letters", "messages", "vocab"]]
+                    conn.executemany(
+                        "INSERT INTO users VALUES (?, ?, ?, ?, ?)",
+                        (
+                            (session_id, u, int(lt), int(m), int(v))
+                            for u, lt, m, v in users.itertuples(index=False)
+                        ),
+                    )
+                if "words" in frames:
+                    words = frames["words"][["word", "count"]]
+                    conn.executemany(
+                        "INSERT INTO words VALUES (?, ?, ?)",
+                        (
+                            (session_id, w, int(c))
+                            for w, c in words.itertuples(index=False)
+                        ),
+                    )
+                self._record_files(conn, list(tables.values()))
+            ingested += 1
+        conn.close()
+        return ingested
+
+    def _where(
+        self, channel: str | None, since: str | None, until: str | None
+    ) -> tuple[str, list[str]]:
+        clauses, params = [], []
+        if channel is not None:
+            clauses.append("s.channel = ?")
+            params.append(channel)
+        if since is not None:
+            clauses.append("s.started_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("s.started_at < ?")
+            params.append(until)
+        return " AND ".join(clauses) or "1", params
+
+    def top_users(
+        self,
+        channel: str | None = None,
+        since: str | None = None,
+        until: str | None = None,
+        by: str = "messages",
+        limit: int = 25,
+    ) -> list[dict]:
+        """The users who sent the most messages (or letters) in the sessions of
+        `channel` (or every channel) started from `since` until before `until`."""
+        if by not in RANKINGS:
+            raise ValueError(f"Can only rank users by {', '.join(RANKINGS)}")
+        where, params = self._where(channel, since, until)
+        conn = self.connect()
+        rows = conn.execute(
+            "SELECT u.username, SUM(u.messages) AS messages, SUM(u.letters) AS letters, "
+            "COUNT(*) FROM users u JOIN sessions s ON s.id = u.session_id "
+            f"WHERE {where} GROUP BY u.username ORDER BY {by} DESC LIMIT ?",
+            [*params, limit],
+        ).fetchall()
+        conn.close()
+        return [
+            {
+                "username": username,
+                "messages": messages,
+                "letters": letters,
+                "avg. message len": letters / messages,
+                "sessions": sessions,
+            }
+            for username, messages, letters, sessions in rows
+        ]
+
+    def top_words(
+        self,
+        channel: str | None = None,
+        since: str | None = None,
+        until: str | None = None,
+        limit: int = 25,
+    ) -> list[dict]:
+        where, params = self._where(channel, since, until)
+        conn = self.connect()
+        rows = conn.execute(
+            "SELECT w.word, SUM(w.count) AS total, COUNT(*) "
+            "FROM words w JOIN sessions s ON s.id = w.session_id "
+            f"WHERE {where} GROUP BY w.word ORDER BY total DESC LIMIT ?",
+            [*params, limit],
+        ).fetchall()
+        conn.close()
+        return [
+            {"word": word, "count": count, "sessions": sessions}
+            for word, count, sessions in rows
+        ]
+
+    def user_sessions(self, username: str) -> list[dict]:
+        """Every session `username` chatted in, oldest first."""
+        conn = self.connect()
+        rows = conn.execute(
+            "SELECT s.channel, s.started_at, u.messages, u.letters, u.vocab "
+            "FROM users u JOIN sessions s ON s.id = u.session_id "
+            "WHERE u.username = ? ORDER BY s.started_at",
+            (username.lower(),),
+        ).fetchall()
+        conn.close()
+        keys = ("channel", "started at", "messages", "letters", "vocab")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def word_sessions(self, word: str) -> list[dict]:
+        """How many times `word` was used in every session, oldest first."""
+        conn = self.connect()
+        rows = conn.execute(
+            "SELECT s.channel, s.started_at, w.count "
+            "FROM words w JOIN sessions s ON s.id = w.session_id "
+            "WHERE w.word = ? ORDER BY s.started_at",
+            (word.lower(),),
+        ).fetchall()
+        conn.close()
+        return [dict(zip(("channel", "started at", "count"), row)) for row in rows]
+
+
+def file_stamp(path: str) -> tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def read_table(path: str) -> "pd.DataFrame":
+    import pandas as pd
+
+    match = TABLE_FILE.fullmatch(os.path.basename(path))
+    if match["ext"] == "parquet":
+        return pd.read_parquet(path)
+    if match["ext"] == "arrow":
+        return pd.read_feather(path)
+    # Names and words are kept as written, e.g. "null" isn't a missing value
+    return pd.read_csv(
+        path,
+        encoding=TABLE_ENCODINGS[match["table"]],
+        dtype={"username": str, "word": str},
+        keep_default_na=False,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Leaderboards across every saved session, from output/history.sqlite3."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser(
+        "ingest", help="add the sessions saved in output/ that aren't stored yet"
+    )
+    for command in ("users", "words"):
+        board = commands.add_parser(command, help=f"top {command} across sessions")
+        board.add_argument("--channel", help="only this channel's sessions")
+        board.add_argument(
+            "--since", type=parse_time, help="sessions started from this date/time"
+        )
+        board.add_argument(
+            "--until", type=parse_time, help="sessions started before this date/time"
+        )
+        board.add_argument("--limit", type=int, default=25)
+        if command == "users":
+            board.add_argument("--by", choices=RANKINGS, default="messages")
+    commands.add_parser("user", help="a user's stats in each session").add_argument(
+        "username"
+    )
+    commands.add_parser("word", help="a word's count in each session").add_argument(
+        "word"
+    )
+    args = parser.parse_args()
+
+    from tabulate import tabulate
+
+    history = History()
+    match args.command:
+        case "ingest":
+            print(f"Ingested {history.ingest()} new or changed sessions")
+            return
+        case "users":
+            rows = history.top_users(
+                args.channel, args.since, args.until, args.by, args.limit
+            )
+        case "words":
+            rows = history.top_words(args.channel, args.since, args.until, args.limit)
+        case "user":
+            rows = history.user_sessions(args.username)
+        case "word":
+            rows = history.word_sessions(args.word)
+    print(tabulate(rows, headers="keys", tablefmt="psql"))
+
+
+if __name__ == "__main__":
+    main()
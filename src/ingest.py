@@ -0,0 +1,249 @@
+import threading
+import time
+import zlib
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable
+
+from tokenizer import EmoteTag
+
+# (channel, username, text, emotes tag)
+Message = tuple[str, str, str, EmoteTag | None]
+
+BATCH_SIZE = 512
+# How long the worker sleeps before checking for new messages without being woken
+IDLE_WAIT = 0.5
+
+# What `put` does once `capacity` messages are waiting
+BLOCK = "block"
+DROP_OLDEST = "drop_oldest"
+SAMPLE = "sample"
+OVERLOAD_POLICIES = (BLOCK, DROP_OLDEST, SAMPLE)
+# Sampling keeps the messages of 1 in this many chatters at most
+MAX_SAMPLE_RATE = 64
+
+
+@dataclass
+class OverloadEpisode:
+    """A period in which messages arrived faster than they were processed.
+
+    `dropped` messages were thrown away because the buffer was full (the
+    oldest first), `sampled_out` ones because their chatter wasn't sampled.
+    While sampling 1 in `sample_rate` chatters (the most at any point of the
+    episode), each kept message's words were counted `sample_rate` times.
+    """
+
+    policy: str
+    start: float
+    end: float | None = None
+    received: int = 0
+    dropped: int = 0
+    sampled_out: int = 0
+    sample_rate: int = 1
+
+
+def sampled(username: str, rate: int) -> bool:
+    """Whether `username` is among the 1 in `rate` chatters kept while sampling.
+
+    Chatters are picked by a hash of their name, so a chatter is kept either
+    always or never at a given rate, and the chatters kept at a rate are also
+    kept at every lower power of 2.
+    """
+    return zlib.crc32(username.encode()) % rate == 0
+
+
+class MessageIngest:
+    """Decouples receiving chat messages from processing them.
+
+    `put` only appends to a queue, so it is cheap enough to call from the chat
+    callback. A worker thread drains the queue and hands `handle_batch` lists of
+    up to `batch_size` messages, with the weight of each message in the batch
+    and whether the ingest is overloaded (so it can skip console logging).
+
+    With a `capacity`, at most that many messages wait in the queue. When it's
+    full, `policy` decides what happens:
+
+    - `block`: `put` waits for the worker, holding up the chat connection
+    - `drop_oldest`: the oldest waiting message is dropped
+    - `sample`: as `drop_oldest`, and once the queue is half full and growing
+      only the messages of 1 in 2, 4, ... chatters (see `sampled`) are kept,
+      with a weight of 2, 4, ... to make up for the rest. The rate doubles
+      while the queue keeps growing and halves each time it's been emptied.
+
+    Every period of overload is recorded in `episodes`.
+    """
+
+    def __init__(
+        self,
+        handle_batch: Callable[[list[Message], int, bool], None],
+        batch_size: int = BATCH_SIZE,
+        capacity: int = 0,
+        policy: str = SAMPLE,
+    ) -> None:
+        if policy not in OVERLOAD_POLICIES:
+            raise ValueError(f"Unknown overload policy {policy!r}")
+        self.handle_batch = handle_batch
+        self.batch_size = batch_size
+        self.capacity = capacity
+        self.policy = policy
+        self.sample_rate = 1
+        # Queue depth when the sample rate was last adjusted
+        self._depth = 0
+        self.episodes: list[OverloadEpisode] = []
+        self._episode: OverloadEpisode | None = None
+        self._episode_lock = threading.Lock()
+        # Held by `put` from sampling a message until it's queued, and by the
+        # worker to lower the sample rate
+        self._rate_lock = threading.Lock()
+        self._space = threading.Condition()
+        self._pending: deque[Message] = deque()
+        self._wakeup = threading.Event()
+        self._running = False
+        self._worker: threading.Thread | None = None
+
+    def put(
+        self,
+        channel: str,
+        username: str,
+        text: str,
+        emotes: EmoteTag | None = None,
+    ) -> None:
+        episode = self._episode
+        if episode is not None:
+            episode.received += 1
+            # Sampling here keeps the unsampled chatters out of the queue entirely
+            if self.sample_rate > 1:
+                with self._rate_lock:
+                    if not sampled(username, self.sample_rate):
+                        self._sample_out(1)
+                        return
+                    self._append((channel, username, text, emotes))
+                return
+        self._append((channel, username, text, emotes))
+
+    def _append(self, message: Message) -> None:
+        if self.capacity and len(self._pending) >= self.capacity:
+            self._overflow()
+        self._pending.append(message)
+        if not self._wakeup.is_set():
+            self._wakeup.set()
+
+    def _overflow(self) -> None:
+        episode = self._episode or self._start_episode()
+        if self.policy == BLOCK:
+            with self._space:
+                # Without a worker nothing would ever make room
+                while self._running and len(self._pending) >= self.capacity:
+                    self._wakeup.set()
+                    self._space.wait(IDLE_WAIT)
+        else:
+            try:
+                self._pending.popleft()
+            except IndexError:
+                # The worker emptied the queue since `put` saw it full
+                return
+            episode.dropped += 1
+
+    def _start_episode(self) -> OverloadEpisode:
+        with self._episode_lock:
+            if self._episode is None:
+                self._episode = OverloadEpisode(self.policy, time.time(), received=1)
+                self.episodes.append(self._episode)
+            return self._episode
+
+    def _sample_out(self, count: int) -> None:
+        # Counted by both `put` and the worker
+        with self._episode_lock:
+            if self._episode is not None:
+                self._episode.sampled_out += count
+
+    def _end_episode(self) -> None:
+        with self._episode_lock:
+            if self._episode is not None:
+                self._episode.end = time.time()
+                self._episode = None
+
+    @property
+    def overloaded(self) -> bool:
+        return self._episode is not None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def start(self) -> None:
+        if self._running:
+            raise RuntimeError("ingest worker already started")
+        self._running = True
+        self._worker = threading.Thread(
+            target=self._run, name="message-ingest", daemon=True
+        )
+        self._worker.start()
+
+    def stop(self) -> None:
+        """Stops the worker once every queued message has been processed."""
+        if not self._running:
+            return
+        self._running = False
+        self._wakeup.set()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+        self._end_episode()
+
+    def _raise_sample_rate(self, waiting: int) -> None:
+        # Growing, or full and dropping messages
+        if waiting >= self.capacity // 2 and (
+            waiting > self._depth or waiting >= self.capacity
+        ):
+            if self.sample_rate < MAX_SAMPLE_RATE:
+                episode = self._episode or self._start_episode()
+                self.sample_rate *= 2
+                episode.sample_rate = max(episode.sample_rate, self.sample_rate)
+        self._depth = waiting
+
+    def drain(self) -> None:
+        """Processes everything currently queued on the calling thread."""
+        pending = self._pending
+        sampling = self.policy == SAMPLE and self.capacity > 0
+        while pending:
+            if sampling:
+                self._raise_sample_rate(len(pending))
+            batch = []
+            try:
+                for _ in range(min(self.batch_size, len(pending))):
+                    batch.append(pending.popleft())
+            except IndexError:
+                # `put` dropped the oldest messages since
+                pass
+            if self.policy == BLOCK:
+                with self._space:
+                    self._space.notify_all()
+            # Messages queued before the rate went up are sampled at the new one
+            rate = self.sample_rate
+            if rate > 1:
+                kept = [m for m in batch if sampled(m[1], rate)]
+                self._sample_out(len(batch) - len(kept))
+                batch = kept
+
+            self.handle_batch(batch, rate, self.overloaded)
+
+        # Only lowered once nothing sampled at the higher rate is left in the
+        # queue, otherwise those messages would be weighted too little. A
+        # message `put` is sampling now is queued before the lock is released
+        if sampling and self.sample_rate > 1:
+            with self._rate_lock:
+                if not pending:
+                    self.sample_rate //= 2
+                    self._depth = 0
+        # Overloaded until the backlog is cleared and nothing is being sampled
+        if self._episode is not None and self.sample_rate == 1:
+            self._end_episode()
+
+    def _run(self) -> None:
+        while self._running:
+            self._wakeup.wait(IDLE_WAIT)
+            # Clear before draining so a put racing with the drain re-arms the event
+            self._wakeup.clear()
+            self.drain()
+        # Anything queued between the last drain and stop
+        self.drain()
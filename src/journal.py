@@ -0,0 +1,222 @@
+import os
+import pickle
+import struct
+import time
+import zlib
+from typing import BinaryIO, Iterator
+
+from stats_store import StatsStore
+from tokenizer import Emotes, weigh_emotes, weigh_tokens
+
+# crc32 and length of the block that follows
+HEADER = struct.Struct("<II")
+# fsync at most this often (seconds), commits in between are only flushed to the OS
+SYNC_INTERVAL = 1.0
+CHECKPOINT_NAME = "checkpoint.pickle"
+SEGMENT_SUFFIX = ".journal"
+
+
+# A journaled message: username, words and Twitch emotes
+Entry = tuple[str, list[str], Emotes | None]
+
+
+# Usernames and tokens never contain whitespace, so a message is stored as the
+# line "username word word ...", or "username*weight word ..." for a message whose
+# words were counted `weight` times (usernames can't contain "*" either). Emotes
+# follow a tab as "uses:id:name", IDs don't contain ":" but names can
+def encode_line(username: str, words: list[str], emotes: Emotes | None) -> str:
+    line = f"{username} {' '.join(words)}"
+    if emotes is None:
+        return line
+    return line + "\t" + " ".join(f"{n}:{i}:{name}" for i, name, n in emotes[0])
+
+
+def decode_emotes(text: str) -> Emotes:
+    uses = []
+    letters = 0
+    for emote in text.split():
+        count, emote_id, name = emote.split(":", 2)
+        uses.append((emote_id, name, int(count)))
+        letters += len(name) * int(count)
+    return uses, letters
+
+
+def encode_block(messages: list[Entry]) -> bytes:
+    payload = "\n".join(encode_line(*message) for message in messages).encode()
+    return HEADER.pack(zlib.crc32(payload), len(payload)) + payload
+
+
+def read_blocks(data: bytes) -> Iterator[Entry]:
+    """Decodes the messages in `data`, stopping at the first torn or corrupt block."""
+    offset, end = 0, len(data)
+    while offset + HEADER.size <= end:
+        crc, length = HEADER.unpack_from(data, offset)
+        start = offset + HEADER.size
+        payload = data[start : start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return
+        for line in payload.decode().split("\n"):
+            line, tab, emotes = line.partition("\t")
+            username, *words = line.split()
+            yield username, words, decode_emotes(emotes) if tab else None
+        offset = start + length
+
+
+class Journal:
+    """Crash-safe log of the messages added to a `StatsStore`.
+
+    Messages are buffered by `append` and written to the current segment file
+    as one checksummed block per ingest batch by `commit`, which syncs the file
+    to disk at most every `SYNC_INTERVAL` seconds.
+
+    `checkpoint` pickles the whole store and starts a new segment, deleting the
+    segments the checkpoint covers, so `recover` only replays the messages
+    received since the last checkpoint. A block cut short by a crash fails its
+    checksum and is dropped along with anything after it.
+
+    `append` and `commit` must be called under the store's `lock`, `checkpoint`
+    takes it itself, only while it copies the store.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.start_time = ""
+        self._segment = 0
+        self._file: BinaryIO | None = None
+        self._pending: list[Entry] = []
+        self._last_sync = 0.0
+
+    @property
+    def checkpoint_path(self) -> str:
+        return os.path.join(self.path, CHECKPOINT_NAME)
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.path, f"{segment:08d}{SEGMENT_SUFFIX}")
+
+    def _segments(self) -> list[int]:
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(
+            int(name.removesuffix(SEGMENT_SUFFIX))
+            for name in os.listdir(self.path)
+            if name.endswith(SEGMENT_SUFFIX)
+        )
+
+    def recover(self) -> tuple[StatsStore, str] | None:
+        """Rebuilds the store and start time of a session that wasn't saved."""
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path, "rb") as f:
+            state = pickle.load(f)
+
+        store: StatsStore = state["store"]
+        for segment in self._segments():
+            if segment < state["segment"]:
+                continue
+            with open(self._segment_path(segment), "rb") as f:
+                data = f.read()
+            for username, words, emotes in read_blocks(data):
+                username, _, weight = username.partition("*")
+                if weight or emotes is not None:
+                    tokens = (words, None, len("".join(words)))
+                    if weight:
+                        tokens = weigh_tokens(tokens, int(weight))
+                        if emotes is not None:
+                            emotes = weigh_emotes(emotes, int(weight))
+                    store.add_tokens(username, tokens, emotes)
+                else:
+                    store.add_message(username, words)
+                store.add_phrases([words], int(weight or 1))
+
+        if len(store) == 0:
+            # Left by a session that stopped before any message, e.g. failing to
+            # log in, there's nothing to resume
+            self.close(remove=True)
+            return None
+        self._segment = max([state["segment"], *self._segments()])
+        return store, state["start_time"]
+
+    def open(self, store: StatsStore, start_time: str) -> None:
+        """Starts journaling `store`, with a checkpoint of its current state."""
+        os.makedirs(self.path, exist_ok=True)
+        self.start_time = start_time
+        self.checkpoint(store)
+
+    def append(
+        self,
+        username: str,
+        words: list[str],
+        weight: int = 1,
+        emotes: Emotes | None = None,
+    ) -> None:
+        if weight > 1:
+            username = f"{username}*{weight}"
+        self._pending.append((username, words, emotes))
+
+    def commit(self) -> None:
+        """Writes the buffered messages, syncing them if the last sync was a while ago."""
+        if not self._pending or self._file is None:
+            return
+        self._file.write(encode_block(self._pending))
+        self._pending.clear()
+        self._file.flush()
+        now = time.monotonic()
+        if now - self._last_sync >= SYNC_INTERVAL:
+            os.fsync(self._file.fileno())
+            self._last_sync = now
+
+    def _rotate(self) -> None:
+        self._close_segment()
+        self._segment += 1
+        self._file = open(self._segment_path(self._segment), "ab")
+
+    def _close_segment(self) -> None:
+        if self._file is None:
+            return
+        self.commit()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+
+    def checkpoint(self, store: StatsStore) -> None:
+        """Saves the store and moves on to a new segment."""
+        # Pickling takes a while for a long session, so a copy is pickled instead
+        # of holding up ingest meanwhile
+        with store.lock:
+            self._rotate()
+            copy = store.copy()
+        try:
+            state = pickle.dumps(
+                {
+                    "start_time": self.start_time,
+                    "segment": self._segment,
+                    "store": copy,
+                },
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        finally:
+            with store.lock:
+                store.release_copy()
+
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(state)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+        # Only once the new checkpoint is in place are the old segments redundant
+        for segment in self._segments():
+            if segment < self._segment:
+                os.remove(self._segment_path(segment))
+
+    def close(self, remove: bool = False) -> None:
+        """Closes the journal, deleting it if `remove` (the stats were saved)."""
+        self._close_segment()
+        if not remove or not os.path.isdir(self.path):
+            return
+        for segment in self._segments():
+            os.remove(self._segment_path(segment))
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        os.rmdir(self.path)
@@ -0,0 +1,83 @@
+import heapq
+import math
+
+
+class Leaderboard:
+    """Top-K index over integer keys whose scores change over time.
+
+    Updates push onto a max-heap without removing the key's previous entry,
+    stale entries are skipped (and dropped) when they surface in `top`. The heap
+    is rebuilt once it holds more than twice as many entries as there are keys,
+    so updates are O(log n) amortised and `top(k)` is O(k log n).
+    """
+
+    def __init__(self) -> None:
+        self.scores: dict[int, float] = {}
+        self._heap: list[tuple[float, int]] = []
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def update(self, key: int, score: float) -> None:
+        self.scores[key] = score
+        heapq.heappush(self._heap, (-score, key))
+        if len(self._heap) > 2 * len(self.scores) + 64:
+            self._heap = [(-s, k) for k, s in self.scores.items()]
+            heapq.heapify(self._heap)
+
+    def top(self, k: int) -> list[tuple[int, float]]:
+        """Returns up to `k` (key, score) pairs, highest score first."""
+        heap, scores = self._heap, self.scores
+        found: list[tuple[int, float]] = []
+        taken: set[int] = set()
+        while heap and len(found) < k:
+            neg_score, key = heapq.heappop(heap)
+            # Either an outdated score, or a duplicate of an entry already taken
+            if scores.get(key) != -neg_score or key in taken:
+                continue
+            found.append((key, -neg_score))
+            taken.add(key)
+
+        for key, score in found:
+            heapq.heappush(heap, (-score, key))
+        return found
+
+
+class RunningStats:
+    """Mean and population standard deviation of a set of values that change.
+
+    Sums are kept relative to the first value added, which keeps the variance
+    accurate when values are large compared to their spread.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self._shift = 0.0
+        self._sum = 0.0
+        self._sum_sq = 0.0
+
+    def add(self, value: float) -> None:
+        if self.count == 0:
+            self._shift = value
+        self.count += 1
+        d = value - self._shift
+        self._sum += d
+        self._sum_sq += d * d
+
+    def replace(self, old: float, new: float) -> None:
+        d_old, d_new = old - self._shift, new - self._shift
+        self._sum += d_new - d_old
+        self._sum_sq += d_new * d_new - d_old * d_old
+
+    @property
+    def mean(self) -> float:
+        return self._shift + self._sum / self.count
+
+    @property
+    def std(self) -> float:
+        mean_d = self._sum / self.count
+        return math.sqrt(max(0.0, self._sum_sq / self.count - mean_d * mean_d))
+
+    def zscore(self, value: float) -> float:
+        std = self.std
+        return (value - self.mean) / std if std > 0 else math.nan
@@ -0,0 +1,55 @@
+import hashlib
+import json
+import math
+from dataclasses import dataclass
+
+FORMATS = {
+    "json": "application/json",
+    "txt": "text/plain; charset=utf-8",
+}
+
+
+@dataclass(frozen=True)
+class Rendered:
+    body: bytes
+    etag: str
+    mimetype: str
+
+
+class LiveBoards:
+    """Latest rendered leaderboards of every channel, served by the HTTP API.
+
+    The `SnapshotWriter` publishes each board as it writes the OBS files, so
+    requests only look up bytes that are already rendered. A board's ETag is a
+    hash of its content, so it only changes when what clients see changes.
+    """
+
+    def __init__(self) -> None:
+        self._boards: dict[tuple[str, str, str], Rendered] = {}
+
+    def publish(self, channel: str, name: str, rows: list[dict], text: str) -> None:
+        # NaN isn't valid JSON, e.g. every yap cost while only one user has chatted
+        rows = [
+            {
+                k: None if isinstance(v, float) and math.isnan(v) else v
+                for k, v in row.items()
+            }
+            for row in rows
+        ]
+        bodies = {
+            "json": json.dumps({"channel": channel, name: rows}).encode(),
+            "txt": text.encode(),
+        }
+        for fmt, body in bodies.items():
+            etag = hashlib.blake2b(body, digest_size=8).hexdigest()
+            # Replacing the entry is atomic, readers never see half of an update
+            self._boards[(channel, name, fmt)] = Rendered(body, etag, FORMATS[fmt])
+
+    def get(self, channel: str, name: str, fmt: str) -> Rendered | None:
+        return self._boards.get((channel, name, fmt))
+
+    def channels(self) -> list[str]:
+        return sorted({channel for channel, _, _ in list(self._boards)})
+
+
+BOARDS = LiveBoards()
@@ -1,123 +1,456 @@
+import argparse
 import asyncio
-from collections import defaultdict
-from datetime import datetime
-
-import pytz
-import validators
-from twitchAPI.chat import Chat, ChatMessage, EventData
-from twitchAPI.oauth import UserAuthenticator
-from twitchAPI.twitch import Twitch
-from twitchAPI.type import AuthScope, ChatEvent
-
-from save_stats import save_yap_word_stats
+import signal
+import sys
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, TypeVar
+
+from channels import ChannelStats
+from ingest import OVERLOAD_POLICIES, SAMPLE, Message, MessageIngest
+from metrics import Counter, CounterFunc, Gauge, Histogram
+from profiling import start_capture
+from snapshots import SnapshotWriter
+from tokenizer import (
+    MESSAGE_CACHE,
+    Emotes,
+    Tokens,
+    split_emotes,
+    tokenize_messages,
+)
 from user_prompt import prompt_loop
-from usersettings import UserSettings
-from userstats import UserStats
-
-USER_SCOPE: list[AuthScope] = [AuthScope.CHAT_READ]
-
-YAP_STATS: dict[str, UserStats]
-WORD_APPEARANCES: dict[str, int]
+from usersettings import SettingsData, UserSettings
+
+if TYPE_CHECKING:
+    from twitchAPI.chat import Chat, ChatMessage, EventData
+    from twitchAPI.twitch import Twitch
+    from werkzeug.serving import BaseWSGIServer
+
+# Stats of every watched channel, by channel name
+CHANNELS: dict[str, ChannelStats] = {}
+INGEST: MessageIngest
+WRITER: SnapshotWriter
+
+# Stand-in for Twitch (see fake_twitch.py) to connect to instead, without logging in
+CHAT_SERVER: str | None = None
+
+# How long the daemon leaves reconnecting to twitchAPI, which gives up after ~4 minutes
+RECONNECT_AFTER = 300.0
+# How often the daemon checks the chat connection
+CONNECTION_CHECK = 5.0
+
+T = TypeVar("T")
+
+MESSAGES_RECEIVED = Counter(
+    "yap_messages_received_total", "Chat messages received from Twitch"
+)
+MESSAGES_EXCLUDED = Counter(
+    "yap_messages_filtered_total",
+    "Messages left out of the stats",
+    {"reason": "excluded_user"},
+)
+MESSAGES_EMPTY = Counter(
+    "yap_messages_filtered_total",
+    "Messages left out of the stats",
+    {"reason": "no_words"},
+)
+MESSAGES_PROCESSED = Counter(
+    "yap_messages_processed_total", "Messages added to the stats"
+)
+TOKENS = Counter("yap_tokens_total", "Words added to the stats")
+EMOTES = Counter("yap_emotes_total", "Twitch emotes added to the stats")
+QUEUE_DEPTH = Gauge(
+    "yap_ingest_queue_depth",
+    "Messages waiting for the ingest worker",
+    lambda: len(INGEST),
+)
+MESSAGES_DROPPED = CounterFunc(
+    "yap_messages_shed_total",
+    "Messages left out while the ingest buffer was overloaded",
+    lambda: sum(e.dropped for e in INGEST.episodes),
+    {"reason": "dropped"},
+)
+MESSAGES_SAMPLED_OUT = CounterFunc(
+    "yap_messages_shed_total",
+    "Messages left out while the ingest buffer was overloaded",
+    lambda: sum(e.sampled_out for e in INGEST.episodes),
+    {"reason": "sampled_out"},
+)
+SAMPLE_RATE = Gauge(
+    "yap_ingest_sample_rate",
+    "1 in how many chatters are counted, 1 unless overloaded",
+    lambda: INGEST.sample_rate,
+)
+OVERLOADED = Gauge(
+    "yap_ingest_overloaded",
+    "1 while messages arrive faster than they're processed",
+    lambda: int(INGEST.overloaded),
+)
+TOKENIZE_SECONDS = Histogram(
+    "yap_tokenize_seconds", "Time to tokenize (and filter) a batch of messages"
+)
+UPDATE_SECONDS = Histogram(
+    "yap_update_seconds", "Time to add a batch of messages to the stats"
+)
+# Read from the cache's own counters, so they cost nothing per message
+MESSAGE_CACHE_HITS = CounterFunc(
+    "yap_message_cache_hits_total",
+    "Messages whose text was already tokenized, e.g. copypastas",
+    lambda: MESSAGE_CACHE.hits,
+)
+MESSAGE_CACHE_MISSES = CounterFunc(
+    "yap_message_cache_misses_total",
+    "Messages tokenized from scratch",
+    lambda: MESSAGE_CACHE.misses,
+)
+MESSAGE_CACHE_HIT_RATIO = Gauge(
+    "yap_message_cache_hit_ratio",
+    "Share of messages tokenized from the cache, since the bot started",
+    lambda: MESSAGE_CACHE.hits / (MESSAGE_CACHE.hits + MESSAGE_CACHE.misses),
+)
+MESSAGE_CACHE_SIZE = Gauge(
+    "yap_message_cache_size",
+    "Repeated message texts in the cache",
+    lambda: len(MESSAGE_CACHE),
+)
+
+
+def handle_batch(
+    batch: list[Message], weight: int = 1, overloaded: bool = False
+) -> None:
+    """Adds a batch from the ingest, each message's words counted `weight` times.
+
+    Console logging is skipped while `overloaded`, it would only slow things further.
+    """
+    settings = UserSettings.snapshot()
+    received = len(batch)
+    batch = [m for m in batch if m[1] not in settings.excluded_users]
+    if len(batch) != received:
+        MESSAGES_EXCLUDED.inc(received - len(batch))
+
+    start = time.perf_counter()
+    # Twitch emotes are cut out by position, only the rest is tokenized
+    texts = [m[2] for m in batch]
+    emotes: list[Emotes | None] = [None] * len(batch)
+    for i, (_, _, text, emote_tag) in enumerate(batch):
+        if emote_tag:
+            texts[i], emotes[i] = split_emotes(text, emote_tag)
+    tokenized_msgs = tokenize_messages(
+        texts, settings.strip_punctuation, settings.strip_emoji
+    )
+    tokenized = time.perf_counter()
+    TOKENIZE_SECONDS.observe(tokenized - start)
+
+    by_channel: dict[str, list[tuple[str, Tokens, Emotes | None]]] = {}
+    tokens = emote_uses = empty = 0
+    for (channel, username, _, _), msg_tokens, msg_emotes in zip(
+        batch, tokenized_msgs, emotes
+    ):
+        # ignore messages that are fully filtered out
+        if not msg_tokens[0] and msg_emotes is None:
+            empty += 1
+            continue
+        tokens += len(msg_tokens[0])
+        if msg_emotes is not None:
+            emote_uses += sum(uses for _, _, uses in msg_emotes[0])
+        by_channel.setdefault(channel, []).append((username, msg_tokens, msg_emotes))
+
+    processed = 0
+    for channel, messages in by_channel.items():
+        channel_stats = CHANNELS.get(channel)
+        if channel_stats is not None:
+            channel_stats.add_messages(
+                messages, settings.logging and not overloaded, weight
+            )
+            processed += len(messages)
+
+    UPDATE_SECONDS.observe(time.perf_counter() - tokenized)
+    MESSAGES_PROCESSED.inc(processed)
+    TOKENS.inc(tokens)
+    EMOTES.inc(emote_uses)
+    if empty:
+        MESSAGES_EMPTY.inc(empty)
+
+
+async def on_message(msg: "ChatMessage") -> None:
+    # Runs on the chat thread, all processing happens on the ingest worker
+    MESSAGES_RECEIVED.inc()
+    room = msg.room
+    if room is not None:
+        INGEST.put(room.name, msg.user.name, msg.text, msg.emotes)
+
+
+async def on_ready(ready_event: "EventData") -> None:
+    channels = list(CHANNELS)
+    print(f"Bot is ready for work, joining {', '.join(channels)}")
+    failed = await ready_event.chat.join_room(channels)
+    if failed:
+        print(f"Failed to join {', '.join(failed)}")
+
+
+def start_http_server(port: int) -> "BaseWSGIServer | None":
+    """Serves /metrics and /stats on `port` while the bot runs, unless `port` is 0."""
+    if port == 0:
+        return None
+    # Flask is only needed when serving
+    from server import serve_in_background
 
-START_TIME: str
-
-
-def filter_urls(word_list: list[str]) -> list[str]:
-    return list(filter(lambda w: not validators.url(w), word_list))
+    try:
+        server = serve_in_background(port)
+    except OSError as e:
+        print(f"Failed to serve metrics and stats on port {port}: {e}")
+        return None
+    print(f"Serving metrics on http://localhost:{port}/metrics")
+    print(f"Serving live stats on http://localhost:{port}/stats")
+    return server
+
+
+def open_channels(settings: SettingsData) -> None:
+    global CHANNELS, INGEST, WRITER
+    CHANNELS = {
+        name: ChannelStats.open(name, settings) for name in settings.target_channels
+    }
+    policy = settings.overload_policy
+    if policy not in OVERLOAD_POLICIES:
+        print(f"Unknown Overload Policy {policy!r}, sampling instead")
+        policy = SAMPLE
+    INGEST = MessageIngest(handle_batch, capacity=settings.ingest_buffer, policy=policy)
+    WRITER = SnapshotWriter(list(CHANNELS.values()))
+
+
+def close_channels() -> None:
+    # Process whatever is still queued before saving
+    INGEST.stop()
+    WRITER.stop()
+    # Save once the twitch and ingest threads have closed, preventing more writes to the stats
+    print("Saving stats")
+    for channel_stats in CHANNELS.values():
+        channel_stats.save(INGEST.episodes)
+
+
+async def connect_twitch(settings: SettingsData, headless: bool = False) -> "Twitch":
+    # twitchAPI (and aiohttp) is only imported once the bot starts, not before the prompt
+    from twitchAPI.twitch import Twitch
+    from twitchAPI.type import AuthScope
+
+    from tokens import TokenStore, authenticate, browser_login, headless_login
+
+    if CHAT_SERVER is not None:
+        from fake_twitch import connect
+
+        return await connect(CHAT_SERVER)
 
+    twitch = await Twitch(settings.app_id, settings.app_secret)
+    # Only logs in through the browser when there's no stored login that still works
+    login = headless_login if headless else browser_login
+    try:
+        await authenticate(twitch, [AuthScope.CHAT_READ], TokenStore(), login)
+    except BaseException:
+        # Retried with a new client when Twitch is down
+        await twitch.close()
+        raise
+    return twitch
 
-def filter_commands(word_list: list[str]) -> list[str]:
-    return word_list if not word_list[0].startswith("!") else []
 
+async def create_chat(twitch: "Twitch") -> "Chat":
+    from twitchAPI.chat import Chat
+    from twitchAPI.type import ChatEvent
 
-def filter_word_list(word_list: list[str]) -> list[str]:
-    return filter_urls(word_list)
+    connection_url = None
+    if CHAT_SERVER is not None:
+        from fake_twitch import chat_url
 
+        connection_url = chat_url(CHAT_SERVER)
+    chat = await Chat(twitch, connection_url=connection_url)
+    chat.register_event(ChatEvent.READY, on_ready)
+    chat.register_event(ChatEvent.MESSAGE, on_message)
+    return chat
 
-def handle_message(username: str, msg: str) -> None:
-    words = filter_word_list(msg.strip().lower().split())
-    # ignore messages that are fully filtered out
-    if len(words) == 0:
-        return
 
+async def run_bot() -> None:
+    """Starts the bot, connects it twitch and registers `on_ready` and `on_message`."""
     settings = UserSettings().settings
+    open_channels(settings)
+    http_server = twitch = chat = None
+    # The channels are closed even if logging in fails, which removes their journals
+    try:
+        http_server = start_http_server(settings.metrics_port)
+        twitch = await connect_twitch(settings)
+        chat = await create_chat(twitch)
 
-    if username not in YAP_STATS:
-        YAP_STATS[username] = UserStats(username)
-    user_stats = YAP_STATS[username]
-    user_stats.update_stats(words)
-
-    for w in words:
-        WORD_APPEARANCES[w] += 1
-
-    if settings.logging:
-        print(f"{username} has now sent {user_stats.messages} messages")
-
+        INGEST.start()
+        WRITER.start()
+        chat.start()
 
-async def on_message(msg: ChatMessage) -> None:
-    settings = UserSettings().settings
-
-    if msg.user.name in settings.excluded_users:
-        return
+        # lets run till we press enter in the console
+        input("press ENTER to stop\n")
+    finally:
+        # now we can close the chat bot and the twitch api client
+        if chat is not None:
+            chat.stop()
+        if twitch is not None:
+            await twitch.close()
+        close_channels()
+        if http_server is not None:
+            http_server.shutdown()
+
+
+async def retry(
+    connect: Callable[[], Awaitable[T]], stopping: asyncio.Event, what: str
+) -> T | None:
+    """Awaits `connect()` until it doesn't fail with a network error, backing off
+    between attempts. Returns None if `stopping` is set first."""
+    from aiohttp import ClientError
+    from twitchAPI.type import TwitchBackendException
+
+    delay = 1
+    while not stopping.is_set():
+        try:
+            return await connect()
+        except (ClientError, OSError, TimeoutError, TwitchBackendException) as e:
+            print(f"Failed to {what} ({type(e).__name__}: {e}), retrying in {delay}s")
+        try:
+            await asyncio.wait_for(stopping.wait(), delay)
+        except TimeoutError:
+            pass
+        delay = min(delay * 2, 300)
+    return None
+
+
+async def start_chat(twitch: "Twitch") -> "Chat":
+    chat = await create_chat(twitch)
+    # Blocks until connected, off the event loop so signals are still handled
+    await asyncio.to_thread(chat.start)
+    return chat
+
+
+async def stay_connected(twitch: "Twitch", stopping: asyncio.Event) -> None:
+    """Keeps the chat connected until `stopping` is set.
+
+    twitchAPI reconnects by itself, but stops trying after a few minutes, so
+    the chat is started over when it's been disconnected for longer than that.
+    """
+    chat = await retry(lambda: start_chat(twitch), stopping, "connect to chat")
+    disconnected_since: float | None = None
+    try:
+        while chat is not None and not stopping.is_set():
+            try:
+                await asyncio.wait_for(stopping.wait(), CONNECTION_CHECK)
+            except TimeoutError:
+                pass
+            if chat.is_connected():
+                disconnected_since = None
+                continue
+            now = time.monotonic()
+            if disconnected_since is None:
+                disconnected_since = now
+            elif now - disconnected_since >= RECONNECT_AFTER:
+                print("Lost the chat connection, reconnecting")
+                await asyncio.to_thread(chat.stop)
+                chat = await retry(
+                    lambda: start_chat(twitch), stopping, "connect to chat"
+                )
+                disconnected_since = None
+    finally:
+        if chat is not None:
+            await asyncio.to_thread(chat.stop)
 
-    handle_message(msg.user.name, msg.text)
 
+def handle_stop_signals(stopping: asyncio.Event) -> None:
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stopping.set)
+        except NotImplementedError:
+            # Windows' event loops don't support signal handlers
+            signal.signal(sig, lambda *_: loop.call_soon_threadsafe(stopping.set))
 
-async def on_ready(ready_event: EventData) -> None:
-    global START_TIME
-    tz_UTC = pytz.timezone("UTC")
-    START_TIME = datetime.now(tz_UTC).strftime("%y-%m-%d-%H-%M")
 
-    settings = UserSettings().settings
-    print(f"Bot is ready for work, joining channel {settings.target_channel}")
-    await ready_event.chat.join_room(settings.target_channel)
+def handle_profile_signal() -> None:
+    """Profiles the bot (see profiling.py) on SIGUSR1, which Windows doesn't have."""
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda *_: start_capture())
 
 
-async def run_bot() -> None:
-    """Starts the bot, connects it twitch and registers `on_ready` and `on_message`."""
-    global YAP_STATS, WORD_APPEARANCES, START_TIME
-    YAP_STATS = {}
-    WORD_APPEARANCES = defaultdict(int)
+async def run_daemon() -> None:
+    """Runs the bot without a terminal until SIGINT or SIGTERM, then saves the stats."""
+    stopping = asyncio.Event()
+    handle_stop_signals(stopping)
 
     settings = UserSettings().settings
-
-    twitch = await Twitch(settings.app_id, settings.app_secret)
-    auth = UserAuthenticator(twitch, USER_SCOPE)
-    token, refresh_token = await auth.authenticate()
-    await twitch.set_user_authentication(token, USER_SCOPE, refresh_token)
-
-    chat = await Chat(twitch)
-
-    chat.register_event(ChatEvent.READY, on_ready)
-    chat.register_event(ChatEvent.MESSAGE, on_message)
-
-    chat.start()
-
-    # lets run till we press enter in the console
+    open_channels(settings)
+    http_server = start_http_server(settings.metrics_port)
+    INGEST.start()
+    WRITER.start()
     try:
-        input("press ENTER to stop\n")
+        twitch = await retry(
+            lambda: connect_twitch(settings, headless=True),
+            stopping,
+            "connect to Twitch",
+        )
+        if twitch is not None:
+            try:
+                await stay_connected(twitch, stopping)
+            finally:
+                await twitch.close()
     finally:
-        # now we can close the chat bot and the twitch api client
-        chat.stop()
-        await twitch.close()
-        # Save once the twitch thread has closed, preventing more writes to dictionaries
-        print("Saving stats")
-        save_yap_word_stats(YAP_STATS, WORD_APPEARANCES, START_TIME)
+        close_channels()
+        if http_server is not None:
+            http_server.shutdown()
+
+
+def missing_setting(settings: SettingsData) -> str | None:
+    # The stand-in for Twitch doesn't need an app
+    if CHAT_SERVER is None:
+        if settings.app_id == "":
+            return "App ID"
+        if settings.app_secret == "":
+            return "App Secret"
+    if not settings.target_channels:
+        return "Target Channel"
+    return None
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Collects yap stats from Twitch chat")
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="run without prompts until SIGINT/SIGTERM, configured by "
+        "user_settings.json and YAP_* environment variables",
+    )
+    parser.add_argument(
+        "--chat-server",
+        metavar="URL",
+        help="connect to a local stand-in for Twitch (src/fake_twitch.py) at URL "
+        "instead, without logging in",
+    )
+    args = parser.parse_args()
+    global CHAT_SERVER
+    CHAT_SERVER = args.chat_server
+    handle_profile_signal()
+
+    if args.daemon:
+        try:
+            UserSettings.load_from_env()
+        except ValueError as e:
+            sys.exit(str(e))
+        missing = missing_setting(UserSettings().settings)
+        if missing is not None:
+            sys.exit(f"{missing} not set, exiting")
+        from tokens import LoginRequired
+
+        try:
+            asyncio.run(run_daemon())
+        except LoginRequired as e:
+            sys.exit(str(e))
+        return
+
     while True:
         prompt_loop()
 
-        settings = UserSettings().settings
-        if settings.app_id == "":
-            print("App ID not set, exiting")
-            exit()
-        if settings.app_secret == "":
-            print("App Secret not set, exiting")
-            exit()
-        if settings.target_channel == "":
-            print("Target Channel not set, exiting")
+        missing = missing_setting(UserSettings().settings)
+        if missing is not None:
+            print(f"{missing} not set, exiting")
             exit()
 
         asyncio.run(run_bot())
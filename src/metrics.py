@@ -0,0 +1,148 @@
+import bisect
+import math
+from typing import Callable
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Metric:
+    """Base of the metrics exposed in the Prometheus text format by `render`.
+
+    Metrics are plain attribute updates without locking, each one should only be
+    updated from one thread.
+    """
+
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: dict[str, str] | None = None):
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        REGISTRY.append(self)
+
+    def label_text(self, extra: dict[str, str] | None = None) -> str:
+        labels = self.labels | (extra or {})
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: dict[str, str] | None = None):
+        super().__init__(name, help, labels)
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        self.value += amount
+
+    def samples(self) -> list[str]:
+        return [f"{self.name}{self.label_text()} {self.value}"]
+
+
+class Gauge(Metric):
+    """Value read by calling `read` when the metrics are rendered."""
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        read: Callable[[], float],
+        labels: dict[str, str] | None = None,
+    ):
+        super().__init__(name, help, labels)
+        self.read = read
+
+    def samples(self) -> list[str]:
+        try:
+            value = self.read()
+        except Exception:
+            value = math.nan
+        return [f"{self.name}{self.label_text()} {value}"]
+
+
+class CounterFunc(Gauge):
+    """Counter whose total is kept elsewhere, read by calling `read` when rendered."""
+
+    type = "counter"
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+        labels: dict[str, str] | None = None,
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+        # The last count is for values above every bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self) -> list[str]:
+        lines = []
+        counts = self.counts[:]
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            le = self.label_text({"le": repr(bound)})
+            lines.append(f"{self.name}_bucket{le} {cumulative}")
+        total = sum(counts)
+        lines.append(f'{self.name}_bucket{self.label_text({"le": "+Inf"})} {total}')
+        lines.append(f"{self.name}_sum{self.label_text()} {self.sum}")
+        lines.append(f"{self.name}_count{self.label_text()} {total}")
+        return lines
+
+
+REGISTRY: list[Metric] = []
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format."""
+    by_name: dict[str, list[Metric]] = {}
+    for metric in REGISTRY:
+        by_name.setdefault(metric.name, []).append(metric)
+
+    lines = []
+    for name, metrics in by_name.items():
+        lines.append(f"# HELP {name} {metrics[0].help}")
+        lines.append(f"# TYPE {name} {metrics[0].type}")
+        for metric in metrics:
+            lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
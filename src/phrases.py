@@ -0,0 +1,79 @@
+from collections import Counter
+
+from sketches import LossyCounter
+
+# Shorter messages are already covered by the bigrams and trigrams
+MESSAGE_WORDS = 4
+KINDS = {2: "bigram", 3: "trigram"}
+
+
+class PhraseCounter:
+    """The most repeated phrases of chat: pairs and triples of words in a row,
+    and whole messages (copypastas) of `MESSAGE_WORDS` words or more.
+
+    A phrase is counted once per message it's in, so an emote wall doesn't
+    count its pair of emotes 20 times. Phrases are tuples of words, told apart
+    by their length, counted together by a `LossyCounter` of `capacity` width
+    so memory follows the repeated phrases rather than every phrase ever sent.
+
+    Building and counting a message's phrases costs about as much as counting
+    the rest of it, so with a `sample` above 1 only every `sample`th message
+    given to `add_batch` is counted, and `rows` scales the counts back up.
+    """
+
+    def __init__(self, capacity: int, sample: int = 1) -> None:
+        self.capacity = capacity
+        self.sample = max(sample, 1)
+        # Messages left to skip before the next sampled one
+        self.skip = 0
+        self.counter = LossyCounter(capacity)
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        # Checkpoints from before phrases were sampled
+        if "sample" not in state:
+            self.sample, self.skip = 1, 0
+
+    def add(self, words: list[str], count: int = 1) -> None:
+        """Counts the phrases of a message's words `count` times."""
+        if len(words) < 2:
+            return
+        phrases = set(zip(words, words[1:]))
+        if len(words) >= 3:
+            phrases.update(zip(words, words[1:], words[2:]))
+            if len(words) >= MESSAGE_WORDS:
+                phrases.add(tuple(words))
+        self.counter.update(phrases, count)
+
+    def add_batch(self, messages: list[list[str]], count: int = 1) -> None:
+        """`add` for each message, with repeats of a message counted at once.
+
+        Repeats are found by identity, `tokenize_messages` hands out the same
+        words for repeats of a text, which makes a raid's spam cheap.
+        """
+        if self.sample > 1:
+            start = self.skip
+            self.skip = (start - len(messages)) % self.sample
+            messages = messages[start :: self.sample]
+        repeats = Counter(map(id, messages))
+        if len(repeats) == len(messages):
+            for words in messages:
+                self.add(words, count)
+            return
+        by_id = {id(words): words for words in messages}
+        for key, times in repeats.items():
+            self.add(by_id[key], times * count)
+
+    def merge(self, other: "PhraseCounter") -> None:
+        if other.sample != self.sample:
+            raise ValueError("Can't merge phrases sampled at different rates")
+        self.counter.merge(other.counter)
+
+    def rows(self) -> list[tuple[str, str, int]]:
+        """(phrase, kind, count) of every phrase used more than once (in the
+        sampled messages)."""
+        counts, sample = self.counter.counts, self.sample
+        return [
+            (" ".join(words), KINDS.get(len(words), "message"), counts[key] * sample)
+            for key, words in self.counter.items.items()
+        ]
@@ -0,0 +1,216 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from types import CodeType
+
+from save_stats import get_output_path
+
+# How long a capture runs unless told otherwise, and the longest one allowed
+DEFAULT_SECONDS = 30.0
+MAX_SECONDS = 600.0
+# Time between samples of every thread's stack
+SAMPLE_INTERVAL = 0.005
+TOP_FUNCTIONS = 25
+TOP_ALLOCATIONS = 30
+
+Stack = tuple[CodeType, ...]
+
+
+def frame_label(code: CodeType) -> str:
+    filename = os.path.basename(code.co_filename)
+    return f"{code.co_qualname} ({filename}:{code.co_firstlineno})"
+
+
+class Profile:
+    """A capture of what every thread of the bot does for `seconds`.
+
+    A thread of its own samples the stack of every other thread each `interval`
+    seconds, so the ingest worker ("message-ingest"), the periodic saves
+    ("snapshot-writer") and the chat connection are told apart, while
+    tracemalloc records where memory is allocated. Nothing is hooked in
+    between captures, so they cost nothing until one is started.
+
+    While it runs, tracing allocations makes the bot several times slower, and
+    sampling a few percent; `allocations=False` leaves them out.
+    """
+
+    def __init__(
+        self,
+        seconds: float,
+        output_path: str,
+        interval: float = SAMPLE_INTERVAL,
+        allocations: bool = True,
+    ) -> None:
+        self.seconds = seconds
+        self.output_path = output_path
+        self.interval = interval
+        self.allocations = allocations
+        # Samples by thread name and stack, outermost frame first
+        self.samples: Counter[tuple[str, Stack]] = Counter()
+        self.ticks = 0
+        self.paths: list[str] = []
+        self.done = threading.Event()
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        threading.Thread(target=self._run, name="profiler", daemon=True).start()
+
+    def stop(self) -> None:
+        """Ends the capture early, it's still written."""
+        self._stopped.set()
+
+    def _run(self) -> None:
+        try:
+            self._capture()
+        finally:
+            self.done.set()
+
+    def _capture(self) -> None:
+        prefix = os.path.join(self.output_path, time.strftime("%y-%m-%d-%H-%M-%S"))
+        # Left running if it was already started, e.g. by PYTHONTRACEMALLOC
+        tracing = not self.allocations or tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        try:
+            start = time.monotonic()
+            self._sample()
+            elapsed = time.monotonic() - start
+            allocations = None
+            if self.allocations:
+                allocations = tracemalloc.take_snapshot().filter_traces(
+                    [
+                        tracemalloc.Filter(False, __file__),
+                        tracemalloc.Filter(False, tracemalloc.__file__),
+                    ]
+                )
+        finally:
+            if not tracing:
+                tracemalloc.stop()
+        try:
+            self.paths = [
+                self.write_summary(f"{prefix}-profile.txt", elapsed),
+                self.write_collapsed(f"{prefix}-profile.collapsed"),
+            ]
+            if allocations is not None:
+                self.paths.append(
+                    self.write_allocations(f"{prefix}-alloc.txt", allocations)
+                )
+        except OSError as e:
+            print(f"Failed to save profile: {e}")
+            return
+        print(f"Saved profile to {prefix}-*")
+
+    def _sample(self) -> None:
+        me = threading.get_ident()
+        deadline = time.monotonic() + self.seconds
+        while not self._stopped.wait(self.interval) and time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                stack.reverse()
+                self.samples[names.get(ident, str(ident)), tuple(stack)] += 1
+            self.ticks += 1
+
+    def thread_rows(self) -> dict[str, list[tuple[int, int, str]]]:
+        """(self samples, total samples, function) of each thread's top functions,
+        busiest threads first."""
+        own: dict[str, Counter[CodeType]] = {}
+        total: dict[str, Counter[CodeType]] = {}
+        for (thread, stack), count in self.samples.items():
+            if not stack:
+                continue
+            own.setdefault(thread, Counter())[stack[-1]] += count
+            # Recursive functions are counted once per sample
+            total_counts = total.setdefault(thread, Counter())
+            for code in set(stack):
+                total_counts[code] += count
+
+        rows = {}
+        for thread, counts in sorted(own.items(), key=lambda t: -t[1].total()):
+            top = sorted(
+                total[thread], key=lambda c: (counts[c], total[thread][c]), reverse=True
+            )
+            rows[thread] = [
+                (counts[code], total[thread][code], frame_label(code))
+                for code in top[:TOP_FUNCTIONS]
+            ]
+        return rows
+
+    def write_summary(self, path: str, elapsed: float) -> str:
+        lines = [
+            f"{self.ticks:,} samples of every thread over {elapsed:.1f}s, "
+            f"every {self.interval * 1000:g} ms",
+            "A thread waiting (for chat, a lock or its next interval) is sampled "
+            "too, in wait() or select()",
+        ]
+        ticks = max(self.ticks, 1)
+        for thread, rows in self.thread_rows().items():
+            lines += ["", thread, f"{'self':>7} {'total':>7}  function"]
+            for own, total, label in rows:
+                lines.append(f"{own / ticks:>7.1%} {total / ticks:>7.1%}  {label}")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        return path
+
+    def write_collapsed(self, path: str) -> str:
+        """One line per stack, `thread;outer;...;inner count`, as flame graph tools
+        (flamegraph.pl, speedscope) read them."""
+        with open(path, "w", encoding="utf-8") as f:
+            for (thread, stack), count in self.samples.items():
+                frames = ";".join([thread, *map(frame_label, stack)])
+                f.write(f"{frames} {count}\n")
+        return path
+
+    def write_allocations(self, path: str, snapshot: tracemalloc.Snapshot) -> str:
+        """Memory allocated during the capture and still held at its end."""
+        by_line = snapshot.statistics("lineno")
+        lines = [
+            f"{sum(s.size for s in by_line) / 1024:,.1f} KiB in "
+            f"{sum(s.count for s in by_line):,} blocks allocated and still held",
+            "",
+            *map(str, by_line[:TOP_ALLOCATIONS]),
+        ]
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        return path
+
+
+# The running (or last) capture
+CURRENT: Profile | None = None
+_lock = threading.Lock()
+
+
+def start_capture(
+    seconds: float = DEFAULT_SECONDS,
+    output_path: str | None = None,
+    allocations: bool = True,
+) -> Profile | None:
+    """Profiles the bot for `seconds`, unless a capture is already running.
+
+    It's written to `output_path`, by default the first Target Channel's output folder.
+    """
+    global CURRENT
+    if not 0 < seconds <= MAX_SECONDS:
+        raise ValueError(f"Can only profile for up to {MAX_SECONDS:g} seconds")
+    # Not waited for, this may run in a signal handler
+    if not _lock.acquire(blocking=False):
+        return None
+    try:
+        if CURRENT is not None and not CURRENT.done.is_set():
+            return None
+        CURRENT = Profile(
+            seconds, output_path or get_output_path(), allocations=allocations
+        )
+        CURRENT.start()
+    finally:
+        _lock.release()
+    print(f"Profiling for {seconds:g}s")
+    return CURRENT
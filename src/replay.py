@@ -0,0 +1,212 @@
+import argparse
+import dataclasses
+import os
+import time
+from functools import partial
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Iterator
+
+from save_stats import save_yap_word_stats
+from stats_store import StatsStore, create_stats_store
+from tokenizer import tokenize_messages
+from usersettings import SettingsSnapshot, UserSettings
+
+# Bytes read at a time, rounded up to the end of a line
+BLOCK_SIZE = 1 << 22
+
+
+def split_file(path: str, parts: int) -> list[tuple[int, int]]:
+    """Splits the file into up to `parts` byte ranges of about the same size."""
+    size = os.path.getsize(path)
+    step = max(1, -(-size // parts))
+    return [(start, min(start + step, size)) for start in range(0, size, step)]
+
+
+def read_lines(path: str, start: int, end: int) -> Iterator[list[str]]:
+    """Yields blocks of the lines that start within the byte range [`start`, `end`).
+
+    Ranges from `split_file` therefore read every line of the file exactly once.
+    """
+    with open(path, "rb") as f:
+        if start > 0:
+            # Skip the rest of a line started by the previous range
+            f.seek(start - 1)
+            start += len(f.readline()) - 1
+
+        pos = start
+        while pos < end:
+            data = f.read(BLOCK_SIZE)
+            if not data:
+                return
+            data += f.readline()
+            if pos + len(data) > end:
+                line_end = data.find(b"\n", end - pos - 1)
+                if line_end != -1:
+                    data = data[: line_end + 1]
+            pos += len(data)
+
+            lines = data.decode("utf-8", errors="replace").split("\n")
+            if not lines[-1]:
+                lines.pop()
+            yield lines
+
+
+def parse_lines(lines: list[str], timestamps: bool) -> list[tuple[str, str]]:
+    """Parses `username<TAB>message` lines, after a timestamp column if `timestamps`."""
+    messages = []
+    for line in lines:
+        if timestamps:
+            line = line.partition("\t")[2]
+        username, sep, text = line.rstrip("\r").partition("\t")
+        if sep:
+            messages.append((username, text))
+    return messages
+
+
+def replay_range(
+    path: str,
+    settings: SettingsSnapshot,
+    timestamps: bool,
+    approximate: bool,
+    word_capacity: int,
+    phrase_capacity: int,
+    phrase_sample: int,
+    byte_range: tuple[int, int],
+) -> StatsStore:
+    """Counts the messages in a part of the log, the same way the bot counts them."""
+    store = create_stats_store(
+        approximate, word_capacity, phrase_capacity, phrase_sample
+    )
+    for lines in read_lines(path, *byte_range):
+        batch = [
+            m
+            for m in parse_lines(lines, timestamps)
+            if m[0] not in settings.excluded_users
+        ]
+        tokenized = tokenize_messages(
+            [msg for _, msg in batch], settings.strip_punctuation, settings.strip_emoji
+        )
+        for (username, _), tokens in zip(batch, tokenized):
+            if tokens[0]:
+                store.add_tokens(username, tokens)
+        store.add_phrases([words for words, _, _ in tokenized])
+    return store
+
+
+def replay(
+    path: str,
+    settings: SettingsSnapshot,
+    timestamps: bool = False,
+    approximate: bool = False,
+    word_capacity: int = 100_000,
+    processes: int = 1,
+    phrase_capacity: int = 0,
+    phrase_sample: int = 1,
+) -> StatsStore:
+    """Builds the stats of a chat log, splitting the work across `processes`."""
+    count_range = partial(
+        replay_range,
+        path,
+        settings,
+        timestamps,
+        approximate,
+        word_capacity,
+        phrase_capacity,
+        phrase_sample,
+    )
+    ranges = split_file(path, processes)
+    if processes <= 1 or len(ranges) <= 1:
+        partials = map(count_range, ranges)
+        return merge_stores(partials, approximate, word_capacity)
+
+    with Pool(processes) as pool:
+        # Merged in file order, so users keep the order they first chatted in
+        return merge_stores(pool.imap(count_range, ranges), approximate, word_capacity)
+
+
+def merge_stores(
+    stores: Iterator[StatsStore], approximate: bool, word_capacity: int
+) -> StatsStore:
+    merged = None
+    for store in stores:
+        if merged is None:
+            merged = store
+        else:
+            merged.merge(store)
+    if merged is None:
+        merged = create_stats_store(approximate, word_capacity)
+    return merged
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Recomputes the yap and word stats of an archived chat log."
+    )
+    parser.add_argument("log", help="chat log with a 'username<TAB>message' per line")
+    parser.add_argument(
+        "--timestamps",
+        action="store_true",
+        help="lines start with an extra column, e.g. a timestamp",
+    )
+    parser.add_argument(
+        "--name",
+        help="start of the output file names, defaults to replay-<log file name>",
+    )
+    parser.add_argument(
+        "--channel",
+        help="save to output/<channel>, defaults to the (first) Target Channel",
+    )
+    parser.add_argument(
+        "--exclude",
+        nargs="*",
+        default=[],
+        help="users to exclude along with the Excluded Users setting",
+    )
+    parser.add_argument("--strip-punctuation", action=argparse.BooleanOptionalAction)
+    parser.add_argument("--strip-emoji", action=argparse.BooleanOptionalAction)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    settings = UserSettings.snapshot()
+    settings = dataclasses.replace(
+        settings,
+        excluded_users=settings.excluded_users | set(args.exclude),
+        strip_punctuation=(
+            settings.strip_punctuation
+            if args.strip_punctuation is None
+            else args.strip_punctuation
+        ),
+        strip_emoji=(
+            settings.strip_emoji if args.strip_emoji is None else args.strip_emoji
+        ),
+    )
+    data = UserSettings.settings
+
+    start = time.perf_counter()
+    store = replay(
+        args.log,
+        settings,
+        args.timestamps,
+        data.approximate_stats,
+        data.approx_word_capacity,
+        args.processes,
+        data.phrase_capacity,
+        data.phrase_sample,
+    )
+    elapsed = time.perf_counter() - start
+    print(
+        f"Counted {store.version:,} messages from {len(store):,} chatters "
+        f"in {elapsed:.1f}s"
+    )
+
+    if len(store) == 0:
+        print("No messages found, nothing to save")
+        return
+    save_yap_word_stats(
+        store, args.name or f"replay-{Path(args.log).stem}", args.channel
+    )
+
+
+if __name__ == "__main__":
+    main()
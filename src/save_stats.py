@@ -1,98 +1,460 @@
-import math
+import importlib.util
 import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Callable
 
-import pandas as pd
-from scipy import stats
-from tabulate import tabulate
-
+from history import History, session_time
+from ingest import OverloadEpisode
+from metrics import Histogram
+from stats_store import StatsSnapshot, StatsStore, yap_factor
 from usersettings import UserSettings
 from userstats import UserStats
+from windows import WindowStats
+
+# NumPy, pandas and tabulate take seconds to import together, they're imported
+# when first needed instead so the bot starts up quickly
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+SAVE_DF_SECONDS = Histogram(
+    "yap_save_df_seconds", "Time to write one full CSV and its display file"
+)
+SAVE_STATS_SECONDS = Histogram(
+    "yap_save_stats_seconds", "Time to build and write every full CSV"
+)
+OVERLAY_SECONDS = Histogram(
+    "yap_overlay_seconds", "Time to rewrite the display files from the leaderboards"
+)
+
+# File extension of each `Output Format`, Parquet and Arrow need pyarrow
+OUTPUT_FORMATS = {"csv": "csv", "parquet": "parquet", "arrow": "arrow"}
+# Full tables are converted for pyarrow this many rows at a time, so a large
+# table isn't held in memory twice while it's written
+EXPORT_CHUNK_ROWS = 65_536
 
 
 def avg_message_length(user_stats: UserStats) -> float:
     return user_stats.letter_count / user_stats.messages
 
 
-def curve(x: float):
-    return math.pow(2, x)
+def curve(x: "float | np.ndarray"):
+    return 2.0**x
+
+
+def zscore(x: "np.ndarray") -> "np.ndarray":
+    """Same as `scipy.stats.zscore`, all NaN when every value is equal."""
+    import numpy as np
+
+    x = np.asarray(x, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (x - x.mean()) / x.std()
+
+
+def column(values) -> "np.ndarray":
+    """Views a `StatsStore` column as a NumPy array without copying it."""
+    import numpy as np
+
+    return np.frombuffer(values, dtype=np.int64)
 
 
-# Calculate 'yap' factor based on collected stats, many magic numbers are found here
 def calc_yap_factor(user_stats: UserStats) -> float:
-    scalar = user_stats.letter_count**0.75
-    uniq_word_ratio = (len(user_stats.unique_words) ** 1.2) / user_stats.messages
-    avg_ltrs = avg_message_length(user_stats)
-    return math.log(scalar * (uniq_word_ratio + avg_ltrs))
+    return yap_factor(
+        user_stats.letter_count, user_stats.messages, len(user_stats.unique_words)
+    )
 
 
-def save_df(
-    df_full: pd.DataFrame,
-    df_display: pd.DataFrame,
+# Same as `calc_yap_factor`, over every user at once
+def calc_yap_factors(
+    letters: "np.ndarray", messages: "np.ndarray", vocab: "np.ndarray"
+) -> "np.ndarray":
+    import numpy as np
+
+    scalar = letters**0.75
+    uniq_word_ratio = (vocab**1.2) / messages
+    avg_ltrs = letters / messages
+    return np.log(scalar * (uniq_word_ratio + avg_ltrs))
+
+
+def get_output_path(channel: str | None = None) -> str:
+    """Output folder of `channel`, by default the (first) Target Channel."""
+    if channel is None:
+        channels = UserSettings().settings.target_channels
+        channel = channels[0] if channels else ""
+    output_path = os.path.abspath(__file__ + f"/../../output/{channel}")
+    if not os.path.exists(output_path):
+        os.makedirs(output_path)
+    return output_path
+
+
+# Write to a temporary file first so that readers (OBS) never see a partial file
+def replace_atomic(path: str, write: Callable[[str], None]) -> None:
+    tmp_path = f"{path}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+# Display text last written to each path, to skip rewriting unchanged files
+LAST_DISPLAY: dict[str, str] = {}
+
+
+def display_text(df_display: "pd.DataFrame | list[dict]") -> str:
+    from tabulate import tabulate
+
+    text = "\n" * UserSettings.settings.padding
+    return text + tabulate(df_display, headers="keys", tablefmt="psql", showindex=False)
+
+
+def save_display(
+    df_display: "pd.DataFrame | list[dict]",
     name: str,
     encode_type: str,
-    start_time: str,
+    channel: str | None = None,
+) -> bool:
+    """Writes the brief table OBS reads, returning whether the file was changed."""
+    return write_display(display_text(df_display), name, encode_type, channel)
+
+
+def write_display(
+    text: str, name: str, encode_type: str, channel: str | None = None
+) -> bool:
+    path = os.path.join(get_output_path(channel), f"{name}.txt")
+    if LAST_DISPLAY.get(path) == text:
+        return False
+
+    def write(tmp_path: str) -> None:
+        with open(tmp_path, "w", encoding=encode_type) as f:
+            f.write(text)
+
+    replace_atomic(path, write)
+    LAST_DISPLAY[path] = text
+    return True
+
+
+def get_output_format() -> str:
+    """The `Output Format` the full tables are saved in, CSV if it can't be used."""
+    output_format = UserSettings.settings.output_format
+    if output_format not in OUTPUT_FORMATS:
+        print(f"Unknown Output Format {output_format!r}, saving CSVs instead")
+        return "csv"
+    if output_format != "csv" and importlib.util.find_spec("pyarrow") is None:
+        print(f"pyarrow isn't installed, saving CSVs instead of {output_format}")
+        return "csv"
+    return output_format
+
+
+def write_table(
+    df: "pd.DataFrame", path: str, output_format: str, encode_type: str
 ) -> None:
-    settings = UserSettings().settings
-    output_path = os.path.abspath(__file__ + f"/../../output/{settings.target_channel}")
-    if not os.path.exists(output_path):
-        os.makedirs(output_path)
+    """Writes a full table, `encode_type` is only used by CSVs."""
+    if output_format == "csv":
+        df.to_csv(path, mode="w", encoding=encode_type, index=False)
+        return
+
+    import pyarrow as pa
+
+    # Converting the first chunk settles the column types of the rest
+    first = pa.RecordBatch.from_pandas(
+        df.iloc[:EXPORT_CHUNK_ROWS], preserve_index=False
+    )
+    schema = first.schema
+    chunks = (
+        pa.RecordBatch.from_pandas(
+            df.iloc[i : i + EXPORT_CHUNK_ROWS], schema=schema, preserve_index=False
+        )
+        for i in range(EXPORT_CHUNK_ROWS, len(df), EXPORT_CHUNK_ROWS)
+    )
+
+    if output_format == "parquet":
+        import pyarrow.parquet as pq
+
+        # Strings are dictionary encoded by default, where that makes them smaller
+        writer = pq.ParquetWriter(path, schema, compression="zstd")
+    else:
+        options = pa.ipc.IpcWriteOptions(compression="zstd")
+        writer = pa.ipc.new_file(path, schema, options=options)
+    with writer:
+        writer.write_batch(first)
+        for chunk in chunks:
+            writer.write_batch(chunk)
+
 
+def save_df(
+    df_full: "pd.DataFrame",
+    df_display: "pd.DataFrame",
+    name: str,
+    encode_type: str,
+    start_time: str,
+    channel: str | None = None,
+) -> str:
+    """Writes the full table and its display file, returning the table's path."""
+    start = time.perf_counter()
     # Full log file
-    df_full.to_csv(
-        os.path.join(output_path, f"{start_time}-{name}.csv"),
-        mode="w",
-        encoding=encode_type,
-        index=False,
+    output_format = get_output_format()
+    extension = OUTPUT_FORMATS[output_format]
+    path = os.path.join(get_output_path(channel), f"{start_time}-{name}.{extension}")
+    replace_atomic(
+        path,
+        lambda tmp_path: write_table(df_full, tmp_path, output_format, encode_type),
     )
 
     # df_brief overwrites the same file, is more consise so that it can be put in OBS
-    with open(os.path.join(output_path, f"{name}.txt"), "w", encoding=encode_type) as f:
-        if UserSettings.settings.padding > 0:
-            f.write("\n" * UserSettings.settings.padding)
+    save_display(df_display, name, encode_type, channel)
+    SAVE_DF_SECONDS.observe(time.perf_counter() - start)
+    return path
 
-        f.write(tabulate(df_display, headers="keys", tablefmt="psql", showindex=False))
 
+def get_df_yap_stats(store: StatsStore | StatsSnapshot) -> "pd.DataFrame":
+    import pandas as pd
 
-def get_df_yap_stats(yap_stats: dict[str, UserStats]) -> pd.DataFrame:
-    all_user_stats = list(yap_stats.values())
+    letters = column(store.letters)
+    messages = column(store.messages)
+    vocab = column(store.vocab_sizes)
 
-    yap_factors = [calc_yap_factor(u) for u in all_user_stats]
-    yap_scaled = stats.zscore(yap_factors)
-    yap_costs = list(map(lambda x: curve(x), yap_scaled))
+    yap_factors = calc_yap_factors(letters, messages, vocab)
+    yap_costs = curve(zscore(yap_factors))
 
     yap_data = {
-        "username": [u.username for u in all_user_stats],
+        "username": store.usernames,
         "yap cost": yap_costs,
-        "letters": [u.letter_count for u in all_user_stats],
-        "messages": [u.messages for u in all_user_stats],
-        "avg. message len": [avg_message_length(u) for u in all_user_stats],
-        "vocab": [len(u.unique_words) for u in all_user_stats],
+        "letters": letters,
+        "messages": messages,
+        "avg. message len": letters / messages,
+        "vocab": vocab,
     }
-    yap_df = pd.DataFrame(yap_data)
+    yap_df = pd.DataFrame(yap_data, copy=False)
     yap_df.sort_values(by=["yap cost"], inplace=True, ascending=False)
     return yap_df
 
 
-def get_df_word_stats(word_apperances: dict[str, int]) -> pd.DataFrame:
-    # Relies on dictionaries being ordered
-    words, counts = list(word_apperances.keys()), list(word_apperances.values())
-    words_data = {"word": words, "count": counts}
-    words_df = pd.DataFrame(words_data)
+def get_df_word_stats(store: StatsStore | StatsSnapshot) -> "pd.DataFrame":
+    import pandas as pd
+
+    # Word IDs are assigned in order, so the vocabulary lines up with the counts
+    words_data = {"word": store.vocab_words, "count": column(store.word_counts)}
+    words_df = pd.DataFrame(words_data, copy=False)
     words_df.sort_values(by=["count"], inplace=True, ascending=False)
     return words_df
 
 
-def save_yap_word_stats(
-    yap_stats: dict[str, UserStats], word_apperances: dict[str, int], start_time: str
-) -> None:
-    yap_df = get_df_yap_stats(yap_stats)
+def get_df_emote_stats(store: StatsStore | StatsSnapshot) -> "pd.DataFrame":
+    import pandas as pd
+
+    emotes_data = {
+        "emote": store.emote_names,
+        "emote id": store.emote_ids,
+        "count": column(store.emote_counts),
+    }
+    emotes_df = pd.DataFrame(emotes_data, copy=False)
+    emotes_df.sort_values(by=["count"], inplace=True, ascending=False)
+    return emotes_df
+
+
+def get_df_phrase_stats(store: StatsStore | StatsSnapshot) -> "pd.DataFrame":
+    import pandas as pd
+
+    phrases_df = pd.DataFrame(store.phrase_rows, columns=["phrase", "kind", "count"])
+    phrases_df.sort_values(by=["count"], inplace=True, ascending=False)
+    return phrases_df
+
+
+def get_df_overload(episodes: list[OverloadEpisode]) -> "pd.DataFrame":
+    import pandas as pd
+
+    def utc(t: float | None) -> str:
+        if t is None:
+            return ""
+        return datetime.fromtimestamp(t, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+    return pd.DataFrame(
+        {
+            "start": [utc(e.start) for e in episodes],
+            "end": [utc(e.end) for e in episodes],
+            "policy": [e.policy for e in episodes],
+            "received": [e.received for e in episodes],
+            "dropped": [e.dropped for e in episodes],
+            "sampled out": [e.sampled_out for e in episodes],
+            "sample rate": [e.sample_rate for e in episodes],
+        }
+    )
+
+
+def save_overload(
+    episodes: list[OverloadEpisode], start_time: str, channel: str | None = None
+) -> str:
+    """Writes the periods the stats of the session were sampled or lost messages."""
+    output_format = get_output_format()
+    extension = OUTPUT_FORMATS[output_format]
+    path = os.path.join(get_output_path(channel), f"{start_time}-overload.{extension}")
+    df = get_df_overload(episodes)
+    replace_atomic(
+        path, lambda tmp_path: write_table(df, tmp_path, output_format, "UTF-8")
+    )
+    return path
+
+
+def get_df_yap_display(yap_df: "pd.DataFrame") -> "pd.DataFrame":
     yap_df_display = yap_df.filter(
         ["username", "yap cost", "avg. message len", "vocab"], axis=1
     )
+    rows = UserSettings.settings.display_rows
+    return yap_df_display.head(rows) if rows > 0 else yap_df_display
 
-    words_df = get_df_word_stats(word_apperances)
 
-    save_df(yap_df, yap_df_display, "yap", "UTF-8", start_time)
-    save_df(
-        words_df, words_df, "words", "UTF-16", start_time
-    )  # UTF-16 needed for certain emojis
+def get_df_words_display(words_df: "pd.DataFrame") -> "pd.DataFrame":
+    rows = UserSettings.settings.display_rows
+    return words_df.head(rows) if rows > 0 else words_df
+
+
+def save_yap_word_stats(
+    store: StatsStore | StatsSnapshot,
+    start_time: str,
+    channel: str | None = None,
+    record_history: bool = True,
+    episodes: list[OverloadEpisode] | None = None,
+) -> None:
+    """Writes the full tables, and adds the session to the history (if `Keep
+    History` is on) unless `record_history` is False, e.g. for checkpoints.
+
+    Overload `episodes` are written next to the tables, since the counts of
+    those periods are incomplete or estimated.
+    """
+    start = time.perf_counter()
+    yap_df = get_df_yap_stats(store)
+    yap_df_display = get_df_yap_display(yap_df)
+
+    words_df = get_df_word_stats(store)
+    words_df_display = get_df_words_display(words_df)
+
+    paths = [
+        save_df(yap_df, yap_df_display, "yap", "UTF-8", start_time, channel),
+        save_df(
+            words_df, words_df_display, "words", "UTF-16", start_time, channel
+        ),  # UTF-16 needed for certain emojis
+    ]
+    if len(store.emote_counts):
+        emotes_df = get_df_emote_stats(store)
+        paths.append(
+            save_df(
+                emotes_df,
+                get_df_words_display(emotes_df.filter(["emote", "count"], axis=1)),
+                "emotes",
+                "UTF-8",
+                start_time,
+                channel,
+            )
+        )
+    phrases_df = get_df_phrase_stats(store)
+    if len(phrases_df):
+        phrases_display = phrases_df.filter(["phrase", "count"], axis=1)
+        paths.append(
+            save_df(
+                phrases_df,
+                get_df_words_display(phrases_display),
+                "phrases",
+                "UTF-16",
+                start_time,
+                channel,
+            )
+        )
+    if episodes:
+        path = save_overload(episodes, start_time, channel)
+        print(
+            f"Chat outpaced the bot {len(episodes)} time(s), "
+            f"the stats of those periods are incomplete: see {path}"
+        )
+    SAVE_STATS_SECONDS.observe(time.perf_counter() - start)
+
+    if record_history and UserSettings.settings.keep_history:
+        channel_name = os.path.basename(get_output_path(channel))
+        started_at = session_time(start_time, time.time())
+        try:
+            History().add_session(channel_name, start_time, store, started_at, paths)
+        except sqlite3.Error as e:
+            # The tables are saved, they can still be added with `history.py ingest`
+            print(f"Failed to add the session to the history: {e}")
+
+
+def get_yap_leaderboard(store: StatsStore, rows: int) -> list[dict]:
+    """Same rows as `get_df_yap_display`, from the store's incremental index."""
+    with store.lock:
+        top = store.top_yappers(rows if rows > 0 else len(store))
+        yap_stats = store.yap_stats
+        return [
+            {
+                "username": store.usernames[user_id],
+                "yap cost": curve(yap_stats.zscore(factor)),
+                "avg. message len": store.letters[user_id] / store.messages[user_id],
+                "vocab": store.vocab_sizes[user_id],
+            }
+            for user_id, factor in top
+        ]
+
+
+def get_words_leaderboard(store: StatsStore, rows: int) -> list[dict]:
+    with store.lock:
+        top = store.top_words(rows if rows > 0 else store.vocab_size)
+    return [{"word": word, "count": count} for word, count in top]
+
+
+def get_emotes_leaderboard(store: StatsStore, rows: int) -> list[dict]:
+    with store.lock:
+        top = store.top_emotes(rows if rows > 0 else len(store.emote_counts))
+    return [{"emote": name, "count": count} for _, name, count in top]
+
+
+def get_window_leaderboards(
+    store: StatsStore, windows: WindowStats, rows: int, now: float
+) -> dict[str, tuple[list[dict], list[dict]]]:
+    """The chatters with the most messages and the most used words of each
+    window, by its name, e.g. `5m`."""
+    boards = {}
+    with store.lock:
+        for window in windows.windows:
+            top = windows.top_yappers(window, rows, now)
+            yappers = [
+                {
+                    "username": username,
+                    "messages": messages,
+                    "avg. message len": letters / messages,
+                }
+                for username, messages, letters in top
+            ]
+            words = [
+                {"word": word, "count": count}
+                for word, count in windows.top_words(window, rows, now)
+            ]
+            boards[f"{window}m"] = (yappers, words)
+    return boards
+
+
+def save_leaderboards(
+    store: StatsStore, channel: str | None = None, windows: WindowStats | None = None
+) -> dict[str, tuple[list[dict], str]]:
+    """Only rewrites the OBS files, the full CSVs are left for `save_yap_word_stats`.
+
+    With `windows`, `yap-<window>.txt` and `words-<window>.txt` are written for
+    each of its windows as well. Returns the rows and display text of each
+    file, by name.
+    """
+    start = time.perf_counter()
+    rows = UserSettings.settings.display_rows
+    boards = {
+        "yap": (get_yap_leaderboard(store, rows), "UTF-8"),
+        "words": (get_words_leaderboard(store, rows), "UTF-16"),
+        "emotes": (get_emotes_leaderboard(store, rows), "UTF-8"),
+    }
+    if windows is not None:
+        window_boards = get_window_leaderboards(store, windows, rows, time.time())
+        for window, (yappers, words) in window_boards.items():
+            boards[f"yap-{window}"] = (yappers, "UTF-8")
+            boards[f"words-{window}"] = (words, "UTF-16")
+    rendered = {}
+    for name, (board, encode_type) in boards.items():
+        text = display_text(board)
+        write_display(text, name, encode_type, channel)
+        rendered[name] = (board, text)
+    OVERLAY_SECONDS.observe(time.perf_counter() - start)
+    return rendered
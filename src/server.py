@@ -1,12 +1,19 @@
 # Taken from: https://pytwitchapi.dev/en/stable/tutorial/user-auth-headless.html
 
 import asyncio
+import threading
 
-from flask import Flask, redirect, request
+from flask import Flask, Response, redirect, request
 from twitchAPI.oauth import UserAuthenticator
 from twitchAPI.twitch import Twitch
 from twitchAPI.type import AuthScope, TwitchAPIException
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler, make_server
 
+import live
+import metrics
+import profiling
+
+from tokens import TokenStore
 from user_prompt import server_prompt_loop
 from usersettings import UserSettings
 
@@ -17,6 +24,8 @@ MY_URL = "http://localhost:17563/login/confirm"
 app = Flask(__name__)
 twitch: Twitch
 auth: UserAuthenticator
+# Shared with the bot, which then doesn't need to log in itself
+TOKENS = TokenStore()
 
 
 @app.route("/login")
@@ -37,15 +46,75 @@ async def login_confirm():
         await twitch.set_user_authentication(token, TARGET_SCOPE, refresh)
     except TwitchAPIException:
         return "Failed to generate auth token", 400
+    TOKENS.save(token, refresh, TARGET_SCOPE)
     return "Sucessfully authenticated!"
 
 
+@app.route("/metrics")
+def get_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    # Scrapes would otherwise be logged in between the bot's own output
+    def log_request(self, *args, **kwargs) -> None:
+        pass
+
+
+@app.route("/stats")
+def get_stats_channels():
+    return {"channels": live.BOARDS.channels()}
+
+
+@app.route("/stats/<channel>/<board>.<fmt>")
+def get_stats(channel: str, board: str, fmt: str):
+    rendered = live.BOARDS.get(channel.lower(), board, fmt)
+    if rendered is None:
+        return "No such stats (yet)", 404
+
+    response = Response(mimetype=rendered.mimetype)
+    response.set_etag(rendered.etag)
+    # Clients must revalidate, which costs them nothing while the stats are unchanged
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["Access-Control-Allow-Origin"] = "*"
+    if request.if_none_match.contains(rendered.etag):
+        response.status_code = 304
+    else:
+        response.set_data(rendered.body)
+    return response
+
+
+@app.route("/profile", methods=["POST"])
+def post_profile():
+    seconds = request.args.get("seconds", profiling.DEFAULT_SECONDS, type=float)
+    allocations = request.args.get("allocations", "1") != "0"
+    try:
+        profile = profiling.start_capture(seconds, allocations=allocations)
+    except ValueError as e:
+        return str(e), 400
+    if profile is None:
+        return "Already profiling", 409
+    return {"seconds": seconds, "output": profile.output_path}, 202
+
+
+def serve_in_background(port: int) -> BaseWSGIServer:
+    """Serves the app from a daemon thread, so the bot can expose /metrics and /stats."""
+    server = make_server(
+        "127.0.0.1", port, app, threaded=True, request_handler=QuietRequestHandler
+    )
+    threading.Thread(
+        target=server.serve_forever, name="http-server", daemon=True
+    ).start()
+    return server
+
+
 async def twitch_setup():
     global twitch, auth
     twitch = await Twitch(
         UserSettings.settings.app_id, UserSettings.settings.app_secret
     )
     auth = UserAuthenticator(twitch, TARGET_SCOPE, url=MY_URL)
+    TOKENS.bind(twitch, TARGET_SCOPE)
 
 
 def server_main():
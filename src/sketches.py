@@ -0,0 +1,324 @@
+import heapq
+import math
+import zlib
+from typing import Collection, Hashable, Iterable
+
+
+def word_hash(word: str) -> int:
+    """32 bit hash of `word` that is the same in every process."""
+    # crc32 alone is linear, the multiply spreads its bits into the high bits
+    return (zlib.crc32(word.encode()) * 0x9E3779B1) & 0xFFFFFFFF
+
+
+class HyperLogLog:
+    """Approximate count of distinct word hashes in bounded memory.
+
+    Small sets are kept exactly, once more than `SPARSE_LIMIT` distinct hashes
+    are added they are folded into `2**P` one byte registers. The estimate then
+    has a relative standard error of 1.04 / sqrt(2**P), about 3.3%.
+    """
+
+    P = 10
+    M = 1 << P
+    SPARSE_LIMIT = 32
+    ALPHA = 0.7213 / (1 + 1.079 / M)
+    _RANK_BITS = 32 - P
+    _RANK_MASK = (1 << _RANK_BITS) - 1
+
+    __slots__ = ("_exact", "_registers", "_inv_sum", "_zeros")
+
+    def __init__(self) -> None:
+        self._exact: set[int] | None = set()
+        self._registers: bytearray | None = None
+        # Running sum of 2 ** -register and count of empty registers
+        self._inv_sum = float(self.M)
+        self._zeros = self.M
+
+    def update(self, hashes: Iterable[int]) -> None:
+        if self._exact is not None:
+            self._exact.update(hashes)
+            if len(self._exact) > self.SPARSE_LIMIT:
+                exact, self._exact = self._exact, None
+                self._registers = bytearray(self.M)
+                self._add_dense(exact)
+            return
+        self._add_dense(hashes)
+
+    def _add_dense(self, hashes: Iterable[int]) -> None:
+        registers = self._registers
+        rank_bits, rank_mask = self._RANK_BITS, self._RANK_MASK
+        for h in hashes:
+            index = h >> rank_bits
+            rank = rank_bits - (h & rank_mask).bit_length() + 1
+            old = registers[index]
+            if rank > old:
+                registers[index] = rank
+                self._inv_sum += 2.0**-rank - 2.0**-old
+                if old == 0:
+                    self._zeros -= 1
+
+    def __len__(self) -> int:
+        if self._exact is not None:
+            return len(self._exact)
+        estimate = self.ALPHA * self.M * self.M / self._inv_sum
+        if estimate <= 2.5 * self.M and self._zeros > 0:
+            # Linear counting is more accurate for small cardinalities
+            estimate = self.M * math.log(self.M / self._zeros)
+        return round(estimate)
+
+    def merge(self, other: "HyperLogLog") -> None:
+        """Adds every hash counted by `other`, as if they were all added here."""
+        if other._exact is not None:
+            self.update(other._exact)
+            return
+        if self._exact is not None:
+            exact, self._exact = self._exact, None
+            self._registers = other._registers[:]
+            self._inv_sum, self._zeros = other._inv_sum, other._zeros
+            self._add_dense(exact)
+            return
+
+        registers = self._registers
+        for index, rank in enumerate(other._registers):
+            old = registers[index]
+            if rank > old:
+                registers[index] = rank
+                self._inv_sum += 2.0**-rank - 2.0**-old
+                if old == 0:
+                    self._zeros -= 1
+
+    def copy(self) -> "HyperLogLog":
+        other = HyperLogLog()
+        other._exact = None if self._exact is None else set(self._exact)
+        other._registers = None if self._registers is None else self._registers[:]
+        other._inv_sum, other._zeros = self._inv_sum, self._zeros
+        return other
+
+
+class SpaceSaving:
+    """Approximate word counts in at most `capacity` entries (Space-Saving).
+
+    When full, a new word replaces the word with the smallest count and
+    inherits that count plus one. Counts therefore overestimate by at most
+    `errors[word]`, which is never more than `total / capacity`, and any word
+    used more than `total / capacity` times is guaranteed to be tracked.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.total = 0
+        self.counts: dict[str, int] = {}
+        self.errors: dict[str, int] = {}
+        # Min-heap of (count, word), entries may be stale and are fixed when popped
+        self._heap: list[tuple[int, str]] = []
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def update(self, words: Iterable[str]) -> None:
+        counts, heap = self.counts, self._heap
+        for w in words:
+            self.total += 1
+            count = counts.get(w)
+            if count is not None:
+                counts[w] = count + 1
+            elif len(counts) < self.capacity:
+                counts[w] = 1
+                heapq.heappush(heap, (1, w))
+            else:
+                self._replace_min(w)
+
+    def add(self, word: str, count: int = 1) -> None:
+        """Counts `count` uses of `word` at once, the same as `update([word] * count)`."""
+        self.total += count
+        current = self.counts.get(word)
+        if current is not None:
+            self.counts[word] = current + count
+        elif len(self.counts) < self.capacity:
+            self.counts[word] = count
+            heapq.heappush(self._heap, (count, word))
+        else:
+            self._replace_min(word, count)
+
+    def _replace_min(self, word: str, added: int = 1) -> None:
+        counts, heap = self.counts, self._heap
+        while True:
+            count, min_word = heapq.heappop(heap)
+            current = counts.get(min_word)
+            if current == count:
+                break
+            if current is not None:
+                # Count grew since this entry was pushed
+                heapq.heappush(heap, (current, min_word))
+
+        del counts[min_word]
+        self.errors.pop(min_word, None)
+        counts[word] = count + added
+        self.errors[word] = count
+        heapq.heappush(heap, (count + added, word))
+
+    def _min_count(self) -> int:
+        # Any word not tracked by a full summary was used at most this many times
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    def merge(self, other: "SpaceSaving") -> None:
+        """Adds the words counted by `other`, keeping the same error guarantees.
+
+        A word only tracked by one side is assumed to have the other side's
+        minimum count, so merged counts still never underestimate.
+        """
+        self_min, other_min = self._min_count(), other._min_count()
+        merged: dict[str, int] = {}
+        errors: dict[str, int] = {}
+        for w in self.counts.keys() | other.counts.keys():
+            count = self.counts.get(w)
+            if count is None:
+                count = error = self_min
+            else:
+                error = self.errors.get(w, 0)
+            other_count = other.counts.get(w)
+            if other_count is None:
+                count += other_min
+                error += other_min
+            else:
+                count += other_count
+                error += other.errors.get(w, 0)
+            merged[w] = count
+            if error:
+                errors[w] = error
+
+        if len(merged) > self.capacity:
+            kept = heapq.nlargest(self.capacity, merged.items(), key=lambda i: i[1])
+            merged = dict(kept)
+            errors = {w: e for w, e in errors.items() if w in merged}
+        self.total += other.total
+        self.counts, self.errors = merged, errors
+        self._heap = [(count, w) for w, count in merged.items()]
+        heapq.heapify(self._heap)
+
+    def top(self, k: int) -> list[tuple[str, int]]:
+        return heapq.nlargest(k, self.counts.items(), key=lambda item: item[1])
+
+
+class LossyCounter:
+    """Approximate counts of items in memory that follows the frequent ones
+    (Lossy Counting).
+
+    Items are counted by their `hash`, and an item itself is only kept once it
+    has been counted twice, so the many items seen once cost a pair of ints.
+    Every `width` counts, items whose count (plus the counts they may have
+    missed before being tracked, `errors`) is at most the number of such
+    periods so far are pruned. Counts therefore underestimate by at most
+    `total / width`, and any item counted more often than that is kept.
+
+    `hash` of a str differs between processes, so pickling keeps the items and
+    rehashes them when loaded, leaving out the ones counted once. Items new to
+    a restored counter may have missed one count because of that, `missed`.
+    """
+
+    def __init__(self, width: int) -> None:
+        self.width = width
+        self.total = 0
+        # Periods of `width` counts pruned so far
+        self.buckets = 0
+        self.missed = 0
+        self.counts: dict[int, int] = {}
+        self.errors: dict[int, int] = {}
+        self.items: dict[int, Hashable] = {}
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def update(self, items: Collection[Hashable], count: int = 1) -> None:
+        """Counts each of `items` `count` times."""
+        counts, kept = self.counts, self.items
+        # `missed` is at most 1, so this is the larger of the two
+        error = self.buckets or self.missed
+        for item in items:
+            key = hash(item)
+            current = counts.get(key)
+            if current is None:
+                counts[key] = count
+                if error:
+                    self.errors[key] = error
+                if count > 1:
+                    kept[key] = item
+            else:
+                if current == 1:
+                    kept[key] = item
+                counts[key] = current + count
+        self.total += len(items) * count
+        if self.total >= (self.buckets + 1) * self.width:
+            self.prune()
+
+    def prune(self) -> None:
+        buckets = self.buckets = self.total // self.width
+        errors = self.errors
+        # Most entries are pruned, copying the rest is quicker than deleting them
+        counts = self.counts = {
+            key: count
+            for key, count in self.counts.items()
+            if count + errors.get(key, 0) > buckets
+        }
+        self.errors = {key: error for key, error in errors.items() if key in counts}
+        self.items = {key: item for key, item in self.items.items() if key in counts}
+
+    def merge(self, other: "LossyCounter") -> None:
+        """Adds the items counted by `other`, keeping the same error guarantees.
+
+        An item only tracked by one side may have missed up to the other
+        side's pruned periods, which is added to its error.
+        """
+        counts, errors, kept = self.counts, self.errors, self.items
+        other_missed = max(other.buckets, other.missed)
+        for key in counts.keys() - other.counts.keys():
+            errors[key] = errors.get(key, 0) + other_missed
+        missed = max(self.buckets, self.missed)
+        for key, count in other.counts.items():
+            error = other.errors.get(key, 0)
+            current = counts.get(key)
+            if current is None:
+                current, error = 0, error + missed
+            counts[key] = current + count
+            if error:
+                errors[key] = errors.get(key, 0) + error
+            item = other.items.get(key)
+            if item is not None:
+                kept[key] = item
+        self.total += other.total
+        self.missed = max(self.missed, other.missed)
+        self.prune()
+
+    def top(self, k: int) -> list[tuple[Hashable, int]]:
+        """The `k` most counted items seen more than once, with their counts."""
+        counts = self.counts
+        top = heapq.nlargest(k, self.items, key=counts.__getitem__)
+        return [(self.items[key], counts[key]) for key in top]
+
+    def __getstate__(self) -> dict:
+        counts, errors = self.counts, self.errors
+        return {
+            "width": self.width,
+            "total": self.total,
+            "buckets": self.buckets,
+            "missed": max(self.missed, int(len(self.items) < len(self.counts))),
+            "items": [
+                (item, counts[key], errors.get(key, 0))
+                for key, item in self.items.items()
+            ],
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        self.width = state["width"]
+        self.total = state["total"]
+        self.buckets = state["buckets"]
+        self.missed = state["missed"]
+        self.counts, self.errors, self.items = {}, {}, {}
+        for item, count, error in state["items"]:
+            key = hash(item)
+            self.counts[key] = count
+            self.items[key] = item
+            if error:
+                self.errors[key] = error
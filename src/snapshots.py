@@ -0,0 +1,110 @@
+import threading
+import time
+import traceback
+
+import live
+from channels import ChannelStats
+from save_stats import save_leaderboards, save_yap_word_stats
+from usersettings import UserSettings
+
+
+class SnapshotWriter:
+    """Keeps the overlay files of every channel up to date while the bot runs.
+
+    Every `Snapshot Interval` seconds a worker thread rewrites `yap.txt`/`words.txt`
+    from each channel's leaderboards, skipping channels where no messages arrived
+    since the last write. The boards of a channel's time windows are rewritten
+    with them, and also once messages leave a window. Every `Checkpoint Interval`
+    seconds a channel's timestamped CSVs are written as well, from a copy of its
+    store's columns, and its journal is checkpointed. Channels' checkpoints are spread out over
+    the interval, rather than all happening at once.
+
+    The leaderboards written are also published to `live.BOARDS` for the HTTP API.
+    """
+
+    def __init__(self, channels: list[ChannelStats]) -> None:
+        self.channels = channels
+        self._stopped = threading.Event()
+        self._worker: threading.Thread | None = None
+
+        interval = UserSettings.snapshot().checkpoint_interval
+        now = time.monotonic()
+        for i, channel in enumerate(channels):
+            channel.last_checkpoint = now - interval * i / len(channels)
+
+    def start(self) -> None:
+        self._worker = threading.Thread(
+            target=self._run, name="snapshot-writer", daemon=True
+        )
+        self._worker.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+
+    def write(self, channel: ChannelStats, checkpoint: bool = False) -> bool:
+        """Writes the overlay files (and CSVs if `checkpoint`), returning whether it did."""
+        store = channel.store
+        windows = channel.windows
+        expiring = False
+        if windows is not None:
+            # The time windows' boards change as time passes, even without messages
+            with store.lock:
+                expiring = windows.expiring(time.time())
+        if store.version == channel.written_version and not checkpoint and not expiring:
+            return False
+
+        version = store.version
+        if len(store) == 0:
+            return False
+
+        if checkpoint:
+            channel.journal.checkpoint(store)
+            save_yap_word_stats(
+                store.snapshot(),
+                channel.start_time,
+                channel.name,
+                record_history=False,
+            )
+        if version != channel.written_version or expiring:
+            boards = save_leaderboards(store, channel.name, windows)
+            for name, (rows, text) in boards.items():
+                live.BOARDS.publish(channel.name, name, rows, text)
+        channel.written_version = version
+        return True
+
+    def _run(self) -> None:
+        while True:
+            settings = UserSettings.snapshot()
+            # Still wake up periodically while disabled, in case it's turned back on
+            if self._stopped.wait(settings.snapshot_interval or 1):
+                return
+            if settings.snapshot_interval == 0:
+                continue
+
+            self.write_due(settings.checkpoint_interval)
+
+    def write_due(self, checkpoint_interval: float) -> None:
+        """Writes every channel, checkpointing those not checkpointed for
+        `checkpoint_interval` seconds. A channel failing to write is retried next time.
+        """
+        for channel in self.channels:
+            checkpoint = (
+                checkpoint_interval > 0
+                and time.monotonic() - channel.last_checkpoint >= checkpoint_interval
+            )
+            try:
+                self.write(channel, checkpoint)
+            except OSError as e:
+                # e.g. the file being locked by another program, try again next time
+                print(f"Failed to write snapshot of {channel.name}: {e}")
+                continue
+            except Exception:
+                # A bug shouldn't stop the live output for the rest of the session
+                print(f"Failed to write snapshot of {channel.name}:")
+                traceback.print_exc()
+                continue
+            if checkpoint:
+                channel.last_checkpoint = time.monotonic()
@@ -0,0 +1,511 @@
+import heapq
+import math
+import threading
+from array import array
+from dataclasses import dataclass, field
+from typing import Hashable, Iterator
+
+from leaderboard import Leaderboard, RunningStats
+from phrases import PhraseCounter
+from sketches import HyperLogLog, SpaceSaving, word_hash
+from tokenizer import Emotes, Tokens
+from userstats import UserStats
+
+
+# Calculate 'yap' factor based on collected stats, many magic numbers are found here
+def yap_factor(letter_count: int, messages: int, vocab: int) -> float:
+    scalar = letter_count**0.75
+    uniq_word_ratio = (vocab**1.2) / messages
+    avg_ltrs = letter_count / messages
+    return math.log(scalar * (uniq_word_ratio + avg_ltrs))
+
+
+class Vocabulary:
+    """Maps every word seen to a compact integer ID, storing each string once."""
+
+    __slots__ = ("ids", "words")
+
+    def __init__(self) -> None:
+        self.ids: dict[str, int] = {}
+        self.words: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def intern(self, word: str) -> int:
+        word_id = self.ids.get(word)
+        if word_id is None:
+            word_id = self.ids[word] = len(self.words)
+            self.words.append(word)
+        return word_id
+
+    def intern_many(self, words: list[str]) -> list[int]:
+        ids = self.ids
+        word_ids = []
+        for w in words:
+            word_id = ids.get(w)
+            if word_id is None:
+                word_id = ids[w] = len(self.words)
+                self.words.append(w)
+            word_ids.append(word_id)
+        return word_ids
+
+
+def copy_state(value):
+    """Copy of `value` that shares nothing mutable with it: lists, arrays, dicts
+    and sets are copied (their items aren't), and so are the attributes of objects."""
+    if isinstance(value, (list, array)):
+        return value[:]
+    if isinstance(value, (dict, set)):
+        return value.copy()
+    if value is None or isinstance(value, (bool, int, float, str, tuple)):
+        return value
+    # Not through copy.copy, which would go through pickling's hooks
+    other = object.__new__(type(value))
+    for name in getattr(value, "__slots__", None) or vars(value):
+        setattr(other, name, copy_state(getattr(value, name)))
+    return other
+
+
+@dataclass(frozen=True)
+class StatsSnapshot:
+    """Point in time copy of a `StatsStore`'s columns, safe to read from any thread."""
+
+    version: int
+    usernames: list[str]
+    letters: array
+    word_totals: array
+    messages: array
+    vocab_sizes: array
+    vocab_words: list[str]
+    word_counts: array
+    emote_ids: list[str] = field(default_factory=list)
+    emote_names: list[str] = field(default_factory=list)
+    emote_counts: array = field(default_factory=lambda: array("q"))
+    phrase_rows: list[tuple[str, str, int]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.usernames)
+
+
+class StatsStore:
+    """Columnar session stats, with words shared between users through a `Vocabulary`.
+
+    Every chatter gets a user ID indexing `usernames`, `letters`, `word_totals`,
+    `messages`, `vocab_sizes` and `user_vocab` (their set of word IDs).
+    `word_counts[word_id]` is the number of times that word was used.
+
+    Twitch emotes are counted apart from words, by emote ID interned in
+    `emotes`: `emote_counts[i]` is how often the emote with ID `emotes.words[i]`
+    was used, `emote_names[i]` is its name.
+
+    With a `phrase_capacity`, the most repeated phrases of the messages given
+    to `add_phrases` are counted by `phrases` (every `phrase_sample`th message),
+    otherwise it's None.
+
+    Columns are `array`s rather than NumPy arrays so per-message updates stay
+    cheap, they can be viewed as NumPy arrays without copying through
+    `numpy.frombuffer`. An array can't grow while such a view exists, so only
+    view a store that is no longer being written to, or a `snapshot` of it.
+
+    Writers should hold `lock` while updating the store, `version` is bumped on
+    every message so readers can tell when anything changed.
+
+    `word_board` ranks word IDs by count and `yap_board` ranks user IDs by yap
+    factor, with `yap_stats` tracking the factors' mean and deviation. They are
+    brought up to date for the words and users changed since the last query by
+    `refresh_leaderboards`, rather than on every message.
+    """
+
+    def __init__(self, phrase_capacity: int = 0, phrase_sample: int = 1) -> None:
+        self.lock = threading.Lock()
+        self.version = 0
+        self._init_words()
+        self._init_emotes()
+        self.phrases = (
+            PhraseCounter(phrase_capacity, phrase_sample) if phrase_capacity else None
+        )
+
+        self.user_ids: dict[str, int] = {}
+        self.usernames: list[str] = []
+        self.letters = array("q")
+        self.word_totals = array("q")
+        self.messages = array("q")
+        self.vocab_sizes = array("q")
+        self.user_vocab: list[set[int] | HyperLogLog] = []
+
+        self.yap_board = Leaderboard()
+        self.yap_stats = RunningStats()
+        self._dirty_users: set[int] = set()
+        # Users whose vocab was copied since `copy`, None unless a copy shares them
+        self._unshared: set[int] | None = None
+
+    def _init_words(self) -> None:
+        self.vocab = Vocabulary()
+        self.word_counts = array("q")
+        self.word_board = Leaderboard()
+        self._dirty_words: set[int] = set()
+
+    def _init_emotes(self) -> None:
+        self.emotes = Vocabulary()
+        self.emote_names: list[str] = []
+        self.emote_counts = array("q")
+
+    def __len__(self) -> int:
+        return len(self.usernames)
+
+    # Locks can't be pickled, a restored store gets a new one
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+        # Checkpoints from before emotes were counted apart
+        if "emotes" not in state:
+            self._init_emotes()
+        if "phrases" not in state:
+            self.phrases = None
+        self._unshared = None
+
+    def copy(self) -> "StatsStore":
+        """Copy of the store to read (e.g. pickle) without holding `lock`, call
+        under it.
+
+        Columns and indexes are copied whole, which takes a few milliseconds even
+        for a long session. Copying every user's vocab would take longer than
+        pickling it, so they're shared with the copy instead, and the store copies
+        a user's vocab before changing it, until `release_copy`.
+        """
+        other = object.__new__(type(self))
+        for name, value in vars(self).items():
+            if name != "lock" and name != "user_vocab":
+                setattr(other, name, copy_state(value))
+        other.lock = threading.Lock()
+        other.user_vocab = self.user_vocab[:]
+        self._unshared = set()
+        return other
+
+    def release_copy(self) -> None:
+        """Stops copying vocabs for the copy made by `copy`, call under `lock`."""
+        self._unshared = None
+
+    def _own_vocab(self, user_id: int) -> set[int] | HyperLogLog:
+        user_vocab = self.user_vocab[user_id]
+        unshared = self._unshared
+        if unshared is not None and user_id not in unshared:
+            user_vocab = self.user_vocab[user_id] = user_vocab.copy()
+            unshared.add(user_id)
+        return user_vocab
+
+    @property
+    def vocab_words(self) -> list[str]:
+        return self.vocab.words
+
+    @property
+    def vocab_size(self) -> int:
+        """Number of distinct words counted."""
+        return len(self.vocab)
+
+    @property
+    def emote_ids(self) -> list[str]:
+        return self.emotes.words
+
+    @property
+    def phrase_rows(self) -> list[tuple[str, str, int]]:
+        return [] if self.phrases is None else self.phrases.rows()
+
+    def add_user(self, username: str) -> int:
+        user_id = self.user_ids[username] = len(self.usernames)
+        self.usernames.append(username)
+        for column in (self.letters, self.word_totals, self.messages, self.vocab_sizes):
+            column.append(0)
+        self.user_vocab.append(self._new_user_vocab())
+        return user_id
+
+    def _new_user_vocab(self) -> set[int] | HyperLogLog:
+        return set()
+
+    def _count_words(self, words: list[str]) -> list[Hashable]:
+        """Counts `words`, returning the keys to add to the user's vocab."""
+        word_ids = self.vocab.intern_many(words)
+
+        counts = self.word_counts
+        missing = len(self.vocab) - len(counts)
+        if missing > 0:
+            counts.frombytes(bytes(counts.itemsize * missing))
+        for word_id in word_ids:
+            counts[word_id] += 1
+        self._dirty_words.update(word_ids)
+        return word_ids
+
+    def _count_distinct(self, counts: dict[str, int]) -> list[Hashable]:
+        """`_count_words`, from the number of times each distinct word was used."""
+        ids, vocab, word_counts = self.vocab.ids, self.vocab, self.word_counts
+        word_ids = []
+        for word, count in counts.items():
+            word_id = ids.get(word)
+            if word_id is None:
+                word_id = vocab.intern(word)
+                word_counts.append(0)
+            word_counts[word_id] += count
+            word_ids.append(word_id)
+        self._dirty_words.update(word_ids)
+        return word_ids
+
+    def add_message(self, username: str, words: list[str]) -> int:
+        """Adds a tokenized message to the stats, returning the user's ID."""
+        self.version += 1
+        word_ids = self._count_words(words)
+        return self._add_to_user(username, word_ids, len("".join(words)), len(words))
+
+    def add_tokens(
+        self, username: str, tokens: Tokens, emotes: Emotes | None = None
+    ) -> int:
+        """`add_message` for a message tokenized by `tokenize_message`, with the
+        Twitch `emotes` cut out of it by `split_emotes`.
+
+        Each distinct word is only looked up once, which makes emote walls cheap.
+        Emotes count towards the user's letters, but not their vocab.
+        """
+        self.version += 1
+        words, counts, letters = tokens
+        if counts is None:
+            word_ids = self._count_words(words)
+        else:
+            word_ids = self._count_distinct(counts)
+        if emotes is not None:
+            letters += self._count_emotes(emotes)
+        return self._add_to_user(username, word_ids, letters, len(words))
+
+    def add_phrases(self, messages: list[list[str]], weight: int = 1) -> None:
+        """Counts the phrases of a batch of messages' words `weight` times, if
+        `phrases` is on. Kept apart from `add_message` so repeats of a message
+        in the batch can be counted together."""
+        if self.phrases is not None:
+            self.phrases.add_batch(messages, weight)
+
+    def _count_emotes(self, emotes: Emotes) -> int:
+        """Counts `emotes`, returning their letters."""
+        table, counts, names = self.emotes, self.emote_counts, self.emote_names
+        for emote_id, name, count in emotes[0]:
+            index = table.intern(emote_id)
+            if index == len(counts):
+                counts.append(0)
+                names.append(name)
+            counts[index] += count
+        return emotes[1]
+
+    def _add_to_user(
+        self, username: str, word_ids: list[Hashable], letters: int, words: int
+    ) -> int:
+        user_id = self.user_ids.get(username)
+        if user_id is None:
+            user_id = self.add_user(username)
+        self.letters[user_id] += letters
+        self.word_totals[user_id] += words
+        self.messages[user_id] += 1
+        user_vocab = self._own_vocab(user_id)
+        user_vocab.update(word_ids)
+        self.vocab_sizes[user_id] = len(user_vocab)
+        self._dirty_users.add(user_id)
+        return user_id
+
+    def merge(self, other: "StatsStore") -> None:
+        """Adds every message counted by `other`, as if they were added here.
+
+        Users new to this store are appended in `other`'s order.
+        """
+        self.version += other.version
+        word_keys = self._merge_words(other)
+        self._count_emotes(
+            (list(zip(other.emote_ids, other.emote_names, other.emote_counts)), 0)
+        )
+        if other.phrases is not None:
+            if self.phrases is None:
+                self.phrases = PhraseCounter(
+                    other.phrases.capacity, other.phrases.sample
+                )
+            self.phrases.merge(other.phrases)
+
+        for other_id, username in enumerate(other.usernames):
+            user_id = self.user_ids.get(username)
+            if user_id is None:
+                user_id = self.add_user(username)
+            self.letters[user_id] += other.letters[other_id]
+            self.word_totals[user_id] += other.word_totals[other_id]
+            self.messages[user_id] += other.messages[other_id]
+            user_vocab = self._own_vocab(user_id)
+            self._merge_user_vocab(user_vocab, other.user_vocab[other_id], word_keys)
+            self.vocab_sizes[user_id] = len(user_vocab)
+            self._dirty_users.add(user_id)
+
+    def _merge_words(self, other: "StatsStore") -> list[int] | None:
+        """Adds `other`'s word counts, returning its word IDs' IDs in this store."""
+        word_ids = self.vocab.intern_many(other.vocab.words)
+        counts = self.word_counts
+        missing = len(self.vocab) - len(counts)
+        if missing > 0:
+            counts.frombytes(bytes(counts.itemsize * missing))
+        for word_id, count in zip(word_ids, other.word_counts):
+            counts[word_id] += count
+        self._dirty_words.update(word_ids)
+        return word_ids
+
+    def _merge_user_vocab(
+        self, user_vocab: set[int], other_vocab: set[int], word_keys: list[int]
+    ) -> None:
+        user_vocab.update([word_keys[word_id] for word_id in other_vocab])
+
+    def refresh_leaderboards(self) -> None:
+        """Re-scores everything changed since the last refresh, call under `lock`."""
+        self._refresh_words()
+
+        yap_board, yap_stats = self.yap_board, self.yap_stats
+        for user_id in self._dirty_users:
+            factor = yap_factor(
+                self.letters[user_id], self.messages[user_id], self.vocab_sizes[user_id]
+            )
+            old = yap_board.scores.get(user_id)
+            if old is None:
+                yap_stats.add(factor)
+            else:
+                yap_stats.replace(old, factor)
+            yap_board.update(user_id, factor)
+        self._dirty_users.clear()
+
+    def _refresh_words(self) -> None:
+        counts, word_board = self.word_counts, self.word_board
+        for word_id in self._dirty_words:
+            word_board.update(word_id, counts[word_id])
+        self._dirty_words.clear()
+
+    def top_words(self, k: int) -> list[tuple[str, int]]:
+        """Returns the `k` most used (word, count) pairs, call under `lock`."""
+        self.refresh_leaderboards()
+        words = self.vocab.words
+        return [
+            (words[word_id], int(count)) for word_id, count in self.word_board.top(k)
+        ]
+
+    def top_emotes(self, k: int) -> list[tuple[str, str, int]]:
+        """Returns the `k` most used (emote ID, name, count), call under `lock`."""
+        # There are only as many emotes as a channel has, no need for an index
+        top = heapq.nlargest(
+            k, range(len(self.emote_counts)), key=self.emote_counts.__getitem__
+        )
+        ids, names = self.emotes.words, self.emote_names
+        return [(ids[i], names[i], self.emote_counts[i]) for i in top]
+
+    def top_yappers(self, k: int) -> list[tuple[int, float]]:
+        """Returns the `k` (user ID, yap factor) pairs with the highest factor, call
+        under `lock`."""
+        self.refresh_leaderboards()
+        return self.yap_board.top(k)
+
+    def snapshot(self) -> StatsSnapshot:
+        """Copies the columns under `lock`, which only takes a few memcpys."""
+        with self.lock:
+            return StatsSnapshot(
+                self.version,
+                self.usernames[:],
+                self.letters[:],
+                self.word_totals[:],
+                self.messages[:],
+                self.vocab_sizes[:],
+                self.vocab_words[:],
+                self.word_counts[:],
+                self.emotes.words[:],
+                self.emote_names[:],
+                self.emote_counts[:],
+                self.phrase_rows,
+            )
+
+    def user_stats(self, username: str) -> UserStats:
+        """Builds a standalone `UserStats` with the user's current stats."""
+        user_id = self.user_ids[username]
+        user_stats = UserStats(username)
+        user_stats.letter_count = self.letters[user_id]
+        user_stats.word_count = self.word_totals[user_id]
+        user_stats.messages = self.messages[user_id]
+        user_stats.unique_words = self.user_vocab[user_id].copy()
+        return user_stats
+
+    def word_appearances(self) -> Iterator[tuple[str, int]]:
+        return zip(self.vocab_words, self.word_counts)
+
+    def user_words(self, username: str) -> set[str]:
+        """The words a user has sent, only available when counting exactly."""
+        words = self.vocab.words
+        return {words[word_id] for word_id in self.user_vocab[self.user_ids[username]]}
+
+
+class ApproxStatsStore(StatsStore):
+    """`StatsStore` whose memory stays bounded however long the stream runs.
+
+    Each user's vocab is a `HyperLogLog`, so vocab sizes are exact up to 32
+    distinct words and within about 3.3% (one standard error) above that.
+    Words are counted by `SpaceSaving` in at most `word_capacity` entries, counts
+    overestimate by at most total words / `word_capacity`, and every word used
+    more often than that is guaranteed to be in the word table.
+    """
+
+    def __init__(
+        self, word_capacity: int, phrase_capacity: int = 0, phrase_sample: int = 1
+    ) -> None:
+        self.word_counter = SpaceSaving(word_capacity)
+        super().__init__(phrase_capacity, phrase_sample)
+
+    def _init_words(self) -> None:
+        pass
+
+    @property
+    def vocab_words(self) -> list[str]:
+        return list(self.word_counter.counts)
+
+    @property
+    def vocab_size(self) -> int:
+        return len(self.word_counter)
+
+    @property
+    def word_counts(self) -> array:
+        return array("q", self.word_counter.counts.values())
+
+    def _new_user_vocab(self) -> HyperLogLog:
+        return HyperLogLog()
+
+    def _count_words(self, words: list[str]) -> list[Hashable]:
+        self.word_counter.update(words)
+        return [word_hash(w) for w in set(words)]
+
+    def _count_distinct(self, counts: dict[str, int]) -> list[Hashable]:
+        for word, count in counts.items():
+            self.word_counter.add(word, count)
+        return [word_hash(w) for w in counts]
+
+    def _merge_words(self, other: "ApproxStatsStore") -> None:
+        self.word_counter.merge(other.word_counter)
+
+    def _merge_user_vocab(
+        self, user_vocab: HyperLogLog, other_vocab: HyperLogLog, word_keys: None
+    ) -> None:
+        user_vocab.merge(other_vocab)
+
+    def _refresh_words(self) -> None:
+        pass
+
+    def top_words(self, k: int) -> list[tuple[str, int]]:
+        return self.word_counter.top(k)
+
+
+def create_stats_store(
+    approximate: bool,
+    word_capacity: int,
+    phrase_capacity: int = 0,
+    phrase_sample: int = 1,
+) -> StatsStore:
+    if approximate:
+        return ApproxStatsStore(word_capacity, phrase_capacity, phrase_sample)
+    return StatsStore(phrase_capacity, phrase_sample)
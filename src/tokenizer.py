@@ -0,0 +1,227 @@
+import re
+import string
+import sys
+from functools import lru_cache
+from typing import Iterable
+
+# Repeated message texts whose tokens are kept, copypastas and emote walls
+# repeat the same text many times in a row
+MESSAGE_CACHE_SIZE = 4096
+# Recent message texts a repeat is looked for among, up to this many
+RECENT_TEXTS = 4096
+
+# Leading/trailing characters removed from words when stripping punctuation
+PUNCTUATION = string.punctuation + "\u2026\u201c\u201d\u2018\u2019\u00ab\u00bb"
+
+EMOJI_PATTERN = re.compile(
+    "["
+    "\U0001f000-\U0001faff"  # symbols, pictographs, emoticons, flags
+    "\u2600-\u27bf"  # miscellaneous symbols and dingbats
+    "\u2b00-\u2bff"  # arrows and stars
+    "\ufe0f\u200d\u20e3"  # variation selector, zero width joiner, keycap
+    "]+"
+)
+
+
+@lru_cache(maxsize=4096)
+def _validate_url(word: str) -> bool:
+    import validators
+
+    return bool(validators.url(word))
+
+
+def is_url(word: str) -> bool:
+    # Every URL `validators.url` accepts has a scheme, so words without a colon
+    # never need the full (slow) validation
+    return ":" in word and _validate_url(word)
+
+
+def filter_urls(word_list: list[str]) -> list[str]:
+    return [w for w in word_list if not is_url(w)]
+
+
+def filter_commands(word_list: list[str]) -> list[str]:
+    return word_list if not word_list[0].startswith("!") else []
+
+
+def filter_word_list(word_list: list[str]) -> list[str]:
+    return filter_urls(word_list)
+
+
+def tokenize(
+    msg: str, strip_punctuation: bool = False, strip_emoji: bool = False
+) -> list[str]:
+    """Lowercases and splits `msg`, dropping links.
+
+    With `strip_punctuation` leading/trailing punctuation is removed from every
+    word, with `strip_emoji` emojis are removed. Words left empty are dropped.
+    """
+    msg = msg.lower()
+    if strip_emoji:
+        msg = EMOJI_PATTERN.sub(" ", msg)
+    if not strip_punctuation:
+        return [w for w in msg.split() if ":" not in w or not _validate_url(w)]
+
+    words = []
+    for w in msg.split():
+        if ":" in w and _validate_url(w):
+            continue
+        w = w.strip(PUNCTUATION)
+        if w:
+            words.append(w)
+    return words
+
+
+# A message's words, how many times each distinct word appears in it (only kept
+# for long messages made of a few words repeated, e.g. emote walls, otherwise
+# None) and its letters. Shared between every repeat of the message, never modify one.
+Tokens = tuple[list[str], dict[str, int] | None, int]
+
+
+def make_tokens(
+    msg: str, strip_punctuation: bool = False, strip_emoji: bool = False
+) -> Tokens:
+    """`tokenize`, with the counts and letters of `Tokens`."""
+    if not strip_punctuation and not strip_emoji:
+        words = [w for w in msg.lower().split() if ":" not in w or not _validate_url(w)]
+    else:
+        words = tokenize(msg, strip_punctuation, strip_emoji)
+    counts = None
+    # Emote walls repeat their first word, most other long messages don't
+    if len(words) >= 8 and words.count(words[0]) > 1:
+        distinct = set(words)
+        if len(distinct) <= len(words) // 2:
+            counts = dict.fromkeys(distinct, 0)
+            for w in words:
+                counts[w] += 1
+    return words, counts, len("".join(words))
+
+
+class MessageCache:
+    """`Tokens` of repeated message texts, tokenized with the same options.
+
+    The last `recent` texts tokenized are kept, across batches since at normal
+    chat rates a batch is a message or two. A text seen again among them is
+    repeated, copypastas and emote walls, and its `Tokens` are kept for every
+    later copy, up to `size` repeated texts before starting over.
+
+    Keeping the `Tokens` of every text cost more than the repeats saved on
+    typical chat: each kept `Tokens` holds off the garbage collector's young
+    generation, which then collects more often over the whole store. Strings
+    aren't tracked by the garbage collector, so keeping recent texts doesn't.
+    """
+
+    def __init__(self, size: int, recent: int = RECENT_TEXTS) -> None:
+        self.size = size
+        self.recent = recent
+        self.hits = 0
+        self.misses = 0
+        self.options = (False, False)
+        self.repeated: dict[str, Tokens] = {}
+        self._recent: dict[str, None] = {}
+
+    def __len__(self) -> int:
+        return len(self.repeated)
+
+    def clear(self) -> None:
+        self.repeated = {}
+        self._recent = {}
+
+    def tokenize(
+        self, msgs: Iterable[str], strip_punctuation: bool, strip_emoji: bool
+    ) -> list[Tokens]:
+        if (strip_punctuation, strip_emoji) != self.options:
+            self.clear()
+            self.options = (strip_punctuation, strip_emoji)
+        repeated, recent = self.repeated, self._recent
+        tokenized = []
+        misses = 0
+        for msg in msgs:
+            tokens = repeated.get(msg)
+            if tokens is None:
+                tokens = make_tokens(msg, strip_punctuation, strip_emoji)
+                misses += 1
+                if msg in recent:
+                    repeated[msg] = tokens
+                else:
+                    recent[msg] = None
+            tokenized.append(tokens)
+        self.misses += misses
+        self.hits += len(tokenized) - misses
+        if len(repeated) > self.size:
+            self.repeated = {}
+        if len(recent) > self.recent:
+            self._recent = {}
+        return tokenized
+
+
+MESSAGE_CACHE = MessageCache(MESSAGE_CACHE_SIZE)
+
+
+def tokenize_messages(
+    msgs: Iterable[str], strip_punctuation: bool = False, strip_emoji: bool = False
+) -> list[Tokens]:
+    """`make_tokens` of each message, repeats of a recent text share its `Tokens`."""
+    return MESSAGE_CACHE.tokenize(msgs, strip_punctuation, strip_emoji)
+
+
+def tokenize_message(
+    msg: str, strip_punctuation: bool = False, strip_emoji: bool = False
+) -> Tokens:
+    return MESSAGE_CACHE.tokenize([msg], strip_punctuation, strip_emoji)[0]
+
+
+# Twitch's emotes tag as parsed by twitchAPI (`ChatMessage.emotes`): the
+# inclusive character positions of each emote ID's uses in the message
+EmoteTag = dict[str, list[dict[str, str]]]
+# Each emote's (ID, name, uses) in a message, and their letters together
+Emotes = tuple[list[tuple[str, str, int]], int]
+
+
+def split_emotes(text: str, emote_tag: EmoteTag) -> tuple[str, Emotes]:
+    """Cuts Twitch emotes out of `text` by their positions, returning the rest of
+    the text (for the word tokenizer) and the emotes.
+
+    Emote names keep their case, `Kappa` and `KAPPA` aren't the same emote.
+    """
+    spans = []
+    emotes = []
+    letters = 0
+    for emote_id, positions in emote_tag.items():
+        if not positions:
+            continue
+        for position in positions:
+            spans.append(
+                (int(position["start_position"]), int(position["end_position"]) + 1)
+            )
+        start, end = spans[-1]
+        name = sys.intern(text[start:end])
+        emotes.append((sys.intern(emote_id), name, len(positions)))
+        letters += len(name) * len(positions)
+
+    spans.sort()
+    rest = []
+    pos = 0
+    for start, end in spans:
+        # Separated by a space, so the words either side aren't joined
+        rest.append(text[pos:start])
+        pos = end
+    rest.append(text[pos:])
+    return " ".join(rest), (emotes, letters)
+
+
+def weigh_emotes(emotes: Emotes, weight: int) -> Emotes:
+    """`emotes` used `weight` times as often, see `weigh_tokens`."""
+    uses, letters = emotes
+    return [(emote_id, name, count * weight) for emote_id, name, count in uses], letters
+
+
+def weigh_tokens(tokens: Tokens, weight: int) -> Tokens:
+    """`tokens` with every word counted `weight` times, for a message standing in
+    for `weight` messages while the ingest samples chat."""
+    words, counts, letters = tokens
+    if counts is None:
+        counts = {}
+        for w in words:
+            counts[w] = counts.get(w, 0) + 1
+    return words, {w: count * weight for w, count in counts.items()}, letters
@@ -0,0 +1,111 @@
+import json
+import os
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from twitchAPI.oauth import UserAuthenticator
+from twitchAPI.twitch import Twitch
+from twitchAPI.type import (
+    AuthScope,
+    InvalidRefreshTokenException,
+    InvalidTokenException,
+    TwitchAuthorizationException,
+)
+
+TOKEN_FILE = Path(__file__).parents[1] / "user_token.json"
+
+
+class TokenStore:
+    """User access and refresh tokens kept between runs, shared by the bot and server.
+
+    The file is only readable by the user running the bot, and is replaced
+    atomically so the other process never reads half of it. The scopes a token
+    was granted are stored with it, so a token is only reused where it suffices.
+    """
+
+    def __init__(self, path: Path = TOKEN_FILE) -> None:
+        self.path = path
+
+    def load(self, scope: list[AuthScope]) -> tuple[str, str, list[AuthScope]] | None:
+        """Returns the stored token, refresh token and the scopes they were
+        granted, if those include `scope`."""
+        try:
+            with open(self.path, "r") as fp:
+                stored = json.load(fp)
+            token, refresh = stored["token"], stored["refresh"]
+            granted = [AuthScope(s) for s in stored["scopes"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if not set(scope) <= set(granted):
+            return None
+        return token, refresh, granted
+
+    def save(self, token: str, refresh: str, scope: list[AuthScope]) -> None:
+        data = {"token": token, "refresh": refresh, "scopes": [s.value for s in scope]}
+        tmp_path = f"{self.path}.tmp"
+        # Created with the permissions already set, it's never readable by others
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as fp:
+            json.dump(data, fp)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def bind(self, twitch: Twitch, scope: list[AuthScope]) -> None:
+        """Stores the tokens again whenever `twitch` refreshes them."""
+
+        async def on_refresh(token: str, refresh: str) -> None:
+            self.save(token, refresh, scope)
+
+        twitch.user_auth_refresh_callback = on_refresh
+
+
+async def browser_login(twitch: Twitch, scope: list[AuthScope]) -> tuple[str, str]:
+    return await UserAuthenticator(twitch, scope).authenticate()
+
+
+class LoginRequired(Exception):
+    """There's no stored login that works, and no browser to log in with."""
+
+
+async def headless_login(twitch: Twitch, scope: list[AuthScope]) -> tuple[str, str]:
+    raise LoginRequired(
+        "No saved Twitch login that still works, "
+        "run main.py or server.py once to log in through the browser"
+    )
+
+
+async def authenticate(
+    twitch: Twitch,
+    scope: list[AuthScope],
+    store: TokenStore,
+    login: Callable[
+        [Twitch, list[AuthScope]], Awaitable[tuple[str, str]]
+    ] = browser_login,
+) -> None:
+    """Sets the user authentication of `twitch`, only logging in through the
+    browser when there are no stored tokens or they can't be refreshed."""
+    stored = store.load(scope)
+    if stored is not None:
+        token, refresh, granted = stored
+        # Refreshed tokens keep all their scopes, e.g. chat:edit from the server
+        store.bind(twitch, granted)
+        try:
+            # Validates the token, refreshing (and storing) it once if it expired
+            await twitch.set_user_authentication(token, scope, refresh)
+            return
+        # Twitch being down isn't a bad login, that's left to the caller to retry
+        except (
+            InvalidTokenException,
+            InvalidRefreshTokenException,
+            TwitchAuthorizationException,
+        ) as e:
+            print(f"Stored Twitch login no longer works ({e}), log in again")
+
+    store.bind(twitch, scope)
+    token, refresh = await login(twitch, scope)
+    store.save(token, refresh, scope)
+    await twitch.set_user_authentication(token, scope, refresh)
@@ -31,6 +31,23 @@ def print_options_all() -> None:
         })"
     )
     print(f"6. Change Padding (Currently {settings.padding})")
+    print(
+        f"7. Toggle Punctuation Stripping (Currently {
+            'Enabled' if settings.strip_punctuation else 'Disabled'
+        })"
+    )
+    print(
+        f"8. Toggle Emoji Stripping (Currently {
+            'Enabled' if settings.strip_emoji else 'Disabled'
+        })"
+    )
+    print(f"9. Change Snapshot Interval (Currently {settings.snapshot_interval}s)")
+    print(f"10. Change Display Rows (Currently {settings.display_rows})")
+    print(
+        f"11. Toggle Approximate Stats (Currently {
+            'Enabled' if settings.approximate_stats else 'Disabled'
+        })"
+    )
     print_options_quit()
 
 
@@ -51,9 +68,9 @@ def handle_user_input(option: str, from_server: bool) -> None:
 
     user_input = get_user_input(option, from_server)
 
-    # Padding option will always return ""
+    # Toggle options will always return ""
     # should only be changed when not from server settings
-    if user_input == "" and (option != "5" or from_server):
+    if user_input == "" and (option not in ("5", "7", "8", "11") or from_server):
         return
 
     # No need to check again if from server
@@ -69,12 +86,19 @@ def get_user_input(option: str, from_server: bool) -> str:
             return input("Enter App Secret: ")
         case "3", False:
             print(f"Current Target Channel: {settings.target_channel}")
+            print("Separate channels with commas to watch several at once")
             return input("New Target Channel: ")
         case "4", False:
             print(f"Current Excluded Users: {list(settings.excluded_users)}")
             return input("Enter User to Toggle: ")
         case "6", False:
             return input("Enter Padding: ")
+        case "9", False:
+            print("Overlay files are rewritten every this many seconds, 0 disables")
+            return input("Enter Snapshot Interval: ")
+        case "10", False:
+            print("Number of rows shown in the OBS files, 0 shows everything")
+            return input("Enter Display Rows: ")
 
     return ""
 
@@ -101,6 +125,22 @@ def update_option(option: str, new_val: str):
                 settings.padding = max(0, int(new_val))
             except ValueError:
                 return
+        case "7":
+            settings.strip_punctuation = not (settings.strip_punctuation)
+        case "8":
+            settings.strip_emoji = not (settings.strip_emoji)
+        case "9":
+            try:
+                settings.snapshot_interval = max(0, int(new_val))
+            except ValueError:
+                return
+        case "10":
+            try:
+                settings.display_rows = max(0, int(new_val))
+            except ValueError:
+                return
+        case "11":
+            settings.approximate_stats = not (settings.approximate_stats)
     user_settings.save_to_file()
 
 
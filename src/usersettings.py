@@ -3,6 +3,24 @@ import os
 import threading
 from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Mapping
+
+# Environment variables overriding settings are named after their keys,
+# e.g. `YAP_TARGET_CHANNEL` for `Target Channel`
+ENV_PREFIX = "YAP_"
+BOOLEANS = {"1": True, "true": True, "yes": True, "on": True}
+BOOLEANS |= {"0": False, "false": False, "no": False, "off": False}
+INTEGER_LISTS = {"Time Windows"}
+
+
+def parse_channels(target_channel: str) -> list[str]:
+    """Splits a comma separated Target Channel into channel names, in order."""
+    channels = (c.strip().removeprefix("#").lower() for c in target_channel.split(","))
+    return list(dict.fromkeys(c for c in channels if c))
+
+
+def env_name(key: str) -> str:
+    return ENV_PREFIX + key.upper().replace(" ", "_")
 
 
 @dataclass
@@ -13,6 +31,25 @@ class SettingsData:
     excluded_users: set[str] = field(default_factory=set)
     logging: bool = True
     padding: int = 0
+    display_rows: int = 25
+    strip_punctuation: bool = False
+    strip_emoji: bool = False
+    snapshot_interval: int = 10
+    checkpoint_interval: int = 600
+    approximate_stats: bool = False
+    approx_word_capacity: int = 100_000
+    metrics_port: int = 17564
+    time_windows: list[int] = field(default_factory=lambda: [5, 15, 60])
+    output_format: str = "csv"
+    keep_history: bool = True
+    ingest_buffer: int = 50_000
+    overload_policy: str = "sample"
+    phrase_capacity: int = 0
+    phrase_sample: int = 1
+
+    @property
+    def target_channels(self) -> list[str]:
+        return parse_channels(self.target_channel)
 
     def to_dict(self) -> dict:
         return {
@@ -22,6 +59,21 @@ class SettingsData:
             "Excluded Users": list(self.excluded_users),
             "Logging": self.logging,
             "Padding": self.padding,
+            "Display Rows": self.display_rows,
+            "Strip Punctuation": self.strip_punctuation,
+            "Strip Emojis": self.strip_emoji,
+            "Snapshot Interval": self.snapshot_interval,
+            "Checkpoint Interval": self.checkpoint_interval,
+            "Approximate Stats": self.approximate_stats,
+            "Approximate Word Capacity": self.approx_word_capacity,
+            "Metrics Port": self.metrics_port,
+            "Time Windows": self.time_windows,
+            "Output Format": self.output_format,
+            "Keep History": self.keep_history,
+            "Ingest Buffer": self.ingest_buffer,
+            "Overload Policy": self.overload_policy,
+            "Phrase Capacity": self.phrase_capacity,
+            "Phrase Sample": self.phrase_sample,
         }
 
     def from_dict(self, d: dict):
@@ -31,11 +83,95 @@ class SettingsData:
         self.excluded_users = set(d.get("Excluded Users", self.excluded_users))
         self.logging = d.get("Logging", self.logging)
         self.padding = d.get("Padding", self.padding)
+        self.display_rows = d.get("Display Rows", self.display_rows)
+        self.strip_punctuation = d.get("Strip Punctuation", self.strip_punctuation)
+        self.strip_emoji = d.get("Strip Emojis", self.strip_emoji)
+        self.snapshot_interval = d.get("Snapshot Interval", self.snapshot_interval)
+        self.checkpoint_interval = d.get(
+            "Checkpoint Interval", self.checkpoint_interval
+        )
+        self.approximate_stats = d.get("Approximate Stats", self.approximate_stats)
+        self.approx_word_capacity = d.get(
+            "Approximate Word Capacity", self.approx_word_capacity
+        )
+        self.metrics_port = d.get("Metrics Port", self.metrics_port)
+        self.time_windows = list(d.get("Time Windows", self.time_windows))
+        self.output_format = d.get("Output Format", self.output_format)
+        self.keep_history = d.get("Keep History", self.keep_history)
+        self.ingest_buffer = d.get("Ingest Buffer", self.ingest_buffer)
+        self.overload_policy = d.get("Overload Policy", self.overload_policy)
+        self.phrase_capacity = d.get("Phrase Capacity", self.phrase_capacity)
+        self.phrase_sample = d.get("Phrase Sample", self.phrase_sample)
+
+    def from_env(self, environ: Mapping[str, str]) -> None:
+        """Overrides the settings that have an environment variable set."""
+        overrides = {}
+        for key, value in self.to_dict().items():
+            name = env_name(key)
+            raw = environ.get(name)
+            if raw is None:
+                continue
+            if isinstance(value, bool):
+                if raw.strip().lower() not in BOOLEANS:
+                    raise ValueError(f"{name} must be true or false, not {raw!r}")
+                overrides[key] = BOOLEANS[raw.strip().lower()]
+            elif isinstance(value, int):
+                if not raw.strip().isdigit():
+                    raise ValueError(f"{name} must be a whole number, not {raw!r}")
+                overrides[key] = int(raw)
+            elif isinstance(value, list):
+                items = [v.strip() for v in raw.split(",") if v.strip()]
+                if key in INTEGER_LISTS:
+                    if not all(v.isdigit() for v in items):
+                        raise ValueError(f"{name} must be whole numbers, not {raw!r}")
+                    items = [int(v) for v in items]
+                overrides[key] = items
+            else:
+                overrides[key] = raw
+        self.from_dict(overrides)
+
+
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    """Immutable copy of `SettingsData` that can be read without locking."""
+
+    version: int
+    target_channel: str
+    excluded_users: frozenset[str]
+    logging: bool
+    padding: int
+    display_rows: int
+    strip_punctuation: bool
+    strip_emoji: bool
+    snapshot_interval: int
+    checkpoint_interval: int
+
+    @property
+    def target_channels(self) -> list[str]:
+        return parse_channels(self.target_channel)
+
+    @classmethod
+    def from_settings(cls, settings: SettingsData, version: int) -> "SettingsSnapshot":
+        return cls(
+            version,
+            settings.target_channel,
+            frozenset(settings.excluded_users),
+            settings.logging,
+            settings.padding,
+            settings.display_rows,
+            settings.strip_punctuation,
+            settings.strip_emoji,
+            settings.snapshot_interval,
+            settings.checkpoint_interval,
+        )
 
 
 class UserSettings:
     _instance = None
     _lock = threading.Lock()
+    _snapshot: SettingsSnapshot | None = None
+    # Bumped whenever settings are saved or loaded, invalidating `_snapshot`
+    version: int = 0
     settings: SettingsData
     file_loc: Path
 
@@ -50,8 +186,20 @@ class UserSettings:
 
         return cls._instance
 
+    @classmethod
+    def snapshot(cls) -> SettingsSnapshot:
+        """Returns a read-only view of the settings, rebuilt only after they change."""
+        if cls._instance is None:
+            cls()
+        snapshot = cls._snapshot
+        if snapshot is None or snapshot.version != cls.version:
+            snapshot = SettingsSnapshot.from_settings(cls.settings, cls.version)
+            cls._snapshot = snapshot
+        return snapshot
+
     @classmethod
     def save_to_file(cls) -> None:
+        cls.version += 1
         with open(cls.file_loc, "w") as fp:
             json.dump(cls.settings.to_dict(), fp, indent=4)
 
@@ -60,6 +208,7 @@ class UserSettings:
         if not os.path.exists(cls.file_loc):
             cls.save_to_file()
 
+        cls.version += 1
         with open(cls.file_loc, "r") as fp:
             try:
                 loaded = json.load(fp)
@@ -67,8 +216,17 @@ class UserSettings:
             except json.JSONDecodeError:
                 cls.save_to_file()
 
+    @classmethod
+    def load_from_env(cls, environ: Mapping[str, str] = os.environ) -> None:
+        """Applies environment overrides on top of the file, without saving them."""
+        if cls._instance is None:
+            cls()
+        cls.version += 1
+        cls.settings.from_env(environ)
+
     @classmethod
     def clear_settings(cls) -> None:
+        cls.version += 1
         cls.settings = SettingsData()
         if os.path.exists(cls.file_loc):
             os.remove(cls.file_loc)
@@ -1,15 +1,33 @@
+from typing import Hashable, Iterable
+
+
 class UserStats:
+    __slots__ = ("username", "letter_count", "word_count", "messages", "unique_words")
+
     def __init__(self, username: str) -> None:
         self.username: str = username
         self.letter_count: int = 0
         self.word_count: int = 0
         self.messages: int = 0
-        self.unique_words: set[str] = set()
+        # Word IDs when owned by a `StatsStore`, otherwise the words themselves
+        self.unique_words: set[Hashable] = set()
 
     def update_stats(self, words: list[str]) -> None:
         if not words:
             return
-        self.letter_count += len("".join(words))
-        self.word_count += len(words)
+        self.add_message(len("".join(words)), len(words), words)
+
+    def add_message(
+        self, letter_count: int, word_count: int, words: Iterable[Hashable]
+    ) -> None:
+        self.letter_count += letter_count
+        self.word_count += word_count
         self.messages += 1
-        self.unique_words.update(set(words))
+        self.unique_words.update(words)
+
+    def merge(self, other: "UserStats") -> None:
+        """Adds the stats of the same user collected somewhere else."""
+        self.letter_count += other.letter_count
+        self.word_count += other.word_count
+        self.messages += other.messages
+        self.unique_words |= other.unique_words
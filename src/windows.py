@@ -0,0 +1,147 @@
+import heapq
+from collections import deque
+
+from tokenizer import Tokens
+
+BUCKET_SECONDS = 60
+
+
+class Bucket:
+    """Messages, letters and word counts of every user over some span of time."""
+
+    __slots__ = ("minute", "messages", "letters", "words")
+
+    def __init__(self, minute: int = 0) -> None:
+        self.minute = minute
+        self.messages: dict[str, int] = {}
+        self.letters: dict[str, int] = {}
+        self.words: dict[str, int] = {}
+
+    def add(self, username: str, tokens: Tokens) -> None:
+        words, counts, letters = tokens
+        self.messages[username] = self.messages.get(username, 0) + 1
+        self.letters[username] = self.letters.get(username, 0) + letters
+        word_counts = self.words
+        if counts is None:
+            for w in words:
+                word_counts[w] = word_counts.get(w, 0) + 1
+        else:
+            for w, count in counts.items():
+                word_counts[w] = word_counts.get(w, 0) + count
+
+    def merge(self, other: "Bucket") -> None:
+        for mine, theirs in (
+            (self.messages, other.messages),
+            (self.letters, other.letters),
+            (self.words, other.words),
+        ):
+            for key, count in theirs.items():
+                mine[key] = mine.get(key, 0) + count
+
+    def subtract(self, other: "Bucket") -> None:
+        # Keys that drop to 0 are removed, so memory follows the window's activity
+        for mine, theirs in (
+            (self.messages, other.messages),
+            (self.letters, other.letters),
+            (self.words, other.words),
+        ):
+            for key, count in theirs.items():
+                left = mine[key] - count
+                if left:
+                    mine[key] = left
+                else:
+                    del mine[key]
+
+
+class WindowStats:
+    """Who chatted and which words were used over the last few minutes.
+
+    Messages are counted into an open `Bucket`, which is closed at the end of
+    its minute or when the windows are read, and kept in a ring only as long
+    as the longest window. Every window has running totals of the closed
+    buckets it covers: a closed bucket is added to each window's totals, and
+    subtracted again once it's older than the window. A message costs one
+    bucket update, and every bucket is added and subtracted once per window,
+    however long the session runs.
+
+    Windows are to the minute: a 5 minute window covers the current minute and
+    the 4 before it.
+    """
+
+    def __init__(self, windows: list[int]) -> None:
+        # Minutes, shortest first
+        self.windows = sorted({window for window in windows if window > 0})
+        self._buckets: deque[Bucket] = deque()
+        self._open: Bucket | None = None
+        self._totals = {window: Bucket() for window in self.windows}
+        # Index of the first bucket still inside each window
+        self._starts = dict.fromkeys(self.windows, 0)
+
+    def __len__(self) -> int:
+        return len(self._buckets) + (self._open is not None)
+
+    def add(self, username: str, tokens: Tokens, now: float) -> None:
+        bucket = self._open
+        if bucket is None or bucket.minute < now // BUCKET_SECONDS:
+            self.expire(now)
+            bucket = self._open = Bucket(int(now // BUCKET_SECONDS))
+        bucket.add(username, tokens)
+
+    def _close(self) -> None:
+        bucket = self._open
+        if bucket is None:
+            return
+        for totals in self._totals.values():
+            totals.merge(bucket)
+        self._buckets.append(bucket)
+        self._open = None
+
+    def expiring(self, now: float) -> bool:
+        """Whether any window has buckets that are too old by `now`."""
+        minute = int(now // BUCKET_SECONDS)
+        buckets = self._buckets
+        return any(
+            start < len(buckets) and buckets[start].minute <= minute - window
+            for window, start in self._starts.items()
+        )
+
+    def expire(self, now: float) -> None:
+        """Brings every window's totals up to date, as of `now`."""
+        self._close()
+        minute = int(now // BUCKET_SECONDS)
+        buckets = self._buckets
+        for window, totals in self._totals.items():
+            start = self._starts[window]
+            while start < len(buckets) and buckets[start].minute <= minute - window:
+                totals.subtract(buckets[start])
+                start += 1
+            self._starts[window] = start
+
+        # Buckets past the longest window aren't in any window anymore
+        if self.windows:
+            dropped = self._starts[self.windows[-1]]
+            for _ in range(dropped):
+                buckets.popleft()
+            for window in self._starts:
+                self._starts[window] -= dropped
+
+    def top_yappers(
+        self, window: int, k: int, now: float
+    ) -> list[tuple[str, int, int]]:
+        """Returns up to `k` (username, messages, letters) of the users who sent
+        the most messages in the last `window` minutes, most first. A `k` of 0
+        returns every user."""
+        self.expire(now)
+        totals = self._totals[window]
+        top = _top(totals.messages, k)
+        return [(user, messages, totals.letters[user]) for user, messages in top]
+
+    def top_words(self, window: int, k: int, now: float) -> list[tuple[str, int]]:
+        self.expire(now)
+        return _top(self._totals[window].words, k)
+
+
+def _top(counts: dict[str, int], k: int) -> list[tuple[str, int]]:
+    if k <= 0:
+        return sorted(counts.items(), key=lambda item: item[1], reverse=True)
+    return heapq.nlargest(k, counts.items(), key=lambda item: item[1])
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Modules in src import each other by bare name, as they do when run as scripts
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
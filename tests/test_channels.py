@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+
+import main
+from channels import ChannelStats
+from journal import Journal
+from stats_store import StatsStore
+
+
+class TestChannelRouting(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.channels = {}
+        for name in ("abc", "def"):
+            store = StatsStore()
+            journal = Journal(os.path.join(self.tmp.name, name))
+            journal.open(store, "24-01-01-00-00")
+            self.channels[name] = ChannelStats(name, store, journal, "24-01-01-00-00")
+        self.old_channels, main.CHANNELS = main.CHANNELS, self.channels
+
+    def tearDown(self) -> None:
+        main.CHANNELS = self.old_channels
+        for channel in self.channels.values():
+            channel.journal.close()
+        self.tmp.cleanup()
+
+    def test_messages_routed_by_channel(self):
+        main.handle_batch(
+            [
+                ("abc", "bob", "hello chat", None),
+                ("def", "bob", "hi", None),
+                ("abc", "eve", "hello", None),
+                ("ghi", "bob", "not joined", None),
+                ("def", "eve", "   ", None),
+            ]
+        )
+        abc, other = self.channels["abc"].store, self.channels["def"].store
+        self.assertEqual(abc.usernames, ["bob", "eve"])
+        self.assertEqual(dict(abc.word_appearances()), {"hello": 2, "chat": 1})
+        self.assertEqual(other.usernames, ["bob"])
+        self.assertEqual(dict(other.word_appearances()), {"hi": 1})
+
+    def test_emotes_counted_apart(self):
+        def kappa(start: int) -> dict:
+            return {
+                "25": [{"start_position": str(start), "end_position": str(start + 4)}]
+            }
+
+        main.handle_batch(
+            [("abc", "bob", "hi Kappa", kappa(3)), ("abc", "eve", "Kappa", kappa(0))]
+        )
+        abc = self.channels["abc"].store
+        self.assertEqual(abc.usernames, ["bob", "eve"])
+        self.assertEqual(dict(abc.word_appearances()), {"hi": 1})
+        self.assertEqual(abc.top_emotes(1), [("25", "Kappa", 2)])
+
+    def test_channels_journaled_separately(self):
+        main.handle_batch([("abc", "bob", "hello", None), ("def", "eve", "hi", None)])
+        recovered, _ = Journal(os.path.join(self.tmp.name, "def")).recover()
+        self.assertEqual(recovered.usernames, ["eve"])
@@ -0,0 +1,83 @@
+import asyncio
+import os
+import shutil
+import signal
+import unittest
+
+import main
+from save_stats import get_output_path
+from usersettings import UserSettings
+
+
+class FakeChat:
+    def __init__(self, connected: bool) -> None:
+        self.connected = connected
+        self.started = self.stopped = False
+
+    def start(self) -> None:
+        self.started = True
+
+    def stop(self) -> None:
+        self.stopped = True
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+
+class FakeTwitch:
+    closed = False
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self) -> None:
+        settings = UserSettings().settings
+        old = (settings.target_channel, settings.metrics_port, settings.keep_history)
+        settings.target_channel, settings.metrics_port = "_test_daemon", 0
+        settings.keep_history = False
+        UserSettings.version += 1
+
+        def restore() -> None:
+            settings.target_channel, settings.metrics_port, settings.keep_history = old
+            UserSettings.version += 1
+
+        self.addCleanup(restore)
+        self.addCleanup(shutil.rmtree, get_output_path("_test_daemon"))
+
+        self.twitch = FakeTwitch()
+        # The first connection drops for good, the second one is stopped by SIGTERM
+        self.chats = [FakeChat(connected=False), FakeChat(connected=True)]
+        self.created = 0
+        for name, value in (
+            ("connect_twitch", self.connect_twitch),
+            ("create_chat", self.create_chat),
+            ("RECONNECT_AFTER", 0.0),
+            ("CONNECTION_CHECK", 0.01),
+        ):
+            self.addCleanup(setattr, main, name, getattr(main, name))
+            setattr(main, name, value)
+
+    async def connect_twitch(self, settings, headless=False) -> FakeTwitch:
+        self.assertTrue(headless)
+        return self.twitch
+
+    async def create_chat(self, twitch) -> FakeChat:
+        chat = self.chats[self.created]
+        self.created += 1
+        if self.created == 2:
+            main.INGEST.put("_test_daemon", "bob", "hello there")
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.05, os.kill, os.getpid(), signal.SIGTERM)
+        return chat
+
+    def test_reconnects_and_saves_on_sigterm(self):
+        asyncio.run(main.run_daemon())
+
+        self.assertTrue(self.chats[0].stopped)
+        self.assertTrue(self.chats[1].started and self.chats[1].stopped)
+        self.assertTrue(self.twitch.closed)
+        # The message still queued at shutdown made it into the saved stats
+        csvs = [f for f in os.listdir(get_output_path("_test_daemon")) if "yap" in f]
+        self.assertEqual(len([f for f in csvs if f.endswith(".csv")]), 1)
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+import main
+from channels import ChannelStats
+from fake_twitch import FakeTwitch
+from ingest import MessageIngest
+from journal import Journal
+from stats_store import StatsStore
+from usersettings import UserSettings
+
+CHAT = [("bob", "hello chat"), ("eve", "Kappa hi bob"), ("bob", "KEKW KEKW")] * 20
+
+
+class TestFakeTwitch(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.channels = {}
+        for name in ("abc", "def"):
+            store = StatsStore()
+            journal = Journal(os.path.join(tmp.name, name))
+            journal.open(store, "24-01-01-00-00")
+            self.addCleanup(journal.close)
+            self.channels[name] = ChannelStats(name, store, journal, "24-01-01-00-00")
+
+        settings = UserSettings().settings
+        old_logging, settings.logging = settings.logging, False
+        UserSettings.version += 1
+
+        def restore() -> None:
+            settings.logging = old_logging
+            UserSettings.version += 1
+
+        self.addCleanup(restore)
+        for name in ("CHANNELS", "CHAT_SERVER"):
+            self.addCleanup(setattr, main, name, getattr(main, name))
+        main.CHANNELS = self.channels
+
+    async def run_bot(self) -> None:
+        server = FakeTwitch(CHAT, rate=1000)
+        runner = await server.start()
+        main.CHAT_SERVER = server.url
+        main.INGEST = MessageIngest(main.handle_batch)
+        main.INGEST.start()
+        try:
+            twitch = await main.connect_twitch(UserSettings.settings, headless=True)
+            chat = await main.create_chat(twitch)
+            await asyncio.to_thread(chat.start)
+            await asyncio.wait_for(server.finished.wait(), 10)
+            deadline = time.monotonic() + 10
+            while self.counted() < len(CHAT) and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+            await asyncio.to_thread(chat.stop)
+        finally:
+            main.INGEST.stop()
+            await runner.cleanup()
+
+    def counted(self) -> int:
+        return sum(sum(c.store.messages) for c in self.channels.values())
+
+    def test_bot_counts_chat_end_to_end(self):
+        asyncio.run(self.run_bot())
+
+        self.assertEqual(self.counted(), len(CHAT))
+        # Messages are spread over the joined channels in turn
+        abc, other = self.channels["abc"].store, self.channels["def"].store
+        self.assertEqual(sum(abc.messages), len(CHAT) // 2)
+        self.assertEqual(
+            sum(dict(abc.word_appearances()).values())
+            + sum(dict(other.word_appearances()).values()),
+            2 * len(CHAT),
+        )
+        # Tagged as an emote by the stand-in, so not counted as a word
+        kappa = abc.top_emotes(1) + other.top_emotes(1)
+        self.assertEqual(sum(count for _, _, count in kappa), len(CHAT) // 3)
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from history import History, parse_time, session_time
+from stats_store import StatsStore
+
+
+def make_store(*messages: tuple[str, list[str]]) -> StatsStore:
+    store = StatsStore()
+    for username, words in messages:
+        store.add_message(username, words)
+    return store
+
+
+class TestHistory(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.output = Path(tmp.name)
+        self.history = History(self.output / "history.sqlite3")
+
+    def test_leaderboards_across_sessions(self):
+        january = make_store(("bob", ["hi", "chat"]), ("eve", ["hi"]), ("bob", ["a"]))
+        february = make_store(("eve", ["hi", "hi"]), ("eve", ["kekw"]))
+        self.history.add_session("abc", "24-01-10-20-00", january, "2024-01-10 20:00")
+        self.history.add_session("abc", "24-02-03-20-00", february, "2024-02-03 20:00")
+        self.history.add_session("def", "24-02-04-20-00", january, "2024-02-04 20:00")
+
+        users = self.history.top_users(channel="abc")
+        self.assertEqual(
+            [(r["username"], r["messages"], r["sessions"]) for r in users],
+            [("eve", 3, 2), ("bob", 2, 1)],
+        )
+        self.assertEqual(
+            self.history.top_words(since="2024-02-01 00:00", limit=1),
+            [{"word": "hi", "count": 4, "sessions": 2}],
+        )
+        users = self.history.top_users(until="2024-02-01 00:00", by="letters")
+        self.assertEqual([r["username"] for r in users], ["bob", "eve"])
+        self.assertEqual(
+            [r["channel"] for r in self.history.user_sessions("bob")], ["abc", "def"]
+        )
+
+        # Saving a session again replaces it
+        self.history.add_session("abc", "24-02-03-20-00", january, "2024-02-03 20:00")
+        self.assertEqual(self.history.word_sessions("kekw"), [])
+
+    def test_ingest_only_reads_new_files(self):
+        channel = self.output / "abc"
+        os.makedirs(channel)
+        yap = pd.DataFrame(
+            {
+                "username": ["bob", "null"],
+                "yap cost": [1.5, 0.5],
+                "letters": [10, 4],
+                "messages": [2, 1],
+                "avg. message len": [5.0, 4.0],
+                "vocab": [3, 1],
+            }
+        )
+        yap.to_csv(channel / "24-01-10-20-00-yap.csv", index=False)
+        words = pd.DataFrame({"word": ["hi", "\U0001f480"], "count": [3, 1]})
+        words.to_csv(
+            channel / "24-01-10-20-00-words.csv", encoding="UTF-16", index=False
+        )
+
+        self.assertEqual(self.history.ingest(self.output), 1)
+        self.assertEqual(self.history.ingest(self.output), 0)
+        self.assertEqual(
+            self.history.user_sessions("null"),
+            [
+                {
+                    "channel": "abc",
+                    "started at": "2024-01-10 20:00",
+                    "messages": 1,
+                    "letters": 4,
+                    "vocab": 1,
+                }
+            ],
+        )
+
+        # A checkpoint rewriting a session's table gets it ingested again
+        words["count"] = [50, 1]
+        words.to_csv(
+            channel / "24-01-10-20-00-words.csv", encoding="UTF-16", index=False
+        )
+        self.assertEqual(self.history.ingest(self.output), 1)
+        self.assertEqual(self.history.top_words(limit=1)[0]["count"], 50)
+        self.assertEqual(len(self.history.top_users()), 2)
+
+    def test_session_times(self):
+        self.assertEqual(session_time("24-01-10-20-05", 0), "2024-01-10 20:05")
+        self.assertEqual(session_time("replay-log", 0), "1970-01-01 00:00")
+        self.assertEqual(parse_time("2024-02-01"), "2024-02-01 00:00")
+        self.assertEqual(parse_time("2024-02-01T01:30+01:00"), "2024-02-01 00:30")
@@ -0,0 +1,133 @@
+import threading
+import unittest
+from collections import deque
+
+from ingest import MessageIngest, sampled
+
+
+class TestMessageIngest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.batches = []
+        self.ingest = MessageIngest(self.handle_batch, batch_size=2)
+
+    def handle_batch(self, batch, weight, overloaded) -> None:
+        self.batches.append(batch)
+
+    def test_drain_batches_in_order(self):
+        for i in range(5):
+            self.ingest.put("chan", f"user{i}", f"msg{i}")
+        self.ingest.drain()
+        self.assertEqual([len(b) for b in self.batches], [2, 2, 1])
+        self.assertEqual(
+            [m for b in self.batches for m in b],
+            [("chan", f"user{i}", f"msg{i}", None) for i in range(5)],
+        )
+        self.assertEqual(len(self.ingest), 0)
+
+    def test_stop_processes_queued_messages(self):
+        self.ingest.start()
+        for i in range(10):
+            self.ingest.put("chan", "user", str(i))
+        self.ingest.stop()
+        self.assertEqual(sum(len(b) for b in self.batches), 10)
+
+    def test_double_start_raises(self):
+        self.ingest.start()
+        with self.assertRaises(RuntimeError):
+            self.ingest.start()
+        self.ingest.stop()
+
+
+class TestOverload(unittest.TestCase):
+    def setUp(self) -> None:
+        self.batches = []
+
+    def handle_batch(self, batch, weight, overloaded) -> None:
+        self.batches.append((batch, weight, overloaded))
+
+    def test_drop_oldest(self):
+        ingest = MessageIngest(self.handle_batch, capacity=3, policy="drop_oldest")
+        for i in range(5):
+            ingest.put("chan", "user", str(i))
+        self.assertEqual(len(ingest), 3)
+        self.assertTrue(ingest.overloaded)
+        ingest.drain()
+        self.assertEqual([m[2] for m in self.batches[0][0]], ["2", "3", "4"])
+        self.assertFalse(ingest.overloaded)
+        (episode,) = ingest.episodes
+        self.assertEqual((episode.received, episode.dropped), (2, 2))
+        self.assertIsNotNone(episode.end)
+
+    def test_drop_oldest_races_worker(self):
+        class Drained(deque):
+            # The worker empties the queue between `put`'s check and its pop
+            def popleft(self):
+                self.clear()
+                return super().popleft()
+
+        ingest = MessageIngest(self.handle_batch, capacity=2, policy="drop_oldest")
+        for i in range(2):
+            ingest.put("chan", "user", str(i))
+        ingest._pending = Drained(ingest._pending)
+        ingest.put("chan", "user", "2")
+        self.assertEqual(list(ingest._pending), [("chan", "user", "2", None)])
+        (episode,) = ingest.episodes
+        self.assertEqual(episode.dropped, 0)
+
+    def test_rate_not_lowered_under_put(self):
+        ingest = MessageIngest(self.handle_batch, capacity=10)
+        ingest._start_episode()
+        ingest.sample_rate = 4
+        user = next(u for u in map(str, range(100)) if sampled(u, 4))
+        worker = threading.Thread(target=ingest.drain)
+
+        class Racing(deque):
+            # The worker drains the empty queue between `put` sampling the
+            # message at 1 in 4 and queueing it
+            def append(self, message):
+                worker.start()
+                worker.join(0.2)
+                super().append(message)
+
+        ingest._pending = Racing()
+        ingest.put("chan", user, "hi")
+        worker.join()
+        ingest.drain()
+        self.assertEqual(self.batches, [([("chan", user, "hi", None)], 4, True)])
+
+    def test_sampling_keeps_whole_chatters(self):
+        ingest = MessageIngest(self.handle_batch, batch_size=10, capacity=40)
+        users = [f"user{i}" for i in range(20)]
+        for i in range(40):
+            ingest.put("chan", users[i % 20], str(i))
+        ingest.drain()
+
+        batch, weight, overloaded = self.batches[0]
+        self.assertEqual(weight, 2)
+        self.assertTrue(overloaded)
+        kept = {m[1] for m in batch}
+        self.assertEqual(kept, {u for u in users[:10] if sampled(u, 2)})
+        # Chatters kept at a rate are kept at every lower one
+        self.assertTrue(
+            {u for u in users if sampled(u, 4)} <= {u for u in users if sampled(u, 2)}
+        )
+        (episode,) = ingest.episodes
+        self.assertEqual(episode.sample_rate, 2)
+        self.assertEqual(
+            episode.sampled_out, 40 - sum(len(b) for b, _, _ in self.batches)
+        )
+        # Back to counting everyone once the queue is cleared
+        self.assertEqual(ingest.sample_rate, 1)
+        self.assertFalse(ingest.overloaded)
+
+    def test_block_waits_for_worker(self):
+        ingest = MessageIngest(
+            self.handle_batch, batch_size=1, capacity=2, policy="block"
+        )
+        ingest.start()
+        for i in range(50):
+            ingest.put("chan", "user", str(i))
+            self.assertLessEqual(len(ingest), 2)
+        ingest.stop()
+        self.assertEqual(sum(len(b) for b, _, _ in self.batches), 50)
+        self.assertTrue(all(weight == 1 for _, weight, _ in self.batches))
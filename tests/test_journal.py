@@ -0,0 +1,139 @@
+import os
+import tempfile
+import unittest
+
+from journal import Journal, encode_block, read_blocks
+from stats_store import ApproxStatsStore, StatsStore
+from tokenizer import weigh_emotes, weigh_tokens
+
+
+def journaled_session(path: str, store: StatsStore, messages) -> Journal:
+    journal = Journal(path)
+    journal.open(store, "24-01-01-00-00")
+    for username, words in messages:
+        with store.lock:
+            store.add_message(username, words)
+            journal.append(username, words)
+            journal.commit()
+    return journal
+
+
+class TestBlocks(unittest.TestCase):
+    def test_round_trip(self):
+        messages = [
+            ("bob", ["hi", "chat"], None),
+            ("eve", ["ÿ", "🙂"], None),
+            ("bob", [], None),
+            ("eve", ["gg"], ([("25", "Kappa", 2), ("10", ":/", 1)], 12)),
+        ]
+        data = encode_block(messages) + encode_block([("eve", ["yo"], None)])
+        self.assertEqual(list(read_blocks(data)), messages + [("eve", ["yo"], None)])
+
+    def test_stops_at_torn_block(self):
+        data = encode_block([("bob", ["hi"], None)]) + encode_block(
+            [("eve", ["hello"], None)]
+        )
+        self.assertEqual(list(read_blocks(data[:-2])), [("bob", ["hi"], None)])
+
+    def test_stops_at_corrupt_block(self):
+        data = bytearray(
+            encode_block([("bob", ["hi"], None)])
+            + encode_block([("eve", ["yo"], None)])
+        )
+        data[-1] ^= 0xFF
+        self.assertEqual(list(read_blocks(bytes(data))), [("bob", ["hi"], None)])
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "journal")
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_nothing_to_recover(self):
+        self.assertIsNone(Journal(self.path).recover())
+
+    def test_empty_session_not_recovered(self):
+        # Opened but never closed, e.g. the bot failed to log in
+        journal = journaled_session(self.path, StatsStore(), [])
+        self.addCleanup(journal.close)
+        self.assertIsNone(Journal(self.path).recover())
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_recovers_checkpoint_and_tail(self):
+        store = StatsStore()
+        journal = journaled_session(self.path, store, [("bob", ["hi", "hi"])])
+        journal.checkpoint(store)
+        with store.lock:
+            store.add_message("eve", ["yo"])
+            journal.append("eve", ["yo"])
+            journal.commit()
+        # No close, as if the process died
+
+        recovered, start_time = Journal(self.path).recover()
+        self.assertEqual(start_time, "24-01-01-00-00")
+        self.assertEqual(recovered.usernames, ["bob", "eve"])
+        self.assertEqual(dict(recovered.word_appearances()), {"hi": 2, "yo": 1})
+        self.assertEqual(recovered.user_words("bob"), {"hi"})
+        self.assertEqual(recovered.top_words(1), [("hi", 2)])
+        with recovered.lock:
+            recovered.add_message("bob", ["new"])
+
+    def test_recovers_weighted_messages(self):
+        store = StatsStore()
+        journal = journaled_session(self.path, store, [])
+        tokens = weigh_tokens((["hi", "hi", "yo"], None, 6), 4)
+        with store.lock:
+            store.add_tokens("bob", tokens)
+            journal.append("bob", tokens[0], 4)
+            journal.commit()
+
+        with store.lock:
+            emotes = ([("25", "Kappa", 2)], 10)
+            store.add_tokens("eve", ([], None, 0), weigh_emotes(emotes, 4))
+            journal.append("eve", [], 4, emotes)
+            journal.commit()
+
+        recovered, _ = Journal(self.path).recover()
+        self.assertEqual(recovered.usernames, ["bob", "eve"])
+        self.assertEqual(dict(recovered.word_appearances()), {"hi": 8, "yo": 4})
+        self.assertEqual(list(recovered.messages), list(store.messages))
+        self.assertEqual(list(recovered.letters), list(store.letters))
+        self.assertEqual(recovered.top_emotes(1), [("25", "Kappa", 8)])
+
+    def test_checkpoint_removes_covered_segments(self):
+        store = StatsStore()
+        journal = journaled_session(self.path, store, [("bob", ["hi"])])
+        journal.checkpoint(store)
+        journal.checkpoint(store)
+        segments = [n for n in os.listdir(self.path) if n.endswith(".journal")]
+        self.assertEqual(len(segments), 1)
+
+    def test_resumed_session_keeps_journaling(self):
+        store = StatsStore()
+        journaled_session(self.path, store, [("bob", ["hi"])]).close()
+
+        journal = Journal(self.path)
+        store, start_time = journal.recover()
+        journal.open(store, start_time)
+        with store.lock:
+            store.add_message("eve", ["yo"])
+            journal.append("eve", ["yo"])
+            journal.commit()
+        journal.close()
+
+        recovered, _ = Journal(self.path).recover()
+        self.assertEqual(recovered.usernames, ["bob", "eve"])
+
+    def test_close_remove_deletes_journal(self):
+        journaled_session(self.path, StatsStore(), [("bob", ["hi"])]).close(True)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_approximate_store(self):
+        store = ApproxStatsStore(10)
+        journaled_session(self.path, store, [("bob", ["hi", "yo"])] * 3)
+        recovered, _ = Journal(self.path).recover()
+        self.assertEqual(recovered.top_words(2), [("hi", 3), ("yo", 3)])
+        self.assertEqual(list(recovered.vocab_sizes), [2])
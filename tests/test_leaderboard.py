@@ -0,0 +1,50 @@
+import random
+import statistics
+import unittest
+
+from leaderboard import Leaderboard, RunningStats
+
+
+class TestLeaderboard(unittest.TestCase):
+    def test_top_after_updates(self):
+        board = Leaderboard()
+        for key, score in [(1, 5), (2, 3), (3, 8), (2, 10), (1, 1)]:
+            board.update(key, score)
+        self.assertEqual(board.top(2), [(2, 10), (3, 8)])
+        self.assertEqual(board.top(10), [(2, 10), (3, 8), (1, 1)])
+        # Querying doesn't lose entries
+        self.assertEqual(board.top(10), [(2, 10), (3, 8), (1, 1)])
+
+    def test_repeated_identical_scores_not_duplicated(self):
+        board = Leaderboard()
+        board.update(1, 5)
+        board.update(1, 5)
+        self.assertEqual(board.top(5), [(1, 5)])
+
+    def test_matches_full_sort_under_churn(self):
+        rnd = random.Random(0)
+        board = Leaderboard()
+        scores = {}
+        for _ in range(5000):
+            key = rnd.randrange(300)
+            scores[key] = scores.get(key, 0) + rnd.randint(1, 5)
+            board.update(key, scores[key])
+        expected = sorted(scores.values(), reverse=True)[:20]
+        self.assertEqual([s for _, s in board.top(20)], expected)
+        self.assertLessEqual(len(board._heap), 2 * len(scores) + 64)
+
+
+class TestRunningStats(unittest.TestCase):
+    def test_matches_population_stats(self):
+        rnd = random.Random(0)
+        values = [1000 + rnd.random() for _ in range(100)]
+        running = RunningStats()
+        for v in values:
+            running.add(v)
+        for i in range(0, 100, 3):
+            new = 1000 + rnd.random()
+            running.replace(values[i], new)
+            values[i] = new
+
+        self.assertAlmostEqual(running.mean, statistics.fmean(values))
+        self.assertAlmostEqual(running.std, statistics.pstdev(values))
@@ -0,0 +1,130 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import live
+from channels import ChannelStats
+from journal import Journal
+from save_stats import get_output_path
+from server import app
+from snapshots import SnapshotWriter
+from stats_store import StatsStore
+from tokenizer import tokenize_message
+from windows import WindowStats
+
+
+class TestLiveBoards(unittest.TestCase):
+    def setUp(self) -> None:
+        self.boards = live.LiveBoards()
+
+    def test_etag_follows_content(self):
+        self.boards.publish("abc", "words", [{"word": "hi", "count": 1}], "table")
+        first = self.boards.get("abc", "words", "json")
+        self.boards.publish("abc", "words", [{"word": "hi", "count": 1}], "table")
+        self.assertEqual(self.boards.get("abc", "words", "json").etag, first.etag)
+        self.boards.publish("abc", "words", [{"word": "hi", "count": 2}], "table")
+        self.assertNotEqual(self.boards.get("abc", "words", "json").etag, first.etag)
+        # The table didn't change
+        self.assertEqual(self.boards.get("abc", "words", "txt").body, b"table")
+
+    def test_nan_is_null(self):
+        self.boards.publish("abc", "yap", [{"yap cost": float("nan")}], "")
+        body = json.loads(self.boards.get("abc", "yap", "json").body)
+        self.assertEqual(body, {"channel": "abc", "yap": [{"yap cost": None}]})
+
+
+class TestStatsRoutes(unittest.TestCase):
+    def setUp(self) -> None:
+        self.client = app.test_client()
+        self.old_boards, live.BOARDS = live.BOARDS, live.LiveBoards()
+        live.BOARDS.publish("abc", "words", [{"word": "hi", "count": 3}], "table")
+
+    def tearDown(self) -> None:
+        live.BOARDS = self.old_boards
+
+    def test_json(self):
+        response = self.client.get("/stats/abc/words.json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.get_json(),
+            {"channel": "abc", "words": [{"word": "hi", "count": 3}]},
+        )
+        self.assertEqual(response.headers["Cache-Control"], "no-cache")
+
+    def test_not_modified(self):
+        etag = self.client.get("/stats/abc/words.txt").headers["ETag"]
+        response = self.client.get(
+            "/stats/abc/words.txt", headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+
+        live.BOARDS.publish("abc", "words", [], "new table")
+        response = self.client.get(
+            "/stats/abc/words.txt", headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, b"new table")
+
+    def test_unknown(self):
+        self.assertEqual(self.client.get("/stats/abc/nope.json").status_code, 404)
+        self.assertEqual(self.client.get("/stats/xyz/words.json").status_code, 404)
+        self.assertEqual(self.client.get("/stats").get_json(), {"channels": ["abc"]})
+
+
+class TestWriterPublishes(unittest.TestCase):
+    def test_write_publishes_boards(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.addCleanup(shutil.rmtree, get_output_path("_test_live"))
+        old_boards, live.BOARDS = live.BOARDS, live.LiveBoards()
+        self.addCleanup(setattr, live, "BOARDS", old_boards)
+
+        store = StatsStore()
+        journal = Journal(os.path.join(tmp.name, "journal"))
+        journal.open(store, "start")
+        self.addCleanup(journal.close)
+        channel = ChannelStats("_test_live", store, journal, "start", WindowStats([5]))
+        writer = SnapshotWriter([channel])
+
+        self.assertFalse(writer.write(channel))
+        self.assertIsNone(live.BOARDS.get("_test_live", "yap", "json"))
+
+        store.add_message("bob", ["hello", "hello"])
+        self.assertTrue(writer.write(channel))
+        words = json.loads(live.BOARDS.get("_test_live", "words", "json").body)
+        self.assertEqual(words["words"], [{"word": "hello", "count": 2}])
+        self.assertIn(b"bob", live.BOARDS.get("_test_live", "yap", "txt").body)
+        self.assertFalse(writer.write(channel))
+
+        # Only messages counted by the channel are in its time windows
+        channel.add_messages([("eve", tokenize_message("hi hi"), None)], logging=False)
+        self.assertTrue(writer.write(channel))
+        recent = json.loads(live.BOARDS.get("_test_live", "words-5m", "json").body)
+        self.assertEqual(recent["words-5m"], [{"word": "hi", "count": 2}])
+        self.assertIn(b"eve", live.BOARDS.get("_test_live", "yap-5m", "txt").body)
+        self.assertNotIn(b"bob", live.BOARDS.get("_test_live", "yap-5m", "txt").body)
+
+    def test_failing_write_does_not_stop_others(self):
+        broken, fine = (SimpleNamespace(name=name) for name in ("broken", "fine"))
+        writer = SnapshotWriter([])
+        writer.channels = [broken, fine]
+        written = []
+
+        def write(channel, checkpoint=False):
+            if channel is broken:
+                raise AttributeError("bug")
+            written.append(channel.name)
+            return True
+
+        writer.write = write
+        with contextlib.redirect_stderr(io.StringIO()) as err:
+            with contextlib.redirect_stdout(io.StringIO()):
+                writer.write_due(0)
+        self.assertEqual(written, ["fine"])
+        self.assertIn("AttributeError: bug", err.getvalue())
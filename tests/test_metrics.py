@@ -0,0 +1,72 @@
+import unittest
+
+import metrics
+from metrics import Counter, CounterFunc, Gauge, Histogram, render
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self) -> None:
+        self.registered = metrics.REGISTRY[:]
+        metrics.REGISTRY.clear()
+
+    def tearDown(self) -> None:
+        metrics.REGISTRY[:] = self.registered
+
+    def test_counters_grouped_by_name(self):
+        a = Counter("test_total", "Things", {"kind": "a"})
+        b = Counter("test_total", "Things", {"kind": "b"})
+        a.inc()
+        b.inc(3)
+        self.assertEqual(
+            render(),
+            "# HELP test_total Things\n"
+            "# TYPE test_total counter\n"
+            'test_total{kind="a"} 1\n'
+            'test_total{kind="b"} 3\n',
+        )
+
+    def test_gauge_read_on_render(self):
+        values = [1]
+        Gauge("test_depth", "Depth", lambda: len(values))
+        values.append(2)
+        self.assertIn("test_depth 2\n", render())
+
+    def test_counter_func(self):
+        CounterFunc("test_hits_total", "Hits", lambda: 7)
+        self.assertIn("# TYPE test_hits_total counter\ntest_hits_total 7\n", render())
+
+    def test_failing_gauge(self):
+        Gauge("test_depth", "Depth", lambda: 1 / 0)
+        self.assertIn("test_depth nan\n", render())
+
+    def test_histogram_buckets_cumulative(self):
+        h = Histogram("test_seconds", "Time", buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 5.0):
+            h.observe(value)
+        lines = render().splitlines()
+        self.assertEqual(
+            lines[2:],
+            [
+                'test_seconds_bucket{le="0.1"} 2',
+                'test_seconds_bucket{le="1.0"} 3',
+                'test_seconds_bucket{le="+Inf"} 4',
+                "test_seconds_sum 5.65",
+                "test_seconds_count 4",
+            ],
+        )
+
+
+class TestMetricsRoute(unittest.TestCase):
+    def test_metrics_route(self):
+        from server import app
+
+        import main
+
+        main.MESSAGES_RECEIVED.inc()
+        response = app.test_client().get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith("text/plain"))
+        text = response.get_data(as_text=True)
+        self.assertIn("# TYPE yap_messages_received_total counter", text)
+        self.assertIn("yap_tokenize_seconds_count", text)
+        self.assertIn("yap_save_df_seconds_count", text)
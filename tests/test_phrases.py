@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+
+from journal import Journal
+from phrases import PhraseCounter
+from stats_store import StatsStore, create_stats_store
+from tokenizer import tokenize_message, weigh_tokens
+
+PASTA = "this is a copypasta this is"
+
+
+class TestPhraseCounter(unittest.TestCase):
+    def test_counted_once_per_message(self):
+        phrases = PhraseCounter(100)
+        phrases.add(PASTA.split())
+        phrases.add(PASTA.split(), 2)
+        phrases.add("kekw kekw kekw kekw kekw".split())
+        phrases.add("kekw kekw".split())
+        phrases.add(["hi"])
+
+        rows = {(phrase, kind): count for phrase, kind, count in phrases.rows()}
+        self.assertEqual(rows[("this is", "bigram")], 3)
+        self.assertEqual(rows[("this is a", "trigram")], 3)
+        self.assertEqual(rows[(PASTA, "message")], 3)
+        self.assertEqual(rows[("kekw kekw", "bigram")], 2)
+        # Messages shorter than 4 words are only counted as bigrams and trigrams
+        self.assertNotIn(("kekw kekw", "message"), rows)
+        # Phrases seen once aren't kept
+        self.assertNotIn(("kekw kekw kekw", "trigram"), rows)
+        self.assertEqual(len(rows), 10)
+
+    def test_batch_counts_repeats_together(self):
+        single, batched = PhraseCounter(100), PhraseCounter(100)
+        pasta, hello = PASTA.split(), "hello chat".split()
+        messages = [pasta, hello, pasta, list(pasta), hello]
+        for words in messages:
+            single.add(words, 2)
+        batched.add_batch(messages, 2)
+        self.assertEqual(sorted(batched.rows()), sorted(single.rows()))
+
+    def test_merge(self):
+        left, right, whole = (PhraseCounter(100) for _ in range(3))
+        for i, text in enumerate([PASTA, "hello chat", PASTA, "hello chat now"] * 3):
+            (left if i % 2 else right).add(text.split())
+            whole.add(text.split())
+        left.merge(right)
+        self.assertEqual(sorted(left.rows()), sorted(whole.rows()))
+
+    def test_sampled(self):
+        phrases = PhraseCounter(100, sample=3)
+        pasta, hello = PASTA.split(), "hello chat".split()
+        # The stride carries over between batches: messages 0, 3, 6 and 9
+        phrases.add_batch([pasta, hello, hello, pasta])
+        phrases.add_batch([hello, hello])
+        phrases.add_batch([pasta, hello, hello, pasta, hello])
+
+        rows = {(phrase, kind): count for phrase, kind, count in phrases.rows()}
+        self.assertEqual(rows[("this is", "bigram")], 12)
+        self.assertEqual(rows[(PASTA, "message")], 12)
+        self.assertNotIn(("hello chat", "bigram"), rows)
+        with self.assertRaises(ValueError):
+            phrases.merge(PhraseCounter(100))
+
+
+class TestStorePhrases(unittest.TestCase):
+    def test_off_without_capacity(self):
+        store = StatsStore()
+        store.add_phrases([PASTA.split()])
+        self.assertIsNone(store.phrases)
+        self.assertEqual(store.snapshot().phrase_rows, [])
+
+    def test_survive_recovery(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            journal = Journal(os.path.join(tmp, "journal"))
+            store = create_stats_store(True, 100, 100)
+            journal.open(store, "24-01-01-00-00")
+            with store.lock:
+                # Phrases seen once aren't checkpointed, these are seen twice
+                for _ in range(2):
+                    store.add_tokens("bob", tokenize_message(PASTA))
+                    journal.append("bob", PASTA.split())
+                store.add_phrases([PASTA.split()] * 2)
+                journal.commit()
+            journal.checkpoint(store)
+            with store.lock:
+                tokens = weigh_tokens(tokenize_message(PASTA), 2)
+                store.add_tokens("eve", tokens)
+                store.add_phrases([tokens[0]], 2)
+                journal.append("eve", PASTA.split(), 2)
+                journal.commit()
+            journal.close()
+
+            recovered, _ = Journal(os.path.join(tmp, "journal")).recover()
+        self.assertEqual(
+            sorted(recovered.snapshot().phrase_rows), sorted(store.phrase_rows)
+        )
+        self.assertIn((PASTA, "message", 4), recovered.phrase_rows)
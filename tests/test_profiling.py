@@ -0,0 +1,61 @@
+import os
+import tempfile
+import threading
+import unittest
+
+import profiling
+from server import app
+
+
+def busy_loop(stopped: threading.Event) -> list[list[int]]:
+    while not stopped.is_set():
+        # Still held when the capture ends
+        kept = [[i * i for i in range(100)] for _ in range(100)]
+    return kept
+
+
+class TestProfile(unittest.TestCase):
+    def test_capture_written(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        stopped = threading.Event()
+        worker = threading.Thread(target=busy_loop, args=(stopped,), name="busy")
+        worker.start()
+        try:
+            profile = profiling.Profile(0.3, tmp.name, interval=0.001)
+            profile.start()
+            self.assertTrue(profile.done.wait(10))
+        finally:
+            stopped.set()
+            worker.join()
+
+        self.assertEqual(len(profile.paths), 3)
+        summary, collapsed, allocations = (
+            open(path, encoding="utf-8").read() for path in profile.paths
+        )
+        self.assertIn("\nbusy\n", summary)
+        self.assertIn("busy_loop (test_profiling.py:", summary)
+        self.assertTrue(
+            any(line.startswith("busy;") for line in collapsed.splitlines())
+        )
+        self.assertNotIn("profiler;", collapsed)
+        self.assertIn("test_profiling.py", allocations)
+        self.assertGreater(profile.ticks, 0)
+
+    def test_one_capture_at_a_time(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        with self.assertRaises(ValueError):
+            profiling.start_capture(0, tmp.name)
+
+        profile = profiling.start_capture(60, tmp.name)
+        self.assertIsNotNone(profile)
+        try:
+            self.assertIsNone(profiling.start_capture(1, tmp.name))
+            client = app.test_client()
+            self.assertEqual(client.post("/profile").status_code, 409)
+            self.assertEqual(client.post("/profile?seconds=0").status_code, 400)
+        finally:
+            profile.stop()
+            self.assertTrue(profile.done.wait(10))
+        self.assertTrue(all(os.path.exists(path) for path in profile.paths))
@@ -0,0 +1,80 @@
+import os
+import random
+import tempfile
+import unittest
+
+import replay
+from replay import parse_lines, read_lines, split_file
+from stats_store import StatsStore
+from usersettings import SettingsSnapshot
+
+SETTINGS = SettingsSnapshot(
+    version=0,
+    target_channel="",
+    excluded_users=frozenset({"bot"}),
+    logging=False,
+    padding=0,
+    display_rows=25,
+    strip_punctuation=False,
+    strip_emoji=False,
+    snapshot_interval=0,
+    checkpoint_interval=0,
+)
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self) -> None:
+        rnd = random.Random(0)
+        self.lines = [
+            f"{rnd.choice(['alice', 'bob', 'eve', 'bot'])}\t"
+            + " ".join(rnd.choice(["hi", "KEKW", "pog", "é"]) for _ in range(3))
+            for _ in range(500)
+        ]
+        fd, self.path = tempfile.mkstemp()
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write("\n".join(self.lines) + "\n")
+
+    def tearDown(self) -> None:
+        os.remove(self.path)
+
+    def test_ranges_read_every_line_once(self):
+        for parts in (1, 2, 7, 100, 10_000):
+            lines = [
+                line
+                for byte_range in split_file(self.path, parts)
+                for block in read_lines(self.path, *byte_range)
+                for line in block
+            ]
+            self.assertEqual(lines, self.lines)
+
+    def test_small_blocks(self):
+        full = [line for block in read_lines(self.path, 100, 2000) for line in block]
+        old_size, replay.BLOCK_SIZE = replay.BLOCK_SIZE, 7
+        try:
+            blocks = list(read_lines(self.path, 100, 2000))
+        finally:
+            replay.BLOCK_SIZE = old_size
+        self.assertGreater(len(blocks), 1)
+        self.assertEqual([line for block in blocks for line in block], full)
+
+    def test_parse_lines(self):
+        lines = ["bob\thello\tthere\r", "no message", "eve\t"]
+        self.assertEqual(
+            parse_lines(lines, False), [("bob", "hello\tthere"), ("eve", "")]
+        )
+        self.assertEqual(parse_lines(["12:00\tbob\thi"], True), [("bob", "hi")])
+
+    def test_parts_match_single_pass(self):
+        expected = StatsStore()
+        for username, text in parse_lines(self.lines, False):
+            if username != "bot":
+                expected.add_message(username, text.lower().split())
+
+        for processes in (1, 3):
+            store = replay.replay(self.path, SETTINGS, processes=processes)
+            self.assertEqual(store.usernames, expected.usernames)
+            self.assertEqual(store.messages, expected.messages)
+            self.assertEqual(store.vocab_sizes, expected.vocab_sizes)
+            self.assertEqual(
+                dict(store.word_appearances()), dict(expected.word_appearances())
+            )
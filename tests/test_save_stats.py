@@ -0,0 +1,155 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import save_stats
+from save_stats import (
+    calc_yap_factor,
+    calc_yap_factors,
+    column,
+    get_df_emote_stats,
+    get_df_overload,
+    get_df_phrase_stats,
+    get_df_word_stats,
+    get_df_yap_stats,
+    get_emotes_leaderboard,
+    get_words_leaderboard,
+    get_yap_leaderboard,
+    write_table,
+    zscore,
+)
+from ingest import OverloadEpisode
+from stats_store import ApproxStatsStore, StatsStore
+
+
+class TestSaveStats(unittest.TestCase):
+    def setUp(self) -> None:
+        self.store = StatsStore()
+        self.store.add_message("test1", ["hello", "world"])
+        self.store.add_message("test2", ["hello", "hello", "bye"])
+        self.store.add_message("test3", ["a", "much", "longer", "message", "here"])
+        self.store.add_message("test1", ["hello", "again"])
+
+    def test_vectorized_yap_factor_matches_scalar(self):
+        expected = [
+            calc_yap_factor(self.store.user_stats(u)) for u in self.store.usernames
+        ]
+        actual = calc_yap_factors(
+            column(self.store.letters),
+            column(self.store.messages),
+            column(self.store.vocab_sizes),
+        )
+        np.testing.assert_allclose(actual, expected)
+
+    def test_zscore(self):
+        np.testing.assert_allclose(
+            zscore([1.0, 2.0, 3.0]), [-1.224745, 0, 1.224745], atol=1e-6
+        )
+        # Same as scipy's, no spread has no z-scores
+        self.assertTrue(np.isnan(zscore([2.0, 2.0])).all())
+
+    def test_yap_df_sorted_by_cost(self):
+        yap_df = get_df_yap_stats(self.store)
+        self.assertEqual(len(yap_df), 3)
+        self.assertTrue(yap_df["yap cost"].is_monotonic_decreasing)
+        row = yap_df[yap_df["username"] == "test1"].iloc[0]
+        self.assertEqual([row["letters"], row["messages"], row["vocab"]], [20, 2, 3])
+        self.assertEqual(row["avg. message len"], 10)
+
+    def test_word_df_sorted_by_count(self):
+        words_df = get_df_word_stats(self.store)
+        self.assertEqual(words_df.iloc[0].tolist(), ["hello", 4])
+        self.assertEqual(words_df["count"].sum(), 12)
+
+    def test_leaderboards_match_dataframes(self):
+        yap_df = get_df_yap_stats(self.store)
+        expected = yap_df.filter(
+            ["username", "yap cost", "avg. message len", "vocab"], axis=1
+        ).to_dict("records")
+        actual = get_yap_leaderboard(self.store, 0)
+        self.assertEqual([r["username"] for r in actual], yap_df["username"].tolist())
+        for a, e in zip(actual, expected):
+            self.assertAlmostEqual(a["yap cost"], e["yap cost"])
+            self.assertEqual(a["vocab"], e["vocab"])
+
+        self.assertEqual(
+            get_words_leaderboard(self.store, 1), [{"word": "hello", "count": 4}]
+        )
+
+    def test_emote_table(self):
+        self.store.add_tokens("test2", ([], None, 0), ([("1", "LUL", 1)], 3))
+        self.store.add_tokens("test1", ([], None, 0), ([("25", "Kappa", 3)], 15))
+        emotes_df = get_df_emote_stats(self.store)
+        self.assertEqual(emotes_df.iloc[0].tolist(), ["Kappa", "25", 3])
+        self.assertEqual(
+            get_emotes_leaderboard(self.store, 1), [{"emote": "Kappa", "count": 3}]
+        )
+
+    def test_phrase_table(self):
+        self.assertEqual(len(get_df_phrase_stats(self.store)), 0)
+        store = StatsStore(phrase_capacity=100)
+        store.add_phrases(
+            [["hello", "chat", "how", "are", "you"]] * 3 + [["hello", "chat"]]
+        )
+        phrases_df = get_df_phrase_stats(store)
+        self.assertEqual(phrases_df.iloc[0].tolist(), ["hello chat", "bigram", 4])
+        self.assertEqual(
+            phrases_df[phrases_df["kind"] == "message"].values.tolist(),
+            [["hello chat how are you", "message", 3]],
+        )
+
+    def test_overload_table(self):
+        episodes = [
+            OverloadEpisode("sample", 0.0, 61.0, 900, 100, 400, 4),
+            OverloadEpisode("drop_oldest", 120.0),
+        ]
+        df = get_df_overload(episodes)
+        self.assertEqual(
+            list(df["start"]), ["1970-01-01 00:00:00", "1970-01-01 00:02:00"]
+        )
+        self.assertEqual(list(df["end"]), ["1970-01-01 00:01:01", ""])
+        self.assertEqual(list(df["sampled out"]), [400, 0])
+        self.assertEqual(list(df["sample rate"]), [4, 1])
+
+    def test_approximate_store(self):
+        store = ApproxStatsStore(2)
+        store.add_message("test1", ["hello", "world"])
+        store.add_message("test2", ["hello", "hello", "bye"])
+        self.assertEqual(len(get_df_word_stats(store)), 2)
+        self.assertEqual(get_df_yap_stats(store)["vocab"].tolist(), [2, 2])
+        self.assertAlmostEqual(
+            calc_yap_factor(store.user_stats("test1")),
+            calc_yap_factors(
+                column(store.letters), column(store.messages), column(store.vocab_sizes)
+            )[0],
+        )
+        # 0 rows shows every word the store holds
+        self.assertEqual(
+            get_words_leaderboard(store, 0),
+            [{"word": "hello", "count": 3}, {"word": "bye", "count": 2}],
+        )
+
+
+@unittest.skipIf(importlib.util.find_spec("pyarrow") is None, "needs pyarrow")
+class TestOutputFormats(unittest.TestCase):
+    def test_tables_read_back(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.addCleanup(setattr, save_stats, "EXPORT_CHUNK_ROWS", 65_536)
+        # Several chunks, with emojis that need UTF-16 in CSVs
+        save_stats.EXPORT_CHUNK_ROWS = 3
+        df = pd.DataFrame(
+            {"word": ["hello", "\U0001f480", "kekw", "a", "b", "c", "d"]}
+        ).assign(count=np.arange(7, 0, -1))
+
+        for output_format, read in (
+            ("parquet", pd.read_parquet),
+            ("arrow", pd.read_feather),
+        ):
+            path = os.path.join(tmp.name, f"words.{output_format}")
+            write_table(df, path, output_format, "UTF-16")
+            pd.testing.assert_frame_equal(read(path), df)
@@ -0,0 +1,155 @@
+import pickle
+import random
+import unittest
+from collections import Counter
+
+from sketches import HyperLogLog, LossyCounter, SpaceSaving, word_hash
+
+
+class TestHyperLogLog(unittest.TestCase):
+    def test_exact_while_small(self):
+        hll = HyperLogLog()
+        hll.update(word_hash(f"w{i}") for i in range(20))
+        hll.update(word_hash(f"w{i}") for i in range(10))
+        self.assertEqual(len(hll), 20)
+
+    def test_estimate_within_error_bound(self):
+        for n in (100, 1000, 20000):
+            hll = HyperLogLog()
+            hll.update(word_hash(f"word{i}") for i in range(n))
+            # 4 standard errors
+            self.assertAlmostEqual(len(hll) / n, 1, delta=4 * 1.04 / HyperLogLog.M**0.5)
+
+    def test_copy_is_independent(self):
+        hll = HyperLogLog()
+        hll.update(word_hash(f"w{i}") for i in range(100))
+        other = hll.copy()
+        hll.update(word_hash(f"x{i}") for i in range(1000))
+        self.assertLess(len(other), len(hll))
+
+    def test_merge_matches_single_sketch(self):
+        hashes = [word_hash(f"w{i}") for i in range(5000)]
+        whole = HyperLogLog()
+        whole.update(hashes)
+        for split in (10, 2500, 4990):
+            left, right = HyperLogLog(), HyperLogLog()
+            left.update(hashes[:split])
+            right.update(hashes[split:])
+            left.merge(right)
+            self.assertEqual(len(left), len(whole))
+
+    def test_merge_exact(self):
+        left, right = HyperLogLog(), HyperLogLog()
+        left.update(range(10))
+        right.update(range(5, 20))
+        left.merge(right)
+        self.assertEqual(len(left), 20)
+
+
+class TestSpaceSaving(unittest.TestCase):
+    def test_exact_under_capacity(self):
+        counter = SpaceSaving(10)
+        counter.update(["a", "b", "a", "c", "a"])
+        self.assertEqual(counter.counts, {"a": 3, "b": 1, "c": 1})
+        self.assertEqual(counter.top(1), [("a", 3)])
+
+    def test_add_same_as_update(self):
+        added, updated = SpaceSaving(3), SpaceSaving(3)
+        for word, count in [("a", 5), ("b", 1), ("c", 2), ("d", 4), ("a", 2)]:
+            added.add(word, count)
+            updated.update([word] * count)
+        self.assertEqual(added.counts, updated.counts)
+        self.assertEqual(added.errors, updated.errors)
+        self.assertEqual(added.total, updated.total)
+
+    def test_heavy_hitters_guaranteed(self):
+        rnd = random.Random(0)
+        words = [f"w{int(rnd.paretovariate(1.1))}" for _ in range(50000)]
+        words += [f"typo{i}" for i in range(5000)]
+        rnd.shuffle(words)
+        counter = SpaceSaving(200)
+        counter.update(words)
+        exact = Counter(words)
+
+        self.assertEqual(len(counter), 200)
+        bound = counter.total / counter.capacity
+        for word, count in exact.items():
+            if count > bound:
+                self.assertIn(word, counter.counts)
+        for word, count in counter.counts.items():
+            self.assertGreaterEqual(count, exact[word])
+            self.assertLessEqual(count - exact[word], counter.errors.get(word, 0))
+            self.assertLessEqual(counter.errors.get(word, 0), bound)
+
+    def test_merge_keeps_guarantees(self):
+        rnd = random.Random(1)
+        words = [f"w{int(rnd.paretovariate(1.1))}" for _ in range(40000)]
+        left, right = SpaceSaving(200), SpaceSaving(200)
+        left.update(words[:15000])
+        right.update(words[15000:])
+        left.merge(right)
+        exact = Counter(words)
+
+        self.assertEqual(left.total, len(words))
+        self.assertLessEqual(len(left), 200)
+        for word, count in left.counts.items():
+            self.assertGreaterEqual(count, exact[word])
+            self.assertLessEqual(count - exact[word], left.errors.get(word, 0))
+        left.update(["new"] * 3)
+        self.assertEqual(left.total, len(words) + 3)
+
+
+class TestLossyCounter(unittest.TestCase):
+    def check_guarantees(self, counter: LossyCounter, exact: Counter) -> None:
+        bound = max(counter.total / counter.width, counter.missed)
+        tracked = {counter.items[key]: key for key in counter.items}
+        for item, count in exact.items():
+            if count > bound:
+                self.assertIn(item, tracked)
+        for item, key in tracked.items():
+            count = counter.counts[key]
+            self.assertLessEqual(count, exact[item])
+            self.assertLessEqual(exact[item] - count, counter.errors.get(key, 0))
+            self.assertLessEqual(counter.errors.get(key, 0), bound)
+
+    def test_exact_before_pruning(self):
+        counter = LossyCounter(100)
+        counter.update(["a", "b", "a", "c", "a", "b"])
+        counter.update(["c"], 3)
+        self.assertEqual(counter.top(2), [("c", 4), ("a", 3)])
+        # Only kept once seen again
+        counter.update(["d"])
+        self.assertEqual(len(counter), 4)
+        self.assertEqual(len(counter.top(10)), 3)
+
+    def test_heavy_hitters_guaranteed(self):
+        rnd = random.Random(0)
+        items = [f"w{int(rnd.paretovariate(1.1))}" for _ in range(50000)]
+        items += [f"typo{i}" for i in range(5000)]
+        rnd.shuffle(items)
+        counter = LossyCounter(500)
+        for i in range(0, len(items), 7):
+            counter.update(items[i : i + 7])
+
+        self.assertEqual(counter.total, len(items))
+        self.assertLess(len(counter), 5000)
+        self.check_guarantees(counter, Counter(items))
+
+    def test_merge_keeps_guarantees(self):
+        rnd = random.Random(1)
+        items = [(f"w{int(rnd.paretovariate(1.1))}", "x") for _ in range(40000)]
+        left, right = LossyCounter(500), LossyCounter(500)
+        left.update(items[:15000])
+        right.update(items[15000:])
+        # As replays do, from another process
+        left.merge(pickle.loads(pickle.dumps(right)))
+
+        self.assertEqual(left.total, len(items))
+        self.check_guarantees(left, Counter(items))
+
+    def test_pickle_rehashes_items(self):
+        counter = LossyCounter(100)
+        counter.update([("a", "b"), ("a", "b"), ("c", "d")])
+        restored = pickle.loads(pickle.dumps(counter))
+        restored.update([("a", "b")])
+        self.assertEqual(restored.top(5), [(("a", "b"), 3)])
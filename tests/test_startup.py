@@ -0,0 +1,26 @@
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+SRC = Path(__file__).parents[1] / "src"
+
+# Only needed once stats are saved, the bot runs or the server starts
+DEFERRED = ["flask", "numpy", "pandas", "scipy", "tabulate", "twitchAPI", "validators"]
+
+
+class TestStartup(unittest.TestCase):
+    def test_main_defers_heavy_imports(self):
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, main; print(' '.join(sys.modules))",
+            ],
+            cwd=SRC,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        loaded = {name.split(".")[0] for name in result.stdout.split()}
+        self.assertEqual([m for m in DEFERRED if m in loaded], [])
@@ -0,0 +1,164 @@
+import unittest
+
+from stats_store import ApproxStatsStore, StatsStore, Vocabulary
+from tokenizer import tokenize_message
+
+
+class TestVocabulary(unittest.TestCase):
+    def test_intern_assigns_ids_in_order(self):
+        vocab = Vocabulary()
+        self.assertEqual(vocab.intern_many(["a", "b", "a", "c"]), [0, 1, 0, 2])
+        self.assertEqual(vocab.intern("b"), 1)
+        self.assertEqual(vocab.words, ["a", "b", "c"])
+        self.assertEqual(len(vocab), 3)
+
+
+class TestStatsStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.store = StatsStore()
+        self.store.add_message("test1", ["hello", "world"])
+        self.store.add_message("test2", ["hello", "hello", "bye"])
+
+    def test_word_counts(self):
+        self.assertEqual(
+            dict(self.store.word_appearances()), {"hello": 3, "world": 1, "bye": 1}
+        )
+
+    def test_user_stats(self):
+        user = self.store.user_stats("test2")
+        self.assertEqual(
+            [user.letter_count, user.word_count, user.messages, len(user.unique_words)],
+            [13, 3, 1, 2],
+        )
+        self.assertEqual(self.store.user_words("test2"), {"hello", "bye"})
+
+    def test_columns_indexed_by_user_id(self):
+        self.store.add_message("test1", ["again"])
+        user_id = self.store.user_ids["test1"]
+        self.assertEqual(self.store.usernames[user_id], "test1")
+        self.assertEqual(self.store.messages[user_id], 2)
+        self.assertEqual(self.store.letters[user_id], 15)
+        self.assertEqual(self.store.vocab_sizes[user_id], 3)
+        self.assertEqual(len(self.store), 2)
+
+    def test_users_share_word_ids(self):
+        ids1 = self.store.user_vocab[self.store.user_ids["test1"]]
+        ids2 = self.store.user_vocab[self.store.user_ids["test2"]]
+        self.assertEqual(ids1 & ids2, {self.store.vocab.ids["hello"]})
+
+    def test_snapshot_is_independent_copy(self):
+        snapshot = self.store.snapshot()
+        self.store.add_message("test3", ["new", "words"])
+        self.store.add_message("test1", ["hello"])
+
+        self.assertEqual(snapshot.version, 2)
+        self.assertEqual(self.store.version, 4)
+        self.assertEqual(snapshot.usernames, ["test1", "test2"])
+        self.assertEqual(list(snapshot.messages), [1, 1])
+        self.assertEqual(snapshot.vocab_words, ["hello", "world", "bye"])
+        self.assertEqual(list(snapshot.word_counts), [3, 1, 1])
+
+    def test_copy_is_independent(self):
+        store = StatsStore(phrase_capacity=100)
+        for _ in range(2):
+            store.add_message("test1", ["hello", "chat"])
+            store.add_phrases([["hello", "chat"]])
+        copy = store.copy()
+        store.add_message("test1", ["bye"])
+        store.add_message("test3", ["new"])
+        store.add_phrases([["hello", "chat"]])
+        store.release_copy()
+        store.add_message("test1", ["again"])
+
+        self.assertEqual(copy.usernames, ["test1"])
+        self.assertEqual(copy.user_words("test1"), {"hello", "chat"})
+        self.assertEqual(copy.top_words(5), [("hello", 2), ("chat", 2)])
+        self.assertEqual(copy.phrase_rows, [("hello chat", "bigram", 2)])
+        self.assertEqual(store.user_words("test1"), {"hello", "chat", "bye", "again"})
+        self.assertEqual(store.phrase_rows, [("hello chat", "bigram", 3)])
+
+    def test_merge_matches_single_store(self):
+        other = StatsStore()
+        other.add_message("test3", ["bye", "new"])
+        other.add_message("test1", ["new", "hello"])
+        whole = StatsStore()
+        for username, words in [
+            ("test1", ["hello", "world"]),
+            ("test2", ["hello", "hello", "bye"]),
+            ("test3", ["bye", "new"]),
+            ("test1", ["new", "hello"]),
+        ]:
+            whole.add_message(username, words)
+
+        self.store.merge(other)
+        self.assertEqual(self.store.usernames, whole.usernames)
+        self.assertEqual(
+            dict(self.store.word_appearances()), dict(whole.word_appearances())
+        )
+        for column in ("letters", "word_totals", "messages", "vocab_sizes"):
+            self.assertEqual(getattr(self.store, column), getattr(whole, column))
+        self.assertEqual(self.store.user_words("test1"), {"hello", "world", "new"})
+        self.assertEqual(self.store.top_words(1), [("hello", 4)])
+        self.assertEqual(self.store.version, 4)
+
+
+class TestAddTokens(unittest.TestCase):
+    def test_same_as_add_message(self):
+        messages = [("a", "KEKW KEKW KEKW"), ("b", "hello kekw world"), ("a", "hi")]
+        for make in (StatsStore, lambda: ApproxStatsStore(100)):
+            by_words, by_tokens = make(), make()
+            for username, text in messages:
+                by_words.add_message(username, text.lower().split())
+                by_tokens.add_tokens(username, tokenize_message(text))
+            for column in ("letters", "word_totals", "messages", "vocab_sizes"):
+                self.assertEqual(
+                    list(getattr(by_tokens, column)), list(getattr(by_words, column))
+                )
+            self.assertEqual(by_tokens.top_words(10), by_words.top_words(10))
+            self.assertEqual(by_tokens.version, by_words.version)
+
+    def test_emotes_counted_apart(self):
+        kappa = ([("25", "Kappa", 2)], 10)
+        store, other = StatsStore(), StatsStore()
+        store.add_tokens("a", tokenize_message("hi"), kappa)
+        other.add_tokens("b", tokenize_message("hi"), ([("1", "LUL", 3)], 9))
+        other.add_tokens("a", ([], None, 0), kappa)
+        store.merge(other)
+
+        self.assertEqual(dict(store.word_appearances()), {"hi": 2})
+        self.assertEqual(list(store.letters), [22, 11])
+        self.assertEqual(list(store.vocab_sizes), [1, 1])
+        self.assertEqual(store.top_emotes(2), [("25", "Kappa", 4), ("1", "LUL", 3)])
+        self.assertEqual(store.snapshot().emote_names, ["Kappa", "LUL"])
+
+
+class TestApproxStatsStore(unittest.TestCase):
+    def test_same_as_exact_while_small(self):
+        exact, approx = StatsStore(), ApproxStatsStore(100)
+        for store in (exact, approx):
+            store.add_message("test1", ["hello", "world"])
+            store.add_message("test2", ["hello", "hello", "bye"])
+
+        self.assertEqual(
+            dict(approx.word_appearances()), dict(exact.word_appearances())
+        )
+        self.assertEqual(list(approx.vocab_sizes), list(exact.vocab_sizes))
+        self.assertEqual(approx.top_words(1), [("hello", 3)])
+        self.assertEqual(len(approx.user_stats("test2").unique_words), 2)
+
+    def test_word_table_capped(self):
+        store = ApproxStatsStore(10)
+        for i in range(100):
+            store.add_message("test1", [f"word{i}", "common"])
+        self.assertEqual(len(store.vocab_words), 10)
+        self.assertEqual(store.top_words(1), [("common", 100)])
+
+    def test_merge(self):
+        store, other = ApproxStatsStore(100), ApproxStatsStore(100)
+        store.add_message("test1", ["hello", "world"])
+        other.add_message("test1", ["hello", "bye"])
+        other.add_message("test2", ["bye"])
+        store.merge(other)
+        self.assertEqual(store.usernames, ["test1", "test2"])
+        self.assertEqual(list(store.vocab_sizes), [3, 1])
+        self.assertEqual(dict(store.top_words(2)), {"hello": 2, "bye": 2})
@@ -0,0 +1,99 @@
+import unittest
+
+import validators
+
+from tokenizer import (
+    MESSAGE_CACHE,
+    filter_word_list,
+    split_emotes,
+    tokenize,
+    tokenize_message,
+    tokenize_messages,
+)
+
+CORPUS = [
+    "hello world",
+    "  Hello   WORLD  ",
+    "check this out https://clips.twitch.tv/abc-def KEKW",
+    "HTTP://EXAMPLE.COM/Path?Q=1 is loud",
+    "www.twitch.tv twitch.tv are not links",
+    "ftp://x.com ssh://a.com irc://a.com rtmp://a.com/x",
+    "file:a file:/a http:a.com http:/a.com",
+    ":) :D :tf: a:b 12:30",
+    "http://1.2.3.4 http://[::1]/ http://localhost:8000",
+    "!command with args",
+    "don't stop... believing!!",
+    "emote spam 😂😂😂 LUL 🇬🇧 PogChamp",
+    "https://a.co/, trailing https://a.com.",
+    "",
+    "     ",
+]
+
+
+def reference(msg: str) -> list[str]:
+    return [w for w in msg.strip().lower().split() if not validators.url(w)]
+
+
+class TestTokenizer(unittest.TestCase):
+    def test_matches_reference(self):
+        for msg in CORPUS:
+            self.assertEqual(tokenize(msg), reference(msg), msg)
+
+    def test_message_tokens(self):
+        wall = "KEKW kekw LUL KEKW KEKW LUL KEKW KEKW https://a.com"
+        tokens = tokenize_message(wall)
+        self.assertEqual(
+            tokens,
+            (
+                "kekw kekw lul kekw kekw lul kekw kekw".split(),
+                {"kekw": 6, "lul": 2},
+                30,
+            ),
+        )
+        self.assertIsNone(tokenize_message("a few words and a few more words")[1])
+        # A text seen again, even a batch later, is kept for every later copy
+        MESSAGE_CACHE.clear()
+        tokenize_message(wall)
+        kept = tokenize_message(wall)
+        self.assertIs(tokenize_message(wall), kept)
+        batch = tokenize_messages(["hi chat", wall, "hi chat"])
+        self.assertIs(batch[1], kept)
+        self.assertIsNot(batch[2], batch[0])
+        self.assertIs(tokenize_message("hi chat"), batch[2])
+        self.assertEqual(
+            [words for words, _, _ in tokenize_messages(CORPUS, True, True)],
+            [tokenize(m, True, True) for m in CORPUS],
+        )
+
+    def test_filter_word_list(self):
+        for msg in CORPUS:
+            words = msg.strip().lower().split()
+            self.assertEqual(filter_word_list(words), reference(msg))
+
+    def test_strip_punctuation(self):
+        self.assertEqual(
+            tokenize("Don't stop... (believing)!! https://a.com/x?", True),
+            ["don't", "stop", "believing"],
+        )
+        self.assertEqual(tokenize("!!! ...", True), [])
+
+    def test_strip_emoji(self):
+        self.assertEqual(
+            tokenize("lol 😂😂 ok👍🏽 ❤️ 🇬🇧", strip_emoji=True), ["lol", "ok"]
+        )
+
+    def test_split_emotes(self):
+        # Positions as Twitch sends them, inclusive, in code points
+        text = "😂 Kappa hi KAPPA Kappa:/"
+        tag = {
+            "25": [
+                {"start_position": "2", "end_position": "6"},
+                {"start_position": "17", "end_position": "21"},
+            ],
+            "10": [{"start_position": "22", "end_position": "23"}],
+            "99": [],
+        }
+        rest, emotes = split_emotes(text, tag)
+        self.assertEqual(tokenize(rest), ["😂", "hi", "kappa"])
+        self.assertEqual(emotes, ([("25", "Kappa", 2), ("10", ":/", 1)], 12))
+        self.assertEqual(split_emotes("hi chat", {}), ("hi chat", ([], 0)))
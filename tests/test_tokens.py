@@ -0,0 +1,95 @@
+import asyncio
+import os
+import stat
+import tempfile
+import unittest
+from pathlib import Path
+
+from twitchAPI.type import (
+    AuthScope,
+    InvalidRefreshTokenException,
+    TwitchBackendException,
+)
+
+from tokens import TokenStore, authenticate
+
+READ = [AuthScope.CHAT_READ]
+READ_EDIT = [AuthScope.CHAT_EDIT, AuthScope.CHAT_READ]
+
+
+class DownTwitch:
+    """Fails like twitchAPI does when Twitch answers with a 5xx."""
+
+    user_auth_refresh_callback = None
+
+    async def set_user_authentication(self, token, scope, refresh_token) -> None:
+        raise TwitchBackendException("503")
+
+
+class FakeTwitch:
+    """Accepts only `valid` tokens, refreshing `expired` ones like twitchAPI does."""
+
+    def __init__(self, valid: set[str], expired: frozenset[str] = frozenset()) -> None:
+        self.valid = valid
+        self.expired = expired
+        self.user_auth_refresh_callback = None
+        self.token: str | None = None
+
+    async def set_user_authentication(self, token, scope, refresh_token) -> None:
+        if token in self.expired:
+            token, refresh_token = f"{token}-refreshed", f"{refresh_token}-refreshed"
+            await self.user_auth_refresh_callback(token, refresh_token)
+        if token not in self.valid and not token.endswith("-refreshed"):
+            raise InvalidRefreshTokenException("invalid")
+        self.token = token
+
+
+class TestTokens(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = TokenStore(Path(tmp.name) / "user_token.json")
+        self.logins = 0
+
+    async def login(self, twitch, scope) -> tuple[str, str]:
+        self.logins += 1
+        return f"browser{self.logins}", "refresh"
+
+    def authenticate(self, twitch: FakeTwitch, scope=READ) -> None:
+        asyncio.run(authenticate(twitch, scope, self.store, self.login))
+
+    def test_save_is_private(self):
+        self.store.save("token", "refresh", READ)
+        self.assertEqual(stat.S_IMODE(os.stat(self.store.path).st_mode), 0o600)
+        self.assertEqual(self.store.load(READ), ("token", "refresh", READ))
+        # The bot can't reuse a token missing a scope it needs
+        self.assertIsNone(self.store.load(READ_EDIT))
+
+    def test_reuses_stored_login(self):
+        self.authenticate(FakeTwitch({"browser1"}))
+        self.authenticate(twitch := FakeTwitch({"browser1"}))
+        self.assertEqual(self.logins, 1)
+        self.assertEqual(twitch.token, "browser1")
+
+    def test_refreshed_tokens_are_stored(self):
+        self.store.save("old", "refresh", READ_EDIT)
+        self.authenticate(FakeTwitch(set(), expired={"old"}))
+        self.assertEqual(self.logins, 0)
+        # The server's scopes are kept when the bot refreshes its token
+        self.assertEqual(
+            self.store.load(READ), ("old-refreshed", "refresh-refreshed", READ_EDIT)
+        )
+
+    def test_logs_in_when_refresh_fails(self):
+        self.store.save("revoked", "refresh", READ)
+        self.authenticate(twitch := FakeTwitch({"browser1"}))
+        self.assertEqual(self.logins, 1)
+        self.assertEqual(twitch.token, "browser1")
+        self.assertEqual(self.store.load(READ)[0], "browser1")
+
+    def test_outage_is_not_a_bad_login(self):
+        self.store.save("token", "refresh", READ)
+        with self.assertRaises(TwitchBackendException):
+            self.authenticate(DownTwitch())
+        self.assertEqual(self.logins, 0)
+        self.assertEqual(self.store.load(READ)[0], "token")
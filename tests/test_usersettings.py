@@ -74,6 +74,17 @@ class TestUserSettings(unittest.TestCase):
         us.load_from_file()
         self.assertTrue(os.path.exists(os.path.abspath(us.file_loc)))
 
+    def test_snapshot_reused_until_settings_change(self) -> None:
+        us = UserSettings()
+        snap1 = us.snapshot()
+        self.assertIs(snap1, us.snapshot())
+
+        us.settings.excluded_users.add("abc")
+        us.save_to_file()
+        snap2 = us.snapshot()
+        self.assertIsNot(snap1, snap2)
+        self.assertEqual(snap2.excluded_users, frozenset({"abc"}))
+
 
 class TestSettingsData(unittest.TestCase):
     def test_empty_init(self) -> None:
@@ -101,9 +112,58 @@ class TestSettingsData(unittest.TestCase):
                 "Excluded Users",
                 "Logging",
                 "Padding",
+                "Display Rows",
+                "Strip Punctuation",
+                "Strip Emojis",
+                "Snapshot Interval",
+                "Checkpoint Interval",
+                "Approximate Stats",
+                "Approximate Word Capacity",
+                "Metrics Port",
+                "Time Windows",
+                "Output Format",
+                "Keep History",
+                "Ingest Buffer",
+                "Overload Policy",
+                "Phrase Capacity",
+                "Phrase Sample",
             ],
         )
 
+    def test_target_channels(self):
+        sd = SettingsData()
+        self.assertEqual(sd.target_channels, [])
+        sd.target_channel = "abc"
+        self.assertEqual(sd.target_channels, ["abc"])
+        sd.target_channel = " abc, #Def,,abc "
+        self.assertEqual(sd.target_channels, ["abc", "def"])
+
+    def test_from_env(self):
+        sd = SettingsData()
+        sd.from_env(
+            {
+                "YAP_TARGET_CHANNEL": "abc,def",
+                "YAP_EXCLUDED_USERS": "nightbot, streamelements",
+                "YAP_LOGGING": "false",
+                "YAP_METRICS_PORT": "0",
+                "YAP_APP_ID": "123",
+                "YAP_TIME_WINDOWS": "10, 30",
+            }
+        )
+        self.assertEqual(sd.target_channels, ["abc", "def"])
+        self.assertEqual(sd.excluded_users, {"nightbot", "streamelements"})
+        self.assertEqual([sd.logging, sd.metrics_port, sd.app_id], [False, 0, "123"])
+        self.assertEqual(sd.time_windows, [10, 30])
+        # Anything not set is left alone
+        self.assertEqual(sd.display_rows, 25)
+
+        with self.assertRaises(ValueError):
+            sd.from_env({"YAP_STRIP_EMOJIS": "maybe"})
+        with self.assertRaises(ValueError):
+            sd.from_env({"YAP_DISPLAY_ROWS": "ten"})
+        with self.assertRaises(ValueError):
+            sd.from_env({"YAP_TIME_WINDOWS": "5,an hour"})
+
     def test_to_dict_excluded_users_is_list(self):
         sd = SettingsData()
         sd.excluded_users = {"a", "bcd", "ef"}
@@ -18,6 +18,15 @@ class TestUserStats(unittest.TestCase):
         self.assertEqual(self.test_user1.messages, 11)
         self.assertEqual(self.test_user1.unique_words, {"hello", "world", "bye"})
 
+    def test_merge(self):
+        other = UserStats("test1")
+        other.update_stats(["hello", "there"])
+        self.test_user1.merge(other)
+        self.assertEqual(self.test_user1.letter_count, 110)
+        self.assertEqual(self.test_user1.word_count, 12)
+        self.assertEqual(self.test_user1.messages, 11)
+        self.assertEqual(self.test_user1.unique_words, {"hello", "world", "there"})
+
     def test_update_stats_empty(self):
         self.test_user1.update_stats([])
         self.assertEqual(self.test_user1.messages, 10)
@@ -33,3 +42,14 @@ class TestUserStats(unittest.TestCase):
             ],
             [0, 0, 0, set()],
         )
+
+    def test_add_message(self):
+        self.test_user1.add_message(8, 2, [1, 2])
+        self.assertEqual(self.test_user1.letter_count, 108)
+        self.assertEqual(self.test_user1.word_count, 12)
+        self.assertEqual(self.test_user1.messages, 11)
+        self.assertEqual(self.test_user1.unique_words, {"hello", "world", 1, 2})
+
+    def test_slots(self):
+        with self.assertRaises(AttributeError):
+            self.test_user1.not_a_stat = 1
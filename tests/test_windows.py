@@ -0,0 +1,66 @@
+import random
+import unittest
+
+from tokenizer import tokenize_message
+from windows import BUCKET_SECONDS, WindowStats
+
+# Seconds since the epoch at the start of some minute
+T = 1_700_000_040.0
+
+
+def minutes(n: float) -> float:
+    return T + n * BUCKET_SECONDS
+
+
+class TestWindowStats(unittest.TestCase):
+    def test_messages_leave_windows(self):
+        windows = WindowStats([5, 1])
+        windows.add("bob", tokenize_message("hi chat"), minutes(0))
+        windows.add("eve", tokenize_message("hi"), minutes(0.5))
+        windows.add("eve", tokenize_message("hello there"), minutes(3))
+
+        self.assertEqual(
+            windows.top_yappers(5, 0, minutes(3)), [("eve", 2, 12), ("bob", 1, 6)]
+        )
+        self.assertEqual(windows.top_yappers(1, 0, minutes(3)), [("eve", 1, 10)])
+        self.assertEqual(windows.top_words(5, 1, minutes(3)), [("hi", 2)])
+
+        # The first minute's bucket leaves the 5 minute window
+        self.assertTrue(windows.expiring(minutes(5)))
+        self.assertEqual(windows.top_yappers(5, 0, minutes(5)), [("eve", 1, 10)])
+        self.assertEqual(len(windows), 1)
+        self.assertEqual(windows.top_words(5, 0, minutes(8)), [])
+        self.assertEqual(len(windows), 0)
+
+    def test_emote_walls_counted_by_word(self):
+        windows = WindowStats([5])
+        windows.add("bob", tokenize_message("kekw " * 10 + "lul lul"), minutes(0))
+        self.assertEqual(
+            windows.top_words(5, 0, minutes(0)), [("kekw", 10), ("lul", 2)]
+        )
+
+    def test_matches_recount(self):
+        rnd = random.Random(0)
+        windows = WindowStats([2, 7, 30])
+        sent = []
+        now = minutes(0)
+        for _ in range(3000):
+            now += rnd.expovariate(1 / 5)
+            username = f"user{rnd.randrange(40)}"
+            text = " ".join(f"w{rnd.randrange(50)}" for _ in range(rnd.randint(1, 4)))
+            windows.add(username, tokenize_message(text), now)
+            sent.append((int(now // BUCKET_SECONDS), username, text.split()))
+
+        minute = int(now // BUCKET_SECONDS)
+        for window in windows.windows:
+            messages, words = {}, {}
+            for sent_minute, username, text in sent:
+                if sent_minute > minute - window:
+                    messages[username] = messages.get(username, 0) + 1
+                    for w in text:
+                        words[w] = words.get(w, 0) + 1
+            top = windows.top_yappers(window, 0, now)
+            self.assertEqual({user: n for user, n, _ in top}, messages)
+            self.assertEqual(dict(windows.top_words(window, 0, now)), words)
+        # Only the longest window's buckets are kept
+        self.assertLessEqual(len(windows), 30)